@@ -33,7 +33,7 @@ var WATERMARK_FILE = "$WATERMARK_PATH";
 // Configuration
 var JPEG_QUALITY = 10; // 1-12 scale (10 = high quality, ~90%)
 var OUTPUT_SUBFOLDER = "final_jpegs";
-var RAW_EXTENSIONS = [".ARW", ".arw", ".CR2", ".cr2", ".NEF", ".nef"];
+var RAW_EXTENSIONS = [".ARW", ".arw", ".CR2", ".cr2", ".CR3", ".cr3", ".NEF", ".nef", ".RAF", ".raf", ".DNG", ".dng"];
 var WATERMARK_OPACITY = 30; // 0-100 (30 = 30% opacity)
 var WATERMARK_POSITION = "center"; // bottom-right, bottom-left, top-right, top-left, center
 var WATERMARK_SIZE = 0.75; // Watermark will be 75% of image width (with margin)
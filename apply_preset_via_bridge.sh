@@ -31,7 +31,7 @@ echo "respects XMP sidecars (unlike direct Photoshop)"
 echo ""
 
 # Count RAW files
-RAW_COUNT=$(find "$INPUT_FOLDER" -maxdepth 1 -iname "*.arw" -o -iname "*.cr2" -o -iname "*.nef" | wc -l | tr -d ' ')
+RAW_COUNT=$(find "$INPUT_FOLDER" -maxdepth 1 \( -iname "*.arw" -o -iname "*.cr2" -o -iname "*.cr3" -o -iname "*.nef" -o -iname "*.raf" -o -iname "*.dng" \) | wc -l | tr -d ' ')
 echo "Found $RAW_COUNT RAW files"
 echo ""
 
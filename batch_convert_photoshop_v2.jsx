@@ -2,7 +2,7 @@
  * Batch Convert RAW to JPEG with XMP Preset - Photoshop Script
  *
  * This script:
- * 1. Opens all ARW (RAW) files from a specified folder
+ * 1. Opens all RAW files (ARW, CR2, CR3, NEF, RAF, DNG) from a specified folder
  * 2. Applies XMP sidecar settings automatically
  * 3. Converts to JPEG with specified quality
  * 4. Saves to a "final_jpegs" subfolder
@@ -15,7 +15,7 @@
 // Configuration
 var JPEG_QUALITY = 10; // 1-12 scale (10 = high quality, ~90%)
 var OUTPUT_SUBFOLDER = "final_jpegs";
-var RAW_EXTENSIONS = [".ARW", ".arw", ".CR2", ".cr2", ".NEF", ".nef"];
+var RAW_EXTENSIONS = [".ARW", ".arw", ".CR2", ".cr2", ".CR3", ".cr3", ".NEF", ".nef", ".RAF", ".raf", ".DNG", ".dng"];
 
 // Main function
 function main() {
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Analysis Benchmark - Measure speed and accuracy of the photo analysis options
+Usage: python3 benchmark_analysis.py modes <folder_with_raw_files> [--limit N]
+       python3 benchmark_analysis.py cascade [--photos N] [--workers N]
+       python3 benchmark_analysis.py faces <folder_with_raw_files> [--limit N]
+       python3 benchmark_analysis.py detectors <folder_with_raw_files> [--limit N] [--size PX]
+       python3 benchmark_analysis.py sharpness [--megapixels 24 42 61] [--repeat N]
+       python3 benchmark_analysis.py tilt [--lines 100 10000 100000] [--megapixels 24] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import photo_selector
+
+
+def find_raw_files(folder, limit=None):
+    """Find RAW files in a folder (sorted, optionally limited)"""
+    files = photo_selector.find_raw_files(folder)
+    return files[:limit] if limit else files
+
+
+def print_header(title, folder, count):
+    print(f"\n{'='*70}")
+    print(title)
+    print(f"{'='*70}")
+    print(f"Folder: {folder}")
+    print(f"Files: {count}")
+    print(f"{'='*70}\n")
+
+
+def correlation(a, b):
+    """Pearson correlation of two sequences (nan if undefined)"""
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    if len(a) < 2 or a.std() == 0 or b.std() == 0:
+        return float('nan')
+    return float(np.corrcoef(a, b)[0, 1])
+
+
+def benchmark_modes(files, sharpness_threshold):
+    """Compare analysis modes against the full-resolution path"""
+    results = {mode: [] for mode in photo_selector.ANALYSIS_MODES}
+    timings = {mode: [] for mode in photo_selector.ANALYSIS_MODES}
+
+    for file_path in files:
+        print(f"Analyzing {file_path.name}...")
+        for mode in photo_selector.ANALYSIS_MODES:
+            start = time.perf_counter()
+            result = photo_selector.analyze_photo(str(file_path), sharpness_threshold,
+                                                  require_faces=True, analysis_mode=mode)
+            timings[mode].append(time.perf_counter() - start)
+            results[mode].append(result)
+
+    reference = results['full']
+    full_time = np.mean(timings['full'])
+
+    print(f"\n{'Mode':<10}{'s/photo':>10}{'Speedup':>10}{'Sharp r':>10}{'Sharp x':>10}"
+          f"{'Faces =':>10}{'Select =':>10}{'Bright d':>10}")
+    print("-" * 80)
+    for mode in photo_selector.ANALYSIS_MODES:
+        mode_results = results[mode]
+        mean_time = np.mean(timings[mode])
+        ref_sharp = [r['sharpness'] for r in reference]
+        mode_sharp = [r['sharpness'] for r in mode_results]
+        # Typical scale factor between this mode's sharpness and full resolution
+        ratios = [m / r for m, r in zip(mode_sharp, ref_sharp) if r > 0]
+        scale = float(np.median(ratios)) if ratios else float('nan')
+        face_match = np.mean([(m['face_count'] > 0) == (r['face_count'] > 0)
+                              for m, r in zip(mode_results, reference)])
+        select_match = np.mean([m['selected'] == r['selected'] for m, r in zip(mode_results, reference)])
+        bright_diff = np.mean([abs(m['brightness'] - r['brightness']) for m, r in zip(mode_results, reference)])
+        print(f"{mode:<10}{mean_time:>10.2f}{full_time / mean_time:>9.1f}x"
+              f"{correlation(ref_sharp, mode_sharp):>10.3f}{scale:>10.2f}"
+              f"{face_match:>10.0%}{select_match:>10.0%}{bright_diff:>10.1f}")
+
+    print("\nSharp r  = correlation of sharpness scores with full resolution")
+    print("Sharp x  = median sharpness ratio vs full resolution (scale the threshold by this)")
+    print("Faces =  = photos where face / no face agrees with full resolution")
+    print(f"Select = = photos with the same selection at threshold {sharpness_threshold}")
+    print("Bright d = mean absolute brightness difference (0-255)")
+
+
+def cascade_lookups(photo_count):
+    """Worker task: look up the face cascade once per photo, as the analysis does
+
+    Returns:
+        (worker pid, models loaded by the worker so far)
+    """
+    for _ in range(photo_count):
+        photo_selector.get_cascade_classifier(photo_selector.FACE_CASCADE_FILE)
+    return os.getpid(), photo_selector.classifier_loads()
+
+
+def benchmark_cascade(photo_count, workers=2, repeats=20):
+    """Compare loading the face cascade for every photo with the cached registry
+
+    Returns:
+        True if every worker process loaded the cascade exactly once
+    """
+    filename = photo_selector.FACE_CASCADE_FILE
+
+    # Old behaviour: look up and parse the XML for every photo
+    start = time.perf_counter()
+    for _ in range(repeats):
+        cascade_path = photo_selector.model_path(filename)
+        if cascade_path.exists():
+            photo_selector.cv2.CascadeClassifier(str(cascade_path))
+    per_photo_load = (time.perf_counter() - start) / repeats
+
+    # New behaviour: the first call loads, later calls are a dictionary lookup
+    start = time.perf_counter()
+    photo_selector.get_cascade_classifier(filename)
+    first_load = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(photo_count):
+        photo_selector.get_cascade_classifier(filename)
+    cached_lookup = (time.perf_counter() - start) / photo_count
+
+    print(f"Load per photo (old):      {per_photo_load * 1000:8.2f} ms")
+    print(f"First load (registry):     {first_load * 1000:8.2f} ms")
+    print(f"Cached lookup (registry):  {cached_lookup * 1e6:8.2f} us")
+    print(f"\nFor a shoot of {photo_count} photos (per worker process):")
+    print(f"  Old: {per_photo_load * photo_count:8.1f} s spent loading the cascade")
+    print(f"  New: {first_load + cached_lookup * photo_count:8.3f} s")
+
+    # Workers are spawned like the analysis pool; each runs several batches of photos
+    batches = workers * 4
+    loads = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        for pid, count in executor.map(cascade_lookups, [max(1, photo_count // batches)] * batches):
+            loads[pid] = max(loads.get(pid, 0), count)
+    correct = all(count == 1 for count in loads.values())
+    print(f"\n{'OK' if correct else 'FAIL'}: cascade loads per worker over {batches} batches: "
+          f"{', '.join(str(count) for count in loads.values())} (expected 1 each)")
+    return correct
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    intersection = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / union if union else 0.0
+
+
+def count_matches(reference_boxes, boxes, min_iou=0.4):
+    """Number of reference boxes matched by a box with at least min_iou overlap"""
+    return sum(1 for ref in reference_boxes if any(box_iou(ref, box) >= min_iou for box in boxes))
+
+
+def benchmark_faces(files):
+    """Compare face detection on downscaled copies with the full-resolution path"""
+    sizes = photo_selector.FACE_DETECTION_SIZES
+    timings = {size: [] for size in sizes}
+    found = {size: 0 for size in sizes}
+    matched = {size: 0 for size in sizes}
+    reference_total = 0
+
+    # Load the cascade up front so it isn't part of the first measurement
+    photo_selector.get_cascade_classifier(photo_selector.FACE_CASCADE_FILE)
+
+    for file_path in files:
+        print(f"Detecting faces in {file_path.name}...")
+        with photo_selector.rawpy.imread(str(file_path)) as raw:
+            image, _ = photo_selector.load_analysis_image(raw, 'full')
+
+        boxes_by_size = {}
+        for size in sizes:
+            start = time.perf_counter()
+            boxes_by_size[size] = photo_selector.detect_faces(image, photo_selector.MIN_FACE_SIZE, size)
+            timings[size].append(time.perf_counter() - start)
+
+        reference = boxes_by_size[0]
+        reference_total += len(reference)
+        for size in sizes:
+            found[size] += len(boxes_by_size[size])
+            matched[size] += count_matches(reference, boxes_by_size[size])
+
+    full_time = np.mean(timings[0])
+    print(f"\n{'Long edge':<12}{'s/photo':>10}{'Speedup':>10}{'Faces':>8}{'Recall':>10}{'Extra':>8}")
+    print("-" * 58)
+    for size in sizes:
+        mean_time = np.mean(timings[size])
+        recall = matched[size] / reference_total if reference_total else float('nan')
+        extra = found[size] - matched[size]
+        label = "full" if size == 0 else str(size)
+        print(f"{label:<12}{mean_time:>10.3f}{full_time / mean_time:>9.1f}x{found[size]:>8}{recall:>10.0%}{extra:>8}")
+
+    print("\nRecall = faces found at full resolution that are also found at this size (IoU >= 0.4)")
+    print("Extra  = faces found only at this size")
+
+
+def benchmark_detectors(files, max_long_edge):
+    """Compare throughput and agreement of the face detector backends"""
+    detectors = [name for name in photo_selector.FACE_DETECTORS
+                 if photo_selector.face_detector_available(name)]
+    for name in photo_selector.FACE_DETECTORS:
+        if name not in detectors:
+            print(f"Skipping: {photo_selector.face_detector_problem(name)}")
+    if len(detectors) < len(photo_selector.FACE_DETECTORS):
+        print()
+
+    timings = {name: 0.0 for name in detectors}
+    photos_with_faces = {name: 0 for name in detectors}
+    face_totals = {name: 0 for name in detectors}
+    matched = {name: 0 for name in detectors}
+    reference_total = 0
+
+    images = []
+    for file_path in files:
+        print(f"Decoding {file_path.name}...")
+        with photo_selector.rawpy.imread(str(file_path)) as raw:
+            images.append(photo_selector.load_analysis_image(raw, 'full')[0])
+
+    for name in detectors:
+        # Load the model up front so it isn't part of the measurement
+        photo_selector.detect_faces(images[0][:64, :64], photo_selector.MIN_FACE_SIZE, max_long_edge, name)
+        for image in images:
+            start = time.perf_counter()
+            boxes = photo_selector.detect_faces(image, photo_selector.MIN_FACE_SIZE, max_long_edge, name)
+            timings[name] += time.perf_counter() - start
+            photos_with_faces[name] += bool(boxes)
+            face_totals[name] += len(boxes)
+
+    # Agreement with the default Haar detector
+    for image in images:
+        reference = photo_selector.detect_faces(image, photo_selector.MIN_FACE_SIZE, max_long_edge, 'haar')
+        reference_total += len(reference)
+        for name in detectors:
+            boxes = photo_selector.detect_faces(image, photo_selector.MIN_FACE_SIZE, max_long_edge, name)
+            matched[name] += count_matches(reference, boxes)
+
+    print(f"\n{'Detector':<10}{'img/sec':>10}{'Photos w/ faces':>17}{'Faces':>8}{'Haar faces found':>18}")
+    print("-" * 63)
+    for name in detectors:
+        throughput = len(images) / timings[name] if timings[name] else float('inf')
+        agreement = matched[name] / reference_total if reference_total else float('nan')
+        print(f"{name:<10}{throughput:>10.2f}{photos_with_faces[name]:>17}{face_totals[name]:>8}{agreement:>18.0%}")
+
+
+def synthetic_frame(megapixels, seed=0):
+    """3:2 grayscale test frame: smoothed noise, soft on the left half"""
+    height = int(round(np.sqrt(megapixels * 1e6 / 1.5)))
+    width = int(round(height * 1.5))
+    cv2 = photo_selector.cv2
+    rng = np.random.default_rng(seed)
+    frame = cv2.GaussianBlur(rng.integers(0, 256, (height, width), dtype=np.uint8), (0, 0), 1.5)
+    frame[:, :width // 2] = cv2.GaussianBlur(frame[:, :width // 2], (0, 0), 4)
+    return frame
+
+
+def legacy_sobel_mean(gray):
+    """Sobel sharpness as computed before: CV_64F gradients and float64 NumPy math"""
+    cv2 = photo_selector.cv2
+    sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
+    sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
+    return float(np.mean(np.sqrt(sobelx**2 + sobely**2)))
+
+
+def ndimage_sobel_mean(gray):
+    """Sobel sharpness with the scipy.ndimage fallback filters"""
+    gray = gray.astype(np.float32)
+    return float(np.hypot(photo_selector.ndimage.sobel(gray, axis=1),
+                          photo_selector.ndimage.sobel(gray, axis=0)).mean(dtype=np.float64))
+
+
+def time_call(function, repeat):
+    """Best wall-clock time of repeated calls, and the last return value"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def benchmark_sharpness(megapixel_sizes, repeat):
+    """Time the sharpness metrics on synthetic full-size frames"""
+    for megapixels in megapixel_sizes:
+        gray = synthetic_frame(megapixels)
+        print(f"{megapixels} MP ({gray.shape[1]}x{gray.shape[0]}):")
+        print(f"  {'Metric':<34}{'ms':>10}{'Score':>12}")
+
+        cases = [("sobel (old CV_64F + NumPy)", lambda: legacy_sobel_mean(gray)),
+                 ("sobel (scipy.ndimage fallback)", lambda: ndimage_sobel_mean(gray))]
+        for metric in photo_selector.SHARPNESS_METRICS:
+            cases.append((metric, lambda metric=metric: photo_selector.sharpness_score(gray, metric)))
+        cases.append(("sharpness map (sobel, all ROIs)",
+                      lambda: photo_selector.SharpnessMap(gray).score()))
+
+        for name, function in cases:
+            seconds, score = time_call(function, repeat)
+            print(f"  {name:<34}{seconds * 1000:>10.1f}{score:>12.2f}")
+        print()
+
+
+def legacy_tilt_loop(lines):
+    """Tilt estimate as computed before: per-line Python loop and unweighted median"""
+    angles = []
+    for rho, theta in lines:
+        angle = (theta * 180 / np.pi) - 90
+        if angle > 45:
+            angle -= 90
+        elif angle < -45:
+            angle += 90
+        if abs(angle) < 10:
+            angles.append(angle)
+    return float(np.median(angles)) if angles else 0.0
+
+
+def legacy_horizon_angle(gray):
+    """Horizon detection as done before: full-resolution Canny and HoughLines"""
+    cv2 = photo_selector.cv2
+    edges = cv2.Canny(gray, 50, 150, apertureSize=3)
+    lines = cv2.HoughLines(edges, 1, np.pi / 180, 100)
+    return legacy_tilt_loop(lines[:, 0]) if lines is not None else 0.0
+
+
+def synthetic_hough_lines(count, tilt, seed=0):
+    """(rho, theta) lines: 30% around the tilt (horizontal and vertical), the rest random clutter"""
+    rng = np.random.default_rng(seed)
+    true_count = int(count * 0.3)
+    directions = tilt + rng.normal(0, 0.3, true_count) + rng.choice([0.0, 90.0], true_count)
+    directions = np.concatenate([directions, rng.uniform(-90, 90, count - true_count)])
+    theta = np.radians((directions + 90) % 180)
+    return np.column_stack([rng.uniform(0, 1000, count), theta]).astype(np.float32)
+
+
+def tilted_frame(megapixels, tilt, seed=0):
+    """3:2 grayscale frame: a horizon tilted by `tilt` degrees over textured clutter"""
+    cv2 = photo_selector.cv2
+    frame = synthetic_frame(megapixels, seed)
+    height, width = frame.shape
+    frame[height // 2:] //= 3
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), -tilt, 1.0)
+    return cv2.warpAffine(frame, rotation, (width, height), borderMode=cv2.BORDER_REFLECT)
+
+
+# Largest error (degrees) accepted from the horizon detector on the tilted test frame
+TILT_TOLERANCE = 0.5
+
+
+def benchmark_tilt(line_counts, megapixels, repeat, tilt=2.5):
+    """Time tilt estimation on synthetic Hough lines and horizon detection on a tilted frame
+
+    Returns:
+        True if the detector recovered the frame's tilt within TILT_TOLERANCE
+    """
+    print(f"Tilt estimate from synthetic lines (true tilt {tilt:.2f}°, 70% clutter):")
+    print(f"  {'Lines':>8}{'Loop ms':>12}{'Loop °':>10}{'Vector ms':>12}{'Vector °':>10}{'Conf':>8}")
+    for count in line_counts:
+        lines = synthetic_hough_lines(count, tilt)
+        loop_seconds, loop_angle = time_call(lambda: legacy_tilt_loop(lines), repeat)
+        directions = np.degrees(lines[:, 1]) - 90
+        vector_seconds, (angle, confidence) = time_call(
+            lambda: photo_selector.estimate_tilt_angle(directions), repeat)
+        print(f"  {count:>8}{loop_seconds * 1000:>12.2f}{loop_angle:>10.2f}"
+              f"{vector_seconds * 1000:>12.2f}{angle:>10.2f}{confidence:>8.2f}")
+    print()
+
+    gray = tilted_frame(megapixels, tilt)
+    print(f"Horizon detection on a {megapixels} MP frame ({gray.shape[1]}x{gray.shape[0]}, true tilt {tilt:.2f}°):")
+    seconds, angle = time_call(lambda: legacy_horizon_angle(gray), repeat)
+    print(f"  {'full-res HoughLines + loop':<34}{seconds * 1000:>10.1f} ms{angle:>10.2f}°")
+    seconds, (angle, confidence) = time_call(lambda: photo_selector.detect_horizon_angle(gray), repeat)
+    print(f"  {'downscaled HoughLinesP + vector':<34}{seconds * 1000:>10.1f} ms{angle:>10.2f}°  "
+          f"(confidence {confidence:.2f})")
+    correct = abs(angle - tilt) <= TILT_TOLERANCE and confidence >= photo_selector.TILT_MIN_CONFIDENCE
+    print(f"  {'OK' if correct else 'FAIL'}: detected tilt is {abs(angle - tilt):.2f}° off "
+          f"(tolerance {TILT_TOLERANCE}°, minimum confidence {photo_selector.TILT_MIN_CONFIDENCE})")
+    print()
+    return correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark photo analysis options")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    modes_parser = subparsers.add_parser('modes', help="Compare full / half-size / preview analysis")
+    modes_parser.add_argument('folder', help="Folder with RAW files")
+    modes_parser.add_argument('--limit', type=int, default=20, help="Maximum number of files (default: 20)")
+    modes_parser.add_argument('--threshold', type=float, default=20, help="Sharpness threshold (default: 20)")
+
+    cascade_parser = subparsers.add_parser('cascade', help="Face cascade loading cost per photo vs cached")
+    cascade_parser.add_argument('--photos', type=int, default=1500, help="Photos in the shoot (default: 1500)")
+    cascade_parser.add_argument('--workers', type=int, default=2, help="Worker processes to check (default: 2)")
+
+    faces_parser = subparsers.add_parser('faces', help="Compare downscaled face detection with full resolution")
+    faces_parser.add_argument('folder', help="Folder with RAW files")
+    faces_parser.add_argument('--limit', type=int, default=20, help="Maximum number of files (default: 20)")
+
+    detectors_parser = subparsers.add_parser('detectors', help="Compare face detector backends")
+    detectors_parser.add_argument('folder', help="Folder with RAW files")
+    detectors_parser.add_argument('--limit', type=int, default=20, help="Maximum number of files (default: 20)")
+    detectors_parser.add_argument('--size', type=int, default=0,
+                                  help="Face detection long edge in px (default: 0 = full resolution)")
+
+    sharpness_parser = subparsers.add_parser('sharpness', help="Sharpness metric speed on synthetic frames")
+    sharpness_parser.add_argument('--megapixels', type=int, nargs='+', default=[24, 42, 61],
+                                  help="Frame sizes in megapixels (default: 24 42 61)")
+    sharpness_parser.add_argument('--repeat', type=int, default=3, help="Runs per metric, best is reported (default: 3)")
+
+    tilt_parser = subparsers.add_parser('tilt', help="Tilt estimation and horizon detection speed")
+    tilt_parser.add_argument('--lines', type=int, nargs='+', default=[100, 10000, 100000],
+                             help="Synthetic Hough line counts (default: 100 10000 100000)")
+    tilt_parser.add_argument('--megapixels', type=int, default=24, help="Test frame size (default: 24)")
+    tilt_parser.add_argument('--repeat', type=int, default=3, help="Runs per case, best is reported (default: 3)")
+
+    args = parser.parse_args()
+
+    if args.command == 'tilt':
+        print(f"\n{'='*70}")
+        print("TILT ESTIMATION BENCHMARK")
+        print(f"{'='*70}\n")
+        if not benchmark_tilt(args.lines, args.megapixels, args.repeat):
+            sys.exit(1)
+        return
+
+    if args.command == 'sharpness':
+        print(f"\n{'='*70}")
+        print("SHARPNESS METRIC BENCHMARK")
+        print(f"{'='*70}\n")
+        benchmark_sharpness(args.megapixels, args.repeat)
+        return
+
+    if args.command == 'cascade':
+        print(f"\n{'='*70}")
+        print("FACE CASCADE LOADING BENCHMARK")
+        print(f"{'='*70}\n")
+        if not benchmark_cascade(args.photos, args.workers):
+            sys.exit(1)
+        return
+
+    folder = Path(args.folder)
+    if not folder.exists():
+        print(f"Error: Folder does not exist: {folder}")
+        sys.exit(1)
+
+    files = find_raw_files(folder, args.limit)
+    if not files:
+        print(f"No RAW files found in {folder}")
+        sys.exit(1)
+
+    if args.command == 'modes':
+        print_header("ANALYSIS MODE BENCHMARK", folder, len(files))
+        benchmark_modes(files, args.threshold)
+    elif args.command == 'faces':
+        print_header("FACE DETECTION SIZE BENCHMARK", folder, len(files))
+        benchmark_faces(files)
+    elif args.command == 'detectors':
+        print_header("FACE DETECTOR BENCHMARK", folder, len(files))
+        benchmark_detectors(files, args.size)
+
+
+if __name__ == "__main__":
+    main()
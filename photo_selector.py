@@ -1,16 +1,32 @@
 #!/usr/bin/env python3
 """
 Photo Selector - Automatic photo selection and conversion tool
-For ARW raw photos - selects sharp images with focused faces and converts to JPEG
+For RAW photos (Sony ARW, Canon CR2/CR3, Nikon NEF, Fujifilm RAF, DNG) - selects sharp images with focused faces and converts to JPEG
 """
 
 import os
+import io
 import sys
 import shutil
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
+import json
+import csv
+import argparse
+import sqlite3
+import re
+import tempfile
+try:
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox, scrolledtext
+except ImportError:
+    tk = None  # Headless install - only the command-line analyzer is available
 from pathlib import Path
 import threading
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime
 
 try:
@@ -26,6 +42,43 @@ except ImportError as e:
     HAS_CV2 = False
     print(f"Import warning: {e}")
 
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows - peak memory isn't reported
+
+try:
+    from watchdog.observers import Observer
+    HAS_WATCHDOG = True
+except ImportError:
+    HAS_WATCHDOG = False  # Watch mode falls back to polling the folder
+
+# Supported RAW formats: extension -> (camera make, preview strategy)
+#   'preview':   the embedded JPEG is (near) full size - the preview analysis mode uses it
+#   'thumbnail': usually only a small thumbnail is embedded (phone and converter DNGs) -
+#                the preview mode decodes at half size right away; the thumbnail is
+#                still used for the duplicate/burst fingerprints
+RAW_FORMATS = {
+    'ARW': ("Sony", 'preview'),
+    'CR2': ("Canon", 'preview'),
+    'CR3': ("Canon", 'preview'),
+    'NEF': ("Nikon", 'preview'),
+    'RAF': ("Fujifilm", 'preview'),
+    'DNG': ("Adobe DNG", 'thumbnail'),
+}
+
+
+def raw_format(file_path):
+    """RAW_FORMATS key of a file, from its extension (any case), or None if unsupported"""
+    extension = Path(file_path).suffix[1:].upper()
+    return extension if extension in RAW_FORMATS else None
+
+
+def preview_strategy(file_path):
+    """How the preview analysis mode should read a file (see RAW_FORMATS)"""
+    return RAW_FORMATS.get(raw_format(file_path), (None, 'preview'))[1]
+
+
 # XMP sidecar template (converted from preset to sidecar format)
 XMP_PRESET = """<x:xmpmeta xmlns:x="adobe:ns:meta/" x:xmptk="Adobe XMP Core 7.0-c000 1.000000, 0000/00/00-00:00:00        ">
  <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
@@ -222,6 +275,91 @@ XMP_PRESET = """<x:xmpmeta xmlns:x="adobe:ns:meta/" x:xmptk="Adobe XMP Core 7.0-
 </x:xmpmeta>"""
 
 
+class XmpPreset:
+    """Camera Raw preset parsed into the attributes of its settings element
+
+    The first rdf:Description with crs: attributes holds the develop settings;
+    its attributes are kept as an ordered dict and everything around them as
+    verbatim text, so a sidecar with per-photo overrides is rendered in one pass
+    and is identical to the preset apart from the overridden values. Overrides
+    of attributes the preset doesn't have are appended to the element.
+    """
+
+    _DESCRIPTION = re.compile(r'<rdf:Description\b((?:[^>"]|"[^"]*")*?)(\s*/?>)')
+    _ATTRIBUTE = re.compile(r'(\s+)([\w.-]+:[\w.-]+)="([^"]*)"')
+
+    def __init__(self, xmp):
+        if '<x:xmpmeta' not in xmp:
+            raise ValueError("not an XMP document")
+        for match in self._DESCRIPTION.finditer(xmp):
+            if 'crs:' in match.group(1):
+                break
+        else:
+            raise ValueError("no Camera Raw settings (crs:) found")
+        self.attributes = {}  # The preset's values - pass changes to render
+        self._spacing = {}
+        self._positions = {}  # Attribute name -> index in _parts
+        self._parts = [xmp[:match.start(1)]]  # Serialized once; render only swaps overridden attributes
+        position = 0
+        for attribute in self._ATTRIBUTE.finditer(match.group(1)):
+            if attribute.start() != position:
+                raise ValueError(f"unexpected text in rdf:Description: {match.group(1)[position:attribute.start()]!r}")
+            spacing, name, value = attribute.groups()
+            self.attributes[name] = value
+            self._spacing[name] = spacing
+            self._positions[name] = len(self._parts)
+            self._parts.append(attribute.group())
+            position = attribute.end()
+        if match.group(1)[position:].strip():
+            raise ValueError(f"unexpected text in rdf:Description: {match.group(1)[position:]!r}")
+        # New attributes line up with the preset's last one
+        self._indent = spacing if self.attributes else "\n   "
+        self._parts.append(xmp[match.start(1) + position:])
+
+    def render(self, overrides=None):
+        """The preset as XMP text, with attribute values replaced or added from overrides"""
+        if not overrides:
+            return "".join(self._parts)
+        parts = list(self._parts)
+        added = []
+        for name, value in overrides.items():
+            value = _xmp_attribute_value(value)
+            if name in self._positions:
+                parts[self._positions[name]] = f'{self._spacing[name]}{name}="{value}"'
+            else:
+                added.append(f'{self._indent}{name}="{value}"')
+        parts[-1:-1] = added
+        return "".join(parts)
+
+
+def _xmp_attribute_value(value):
+    """Escape a value for a double-quoted XML attribute"""
+    return str(value).replace("&", "&amp;").replace("<", "&lt;").replace('"', "&quot;")
+
+
+# Parsed presets by XMP text (None = built-in preset), see xmp_preset
+_xmp_presets = {}
+
+
+def xmp_preset(base_xmp=None):
+    """Parsed XmpPreset of a preset's XMP text (None for the built-in one), parsed only once
+
+    Raises:
+        ValueError: if the text isn't a Camera Raw XMP preset
+    """
+    preset = _xmp_presets.get(base_xmp)
+    if preset is None:
+        preset = _xmp_presets[base_xmp] = XmpPreset(base_xmp if base_xmp else XMP_PRESET)
+    return preset
+
+
+def rotation_overrides(tilt_angle):
+    """XMP attributes that straighten a photo by tilt_angle degrees (with auto-crop)"""
+    if abs(tilt_angle) > 0.1:  # Only add rotation if tilt is significant (> 0.1 degrees)
+        return {'crs:HasCrop': "True", 'crs:StraightenAngle': f"{tilt_angle:.2f}"}
+    return {}
+
+
 def generate_xmp_with_rotation(tilt_angle=0.0, base_xmp=None):
     """Generate XMP preset with rotation and auto-crop if tilt angle is detected
 
@@ -229,51 +367,264 @@ def generate_xmp_with_rotation(tilt_angle=0.0, base_xmp=None):
         tilt_angle: Rotation angle in degrees
         base_xmp: Optional custom XMP content to use instead of built-in preset
     """
-    # Use custom XMP or built-in preset
-    xmp = base_xmp if base_xmp else XMP_PRESET
+    return xmp_preset(base_xmp).render(rotation_overrides(tilt_angle))
+
+
+def choose_xmp_preset(brightness, brightness_threshold, dark_xmp=None, light_xmp=None):
+    """Pick the dark or light preset for a photo based on its brightness
+
+    Args:
+        brightness: Mean brightness of the photo (0-255)
+        brightness_threshold: Photos darker than this get the dark preset
+        dark_xmp / light_xmp: Optional custom XMP content (None = built-in preset)
+
+    Returns:
+        (base_xmp or None for the built-in preset, preset description)
+    """
+    if brightness < brightness_threshold:
+        return (dark_xmp, "dark (custom)") if dark_xmp else (None, "dark (built-in)")
+    return (light_xmp, "light (custom)") if light_xmp else (None, "light (built-in)")
+
+
+def straighten_angle(photo):
+    """Tilt to write into XMP - 0 when the horizon detection wasn't confident"""
+    if photo.get('tilt_confidence', 0.0) < TILT_MIN_CONFIDENCE:
+        return 0.0
+    return photo.get('tilt_angle', 0.0)
+
+
+def tilt_skipped(photo):
+    """Whether a tilt was measured but is left out of the XMP for lack of confidence"""
+    return abs(photo.get('tilt_angle', 0.0)) > 0.1 and photo.get('tilt_confidence', 0.0) < TILT_MIN_CONFIDENCE
+
+
+def sidecar_path(raw_path):
+    """XMP sidecar of a RAW file - same name with .xmp, as Camera Raw and Lightroom expect"""
+    return Path(raw_path).with_suffix('.xmp')
+
+
+def render_xmp_sidecar(photo, brightness_threshold, dark_xmp=None, light_xmp=None, straighten=True,
+                       auto_exposure=False):
+    """XMP sidecar content (preset plus straightening) of an analyzed RAW file
+
+    The tilt comes from measure_tilts; with straighten=False no rotation is written.
+    With auto_exposure, the photo's exposure_offset is added to the preset's
+    crs:Exposure2012.
+    The preset's photoshop:SidecarForExtension is pointed at the RAW file's actual
+    extension, upper-case as in the built-in preset.
+
+    Returns:
+        (xmp content, preset description)
+    """
+    base_xmp, preset_type = choose_xmp_preset(photo.get('brightness', 128.0), brightness_threshold,
+                                              dark_xmp, light_xmp)
+    preset = xmp_preset(base_xmp)
+    overrides = rotation_overrides(straighten_angle(photo) if straighten else 0.0)
+    if 'photoshop:SidecarForExtension' in preset.attributes:
+        overrides['photoshop:SidecarForExtension'] = Path(photo['path']).suffix[1:].upper()
+    offset = exposure_offset(photo) if auto_exposure else 0.0
+    if offset:
+        try:
+            base = float(preset.attributes.get('crs:Exposure2012', 0))
+        except ValueError:
+            base = 0.0
+        overrides['crs:Exposure2012'] = f"{min(max(base + offset, -5.0), 5.0):+.2f}"  # Camera Raw's range
+    return preset.render(overrides), preset_type
+
+
+def _current_umask():
+    """The process umask (os.umask can only be read by setting it)"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Permissions of a newly created file, as open() would give it. Read once at
+# import: os.umask is process-wide, and the sidecars are written from threads
+NEW_FILE_MODE = 0o666 & ~_current_umask()
+
+
+def write_file_atomic(path, content):
+    """Replace a text file in one step, leaving it untouched if the content is the same
+
+    The content goes to a temporary file in the same folder that's renamed over
+    the target, so an interrupted write never leaves a half-written file behind.
+    The file keeps its permissions (mkstemp would make it private to the user);
+    a new file gets the usual ones for the umask.
+
+    Returns:
+        True if the file was written, False if it already had this content
+    """
+    data = content.encode('utf-8')
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as existing:
+                if existing.read() == data:
+                    return False
+    except OSError:
+        pass  # Missing or unreadable - write it
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        mode = NEW_FILE_MODE
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                     prefix=f".{Path(path).name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(data)
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return True
+
+
+def write_xmp_sidecar(photo, brightness_threshold, dark_xmp=None, light_xmp=None, straighten=True,
+                      auto_exposure=False):
+    """Write the XMP sidecar (preset plus straightening) next to an analyzed RAW file
+
+    Returns:
+        (xmp_path, preset description)
+    """
+    xmp_content, preset_type = render_xmp_sidecar(photo, brightness_threshold, dark_xmp, light_xmp, straighten,
+                                                  auto_exposure)
+    xmp_path = sidecar_path(photo['path'])
+    write_file_atomic(xmp_path, xmp_content)
+    return xmp_path, preset_type
+
+
+# Threads writing sidecars - the work is file I/O, which overlaps well on network volumes
+XMP_WRITER_THREADS = 8
 
-    if abs(tilt_angle) > 0.1:  # Only add rotation if tilt is significant (> 0.1 degrees)
-        # Add rotation parameters before the closing tag
-        rotation_params = f'   crs:StraightenAngle="{tilt_angle:.2f}"'
-
-        # Replace HasCrop flag when rotation is applied
-        xmp = xmp.replace('crs:HasCrop="False"', 'crs:HasCrop="True"')
-
-        # Try to find a good insertion point for the rotation parameter
-        # Look for common closing patterns in XMP files
-        if 'crs:AlreadyApplied="False">' in xmp:
-            # Insert before the closing bracket after AlreadyApplied
-            xmp = xmp.replace('crs:AlreadyApplied="False">',
-                            f'crs:AlreadyApplied="False"\n{rotation_params}>')
-        elif 'crs:HasCrop="True">' in xmp:
-            # Insert after HasCrop if it was just changed
-            xmp = xmp.replace('crs:HasCrop="True">',
-                            f'crs:HasCrop="True"\n{rotation_params}>')
-        else:
-            # Fallback: insert before the first closing rdf:Description tag
-            xmp = xmp.replace('  </rdf:Description>',
-                            f'{rotation_params}\n  </rdf:Description>', 1)
 
-    return xmp
+def write_xmp_sidecars(photos, brightness_threshold, dark_xmp=None, light_xmp=None, straighten=True,
+                       auto_exposure=False, threads=XMP_WRITER_THREADS, should_cancel=None):
+    """Write the XMP sidecars of many photos from a thread pool
+
+    Sidecars that already have the right content aren't rewritten (see
+    write_file_atomic), so re-processing a folder only touches changed photos.
+    At most 2 x threads writes are queued at a time, and none are queued once
+    should_cancel() returns True, so a cancel stops the writing within a batch.
+
+    Yields:
+        (xmp_path, preset description, written, error) per photo, in order - error
+        is the OSError if the sidecar couldn't be written, else None
+    """
+    def write(photo):
+        xmp_content, preset_type = render_xmp_sidecar(photo, brightness_threshold, dark_xmp, light_xmp,
+                                                      straighten, auto_exposure)
+        xmp_path = sidecar_path(photo['path'])
+        try:
+            return xmp_path, preset_type, write_file_atomic(xmp_path, xmp_content), None
+        except OSError as e:
+            return xmp_path, preset_type, False, e
+
+    threads = max(1, threads)
+    executor = ThreadPoolExecutor(max_workers=threads)
+    pending = deque()
+    photos = iter(photos)
+    try:
+        while True:
+            while len(pending) < threads * 2 and not (should_cancel and should_cancel()):
+                photo = next(photos, None)
+                if photo is None:
+                    break
+                pending.append(executor.submit(write, photo))
+            if not pending:
+                return
+            yield pending.popleft().result()
+    finally:
+        # If the caller stops early (cancel), drop the sidecars not started yet
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Part of a face box (centered on eyes/nose) used for face sharpness
+FACE_CENTER_FACTOR = 0.6
+
+# Sharpness metrics: name -> label. Tenengrad is reported as the RMS gradient so
+# its scores are on the same scale as the Sobel mean; Laplacian variance is
+# lower for soft photos and much higher for crisp ones.
+SHARPNESS_METRICS = {
+    'sobel': "Sobel gradient mean (default)",
+    'tenengrad': "Tenengrad (RMS gradient, favors crisp edges)",
+    'laplacian': "Laplacian variance (classic, wider score range)",
+}
+DEFAULT_SHARPNESS_METRIC = 'sobel'
+
+
+def sharpness_planes(gray, metric=DEFAULT_SHARPNESS_METRIC):
+    """Per-pixel float32 planes whose means make up a sharpness metric
+
+    Sobel: [gradient magnitude]; Tenengrad: [squared gradient magnitude];
+    Laplacian: [L, L^2] (variance = mean(L^2) - mean(L)^2). Averaging planes
+    instead of the finished metric lets SharpnessMap score any region from
+    tile means. Single-pass OpenCV kernels, with separable scipy.ndimage
+    filters as the fallback.
+    """
+    if metric == 'laplacian':
+        if HAS_CV2:
+            laplacian = cv2.Laplacian(gray, cv2.CV_32F)
+        else:
+            laplacian = ndimage.laplace(gray.astype(np.float32))
+        return [laplacian, laplacian * laplacian]
+
+    if HAS_CV2:
+        gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+        gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+        if metric == 'tenengrad':
+            return [cv2.accumulateSquare(gy, cv2.multiply(gx, gx))]
+        return [cv2.magnitude(gx, gy)]
+    gray = gray.astype(np.float32)
+    gx = ndimage.sobel(gray, axis=1)
+    gy = ndimage.sobel(gray, axis=0)
+    if metric == 'tenengrad':
+        return [gx * gx + gy * gy]
+    return [np.hypot(gx, gy)]
+
+
+def combine_sharpness(metric, plane_means):
+    """Turn the means of the sharpness_planes of a region into its score"""
+    if metric == 'laplacian':
+        mean, mean_sq = plane_means
+        return max(0.0, float(mean_sq - mean * mean))
+    if metric == 'tenengrad':
+        return float(np.sqrt(max(0.0, plane_means[0])))
+    return float(plane_means[0])
+
+
+def sharpness_score(gray, metric=DEFAULT_SHARPNESS_METRIC):
+    """Sharpness of a whole 8-bit grayscale image (or crop)"""
+    if gray.size == 0:
+        return 0.0
+    if HAS_CV2 and metric == 'laplacian':
+        # One pass for mean and standard deviation, no squared plane needed
+        _, stddev = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F))
+        return float(stddev[0, 0]) ** 2
+    planes = sharpness_planes(gray, metric)
+    means = [cv2.mean(plane)[0] if HAS_CV2 else float(plane.mean(dtype=np.float64)) for plane in planes]
+    return combine_sharpness(metric, means)
 
 
-def calculate_sharpness(image_array, face_regions=None):
-    """Calculate sharpness using enhanced Laplacian variance method
+def calculate_sharpness(image_array, face_regions=None, metric=DEFAULT_SHARPNESS_METRIC):
+    """Calculate sharpness of a photo, or of the faces in it
 
     Args:
         image_array: The image to analyze
         face_regions: Optional list of face bounding boxes [(x, y, w, h), ...]
                      If provided, only analyzes sharpness on faces
+        metric: Sharpness metric (see SHARPNESS_METRICS)
     """
     try:
-        # Convert to grayscale if needed
+        # Work on an 8-bit luminance plane; crops are views into it, so nothing
+        # is copied until a filter runs
         if len(image_array.shape) == 3:
-            gray = np.mean(image_array, axis=2)
+            gray = _to_gray(image_array) if HAS_CV2 else np.mean(image_array, axis=2).astype(np.uint8)
         else:
-            gray = image_array
-
-        # Ensure proper data type
-        gray = gray.astype(np.float64)
+            gray = image_array.astype(np.uint8, copy=False)
 
         # If face regions provided, only analyze those areas
         if face_regions and len(face_regions) > 0:
@@ -281,9 +632,8 @@ def calculate_sharpness(image_array, face_regions=None):
             for (x, y, w, h) in face_regions:
                 # Extract face region - focus on center (eyes/nose area) for better sharpness detection
                 # Eyes are typically the sharpest point and most important for portraits
-                center_factor = 0.6  # Focus on center 60% of face
-                padding_x = int(w * (1 - center_factor) / 2)
-                padding_y = int(h * (1 - center_factor) / 2)
+                padding_x = int(w * (1 - FACE_CENTER_FACTOR) / 2)
+                padding_y = int(h * (1 - FACE_CENTER_FACTOR) / 2)
 
                 y1 = max(0, y + padding_y)
                 y2 = min(gray.shape[0], y + h - padding_y)
@@ -291,58 +641,326 @@ def calculate_sharpness(image_array, face_regions=None):
                 x2 = min(gray.shape[1], x + w - padding_x)
 
                 face_region = gray[y1:y2, x1:x2]
-
                 if face_region.size == 0:
                     continue
-
-                # Use OpenCV's Laplacian if available (faster and more accurate)
-                if HAS_CV2:
-                    # Convert to uint8 for OpenCV
-                    face_uint8 = face_region.astype(np.uint8)
-
-                    # Use Sobel gradient magnitude for more robust sharpness detection
-                    # This is less sensitive to lighting and orientation
-                    sobelx = cv2.Sobel(face_uint8, cv2.CV_64F, 1, 0, ksize=3)
-                    sobely = cv2.Sobel(face_uint8, cv2.CV_64F, 0, 1, ksize=3)
-                    gradient_magnitude = np.sqrt(sobelx**2 + sobely**2)
-
-                    # Calculate mean of gradient magnitude (normalized by region size)
-                    score = float(np.mean(gradient_magnitude))
-                else:
-                    # Fallback: scipy implementation
-                    laplacian = np.array([[0, 1, 0], [1, -4, 1], [0, 1, 0]])
-                    from scipy import signal
-                    filtered = signal.convolve2d(face_region, laplacian, mode='valid')
-                    score = float(np.var(filtered))
-
-                face_sharpness_scores.append(score)
+                face_sharpness_scores.append(sharpness_score(face_region, metric))
 
             # Return average sharpness across all faces
-            return np.mean(face_sharpness_scores) if face_sharpness_scores else 0
+            return float(np.mean(face_sharpness_scores)) if face_sharpness_scores else 0
         else:
             # No faces detected - analyze entire image
-            if HAS_CV2:
-                gray_uint8 = gray.astype(np.uint8)
-
-                # Use Sobel gradient magnitude for more robust sharpness detection
-                sobelx = cv2.Sobel(gray_uint8, cv2.CV_64F, 1, 0, ksize=3)
-                sobely = cv2.Sobel(gray_uint8, cv2.CV_64F, 0, 1, ksize=3)
-                gradient_magnitude = np.sqrt(sobelx**2 + sobely**2)
-
-                return float(np.mean(gradient_magnitude))
-            else:
-                laplacian = np.array([[0, 1, 0], [1, -4, 1], [0, 1, 0]])
-                from scipy import signal
-                filtered = signal.convolve2d(gray, laplacian, mode='valid')
-                return float(np.var(filtered))
+            return sharpness_score(gray, metric)
 
     except Exception as e:
         print(f"Sharpness calculation error: {e}")
         return 0
 
 
-def detect_faces(image_array):
-    """Detect faces in the image using OpenCV Haar Cascade
+# Resolution of the sharpness map: number of tiles along the long edge
+SHARPNESS_MAP_TILES = 256
+# Subfolder of the input folder that focus heatmaps are saved to
+FOCUS_MAP_DIRNAME = "focus_maps"
+
+
+class SharpnessMap:
+    """Tiled sharpness of a photo, scoring any region in O(1)
+
+    The sharpness planes (see sharpness_planes) are computed once and averaged
+    into tiles (SHARPNESS_MAP_TILES along the long edge). A summed-area table
+    over the tiles then gives the score of any rectangle - faces, eyes, the
+    center, rule-of-thirds points - from four lookups, whatever its size.
+    Tiles are constant inside, so interpolating the table at fractional tile
+    coordinates integrates partially covered tiles exactly.
+    """
+
+    def __init__(self, gray, tiles=SHARPNESS_MAP_TILES, metric=DEFAULT_SHARPNESS_METRIC):
+        gray = _to_gray(gray) if HAS_CV2 else np.asarray(gray, dtype=np.uint8)
+        self.metric = metric
+        self.height, self.width = gray.shape
+        tile_size = max(1.0, max(self.height, self.width) / tiles)
+        tiles_y = max(1, int(round(self.height / tile_size)))
+        tiles_x = max(1, int(round(self.width / tile_size)))
+        self.scale_x = tiles_x / self.width
+        self.scale_y = tiles_y / self.height
+
+        # plane_tiles: (planes, tiles_y, tiles_x) tile means of each sharpness plane
+        self.plane_tiles = np.stack([self._tile_means(plane, tiles_x, tiles_y)
+                                     for plane in sharpness_planes(gray, metric)])
+        # Summed-area tables with a zero first row and column
+        self.table = np.zeros((len(self.plane_tiles), tiles_y + 1, tiles_x + 1), dtype=np.float64)
+        self.table[:, 1:, 1:] = self.plane_tiles.cumsum(axis=1, dtype=np.float64).cumsum(axis=2)
+
+    @staticmethod
+    def _tile_means(plane, tiles_x, tiles_y):
+        if HAS_CV2:
+            # INTER_AREA averages each tile's footprint exactly (also for fractional tile sizes)
+            return cv2.resize(plane, (tiles_x, tiles_y), interpolation=cv2.INTER_AREA)
+        rows = np.linspace(0, plane.shape[0], tiles_y + 1).astype(int)
+        cols = np.linspace(0, plane.shape[1], tiles_x + 1).astype(int)
+        sums = np.add.reduceat(np.add.reduceat(plane, rows[:-1], axis=0), cols[:-1], axis=1)
+        return (sums / np.outer(np.diff(rows), np.diff(cols))).astype(np.float32)
+
+    @property
+    def tiles(self):
+        """Sharpness score of each tile"""
+        if self.metric == 'laplacian':
+            return np.maximum(self.plane_tiles[1] - self.plane_tiles[0] ** 2, 0)
+        if self.metric == 'tenengrad':
+            return np.sqrt(self.plane_tiles[0])
+        return self.plane_tiles[0]
+
+    def _integral(self, tx, ty):
+        """Per-plane sums of the tiles left of / above a point in tile coordinates"""
+        _, rows, cols = self.table.shape
+        x0 = min(int(tx), cols - 2)
+        y0 = min(int(ty), rows - 2)
+        fx = tx - x0
+        fy = ty - y0
+        t = self.table
+        top = t[:, y0, x0] + (t[:, y0, x0 + 1] - t[:, y0, x0]) * fx
+        bottom = t[:, y0 + 1, x0] + (t[:, y0 + 1, x0 + 1] - t[:, y0 + 1, x0]) * fx
+        return top + (bottom - top) * fy
+
+    def region_score(self, x, y, w, h):
+        """Sharpness of a rectangle given in image pixels"""
+        x1 = min(max(x, 0), self.width) * self.scale_x
+        x2 = min(max(x + w, 0), self.width) * self.scale_x
+        y1 = min(max(y, 0), self.height) * self.scale_y
+        y2 = min(max(y + h, 0), self.height) * self.scale_y
+        area = (x2 - x1) * (y2 - y1)
+        if area <= 0:
+            return 0.0
+        totals = (self._integral(x2, y2) - self._integral(x1, y2)
+                  - self._integral(x2, y1) + self._integral(x1, y1))
+        return combine_sharpness(self.metric, totals / area)
+
+    def score(self):
+        """Sharpness of the whole photo"""
+        return combine_sharpness(self.metric, self.plane_tiles.mean(axis=(1, 2), dtype=np.float64))
+
+    def face_sharpness(self, face_regions):
+        """Average sharpness of the center (eyes/nose area) of each face, 0 if there are none"""
+        scores = []
+        for (x, y, w, h) in face_regions:
+            pad_x = w * (1 - FACE_CENTER_FACTOR) / 2
+            pad_y = h * (1 - FACE_CENTER_FACTOR) / 2
+            scores.append(self.region_score(x + pad_x, y + pad_y, w - 2 * pad_x, h - 2 * pad_y))
+        return float(np.mean(scores)) if scores else 0.0
+
+    def composition_scores(self):
+        """Sharpness of the central third and of the sharpest rule-of-thirds point
+
+        Returns:
+            (center_sharpness, thirds_sharpness)
+        """
+        w, h = self.width, self.height
+        center = self.region_score(w / 3, h / 3, w / 3, h / 3)
+        thirds = max(self.region_score(px - w / 12, py - h / 12, w / 6, h / 6)
+                     for px in (w / 3, 2 * w / 3) for py in (h / 3, 2 * h / 3))
+        return center, thirds
+
+    def save_heatmap(self, path, face_regions=()):
+        """Save the tile map as a low-resolution color heatmap PNG (faces outlined)"""
+        tiles = self.tiles
+        peak = float(np.percentile(tiles, 99)) or 1.0
+        levels = np.clip(tiles * (255.0 / peak), 0, 255).astype(np.uint8)
+        heatmap = cv2.applyColorMap(levels, cv2.COLORMAP_INFERNO)
+        for (x, y, w, h) in face_regions:
+            cv2.rectangle(heatmap,
+                          (int(x * self.scale_x), int(y * self.scale_y)),
+                          (int((x + w) * self.scale_x), int((y + h) * self.scale_y)),
+                          (255, 255, 255), 1)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(str(path), heatmap)
+
+
+def focus_map_path(file_path):
+    """Where the focus heatmap of a photo is saved"""
+    file_path = Path(file_path)
+    return file_path.parent / FOCUS_MAP_DIRNAME / (file_path.stem + ".png")
+
+
+# Haar cascade used for face detection (ships with opencv-python in cv2.data)
+FACE_CASCADE_FILE = 'haarcascade_frontalface_default.xml'
+# Haar cascade used to find the eyes inside detected faces (also in cv2.data)
+EYE_CASCADE_FILE = 'haarcascade_eye.xml'
+# Detector models that ship in the models/ folder next to this script (see models/README.md)
+LBP_CASCADE_FILE = 'lbpcascade_frontalface_improved.xml'
+YUNET_MODEL_FILE = 'face_detection_yunet_2023mar.onnx'
+# YuNet is a CNN - larger inputs cost a lot and don't improve recall for portrait-sized faces
+YUNET_MAX_LONG_EDGE = 1600
+
+# Loaded detectors, per thread - a CascadeClassifier must not be used by two threads at once.
+# Worker processes each get their own copy, so every worker loads each model exactly once.
+_classifier_registry = threading.local()
+# Time spent loading detectors in this process (for timing instrumentation)
+_classifier_load_stats = {'loads': 0, 'seconds': 0.0}
+
+
+def get_models_dir():
+    """Folder with the bundled detector models (models/ next to the script or in the app bundle)"""
+    if getattr(sys, 'frozen', False):
+        # Running in PyInstaller bundle
+        return Path(sys._MEIPASS) / "models"
+    return Path(__file__).parent / "models"
+
+
+def model_path(filename):
+    """Location of a detector model file
+
+    The Haar cascades ship with opencv-python (cv2.data, bundled by PyInstaller
+    under cv2/data); the LBP cascade and the YuNet model ship in get_models_dir().
+    """
+    if filename in (LBP_CASCADE_FILE, YUNET_MODEL_FILE):
+        return get_models_dir() / filename
+    if getattr(sys, 'frozen', False):
+        bundled = Path(sys._MEIPASS) / 'cv2' / 'data' / filename
+        if bundled.exists():
+            return bundled
+    return Path(cv2.data.haarcascades) / filename
+
+
+def _load_once(key, loader):
+    """Return the model registered under key in this thread, calling loader() the first time"""
+    models = getattr(_classifier_registry, 'models', None)
+    if models is None:
+        models = _classifier_registry.models = {}
+    if key in models:
+        return models[key]
+
+    start = time.perf_counter()
+    model = loader()
+    _classifier_load_stats['loads'] += 1
+    _classifier_load_stats['seconds'] += time.perf_counter() - start
+
+    if model is None:
+        print(f"WARNING: Could not load {key} - face detection with it is disabled!")
+    # Remember failures too, so missing files aren't probed again for every photo
+    models[key] = model
+    return model
+
+
+def _load_cascade(filename):
+    cascade_path = model_path(filename)
+    if not cascade_path.exists():
+        return None
+    classifier = cv2.CascadeClassifier(str(cascade_path))
+    return None if classifier.empty() else classifier
+
+
+def _load_yunet():
+    yunet_path = model_path(YUNET_MODEL_FILE)
+    if not yunet_path.exists() or not hasattr(cv2, 'FaceDetectorYN'):
+        return None  # Needs the model file and OpenCV >= 4.5.4
+    return cv2.FaceDetectorYN.create(str(yunet_path), "", (320, 320), score_threshold=0.8)
+
+
+def get_cascade_classifier(filename):
+    """Return a loaded cv2.CascadeClassifier, parsing its XML only once per thread
+
+    Returns:
+        The classifier, or None if the cascade file can't be found
+    """
+    return _load_once(filename, lambda: _load_cascade(filename))
+
+
+def classifier_load_seconds():
+    """Total time this process has spent loading face detector models"""
+    return _classifier_load_stats['seconds']
+
+
+def classifier_loads():
+    """Number of face detector models this process has loaded (once per model and thread)"""
+    return _classifier_load_stats['loads']
+
+
+def _to_gray(image_array):
+    """8-bit luminance plane of an image (no copy if it already is one)"""
+    if len(image_array.shape) == 3:
+        return cv2.cvtColor(image_array.astype(np.uint8, copy=False), cv2.COLOR_RGB2GRAY)
+    return image_array.astype(np.uint8, copy=False)
+
+
+def _detect_faces_cascade(image_array, min_face_size, cascade_file, min_neighbors):
+    """Face detector backend for cascade classifiers (Haar or LBP)"""
+    classifier = get_cascade_classifier(cascade_file)
+    if classifier is None:
+        return None
+    # Parameters tuned for portrait photography with stricter settings to reduce false positives
+    faces = classifier.detectMultiScale(
+        _to_gray(image_array),
+        scaleFactor=1.1,
+        minNeighbors=min_neighbors,
+        minSize=(min_face_size, min_face_size),  # Large enough to avoid detecting small artifacts
+        flags=cv2.CASCADE_SCALE_IMAGE
+    )
+    return [tuple(face) for face in faces]
+
+
+def _detect_faces_haar(image_array, min_face_size):
+    # minNeighbors increased from 5 to 8 to reduce false positives
+    return _detect_faces_cascade(image_array, min_face_size, FACE_CASCADE_FILE, min_neighbors=8)
+
+
+def _detect_faces_lbp(image_array, min_face_size):
+    return _detect_faces_cascade(image_array, min_face_size, LBP_CASCADE_FILE, min_neighbors=6)
+
+
+def _detect_faces_yunet(image_array, min_face_size):
+    """Face detector backend for OpenCV's YuNet CNN (also finds profile and small faces)"""
+    detector = _load_once(YUNET_MODEL_FILE, _load_yunet)
+    if detector is None:
+        return None
+    if len(image_array.shape) == 3:
+        bgr = cv2.cvtColor(image_array.astype(np.uint8, copy=False), cv2.COLOR_RGB2BGR)
+    else:
+        bgr = cv2.cvtColor(image_array.astype(np.uint8, copy=False), cv2.COLOR_GRAY2BGR)
+    detector.setInputSize((bgr.shape[1], bgr.shape[0]))
+    _, faces = detector.detect(bgr)
+    if faces is None:
+        return []
+    return [tuple(face[:4]) for face in faces if min(face[2], face[3]) >= min_face_size]
+
+
+# Face detector backends: name -> (label, detect function, max input long edge or 0, needs color)
+# A detect function takes (image_array, min_face_size) and returns a list of (x, y, w, h)
+# boxes, or None if the backend's model isn't available. Backends that don't need color
+# are given the shared luminance plane.
+FACE_DETECTORS = {
+    'haar': ("Haar cascade (default)", _detect_faces_haar, 0, False),
+    'lbp': ("LBP cascade (fastest)", _detect_faces_lbp, 0, False),
+    'yunet': ("YuNet DNN (best recall)", _detect_faces_yunet, YUNET_MAX_LONG_EDGE, True),
+}
+DEFAULT_FACE_DETECTOR = 'haar'
+
+
+def face_detector_problem(detector):
+    """Why a face detector backend can't be used (without loading it), or None if it can"""
+    if detector not in FACE_DETECTORS:
+        return f"unknown face detector '{detector}'"
+    if detector == 'yunet' and not hasattr(cv2, 'FaceDetectorYN'):
+        return "the YuNet face detector needs OpenCV 4.5.4 or newer"
+    filename = {'haar': FACE_CASCADE_FILE, 'lbp': LBP_CASCADE_FILE, 'yunet': YUNET_MODEL_FILE}[detector]
+    if not model_path(filename).exists():
+        return (f"model file of face detector '{detector}' is missing: {model_path(filename)} "
+                f"(see models/README.md)")
+    return None
+
+
+def face_detector_available(detector):
+    """Check (without loading it) whether a face detector backend's model file can be found"""
+    return face_detector_problem(detector) is None
+
+
+def detect_faces(image_array, min_face_size=60, max_long_edge=0, detector=DEFAULT_FACE_DETECTOR):
+    """Detect faces in the image (OpenCV Haar cascade by default)
+
+    Args:
+        image_array: The image to analyze
+        min_face_size: Smallest face (in pixels of image_array) to report
+        max_long_edge: If set, detect on a copy downscaled to this long edge and
+                       map the boxes back to image_array coordinates (much faster)
+        detector: Backend name from FACE_DETECTORS; falls back to Haar if its model is missing
 
     Returns:
         List of face bounding boxes [(x, y, w, h), ...]
@@ -351,104 +969,186 @@ def detect_faces(image_array):
         if not HAS_CV2:
             return []
 
-        # Convert to grayscale if needed
-        if len(image_array.shape) == 3:
-            gray = cv2.cvtColor(image_array.astype(np.uint8), cv2.COLOR_RGB2GRAY)
-        else:
-            gray = image_array.astype(np.uint8)
+        _, detect, backend_long_edge, _ = FACE_DETECTORS.get(detector, FACE_DETECTORS[DEFAULT_FACE_DETECTOR])
+        long_edge = max_long_edge
+        if backend_long_edge:
+            long_edge = min(max_long_edge or backend_long_edge, backend_long_edge)
+
+        # Downscale large frames - the detector then starts from far fewer pixels
+        scale = 1.0
+        height, width = image_array.shape[:2]
+        image = image_array
+        if long_edge and max(height, width) > long_edge:
+            scale = long_edge / max(height, width)
+            image = cv2.resize(image_array, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        min_size = max(1, int(round(min_face_size * scale)))
+
+        faces = detect(image, min_size)
+        if faces is None and detector != DEFAULT_FACE_DETECTOR:
+            # Model not available - fall back to the built-in Haar cascade, on the
+            # caller's image and downscale (not the backend's own input cap)
+            return detect_faces(image_array, min_face_size, max_long_edge=max_long_edge,
+                                detector=DEFAULT_FACE_DETECTOR)
+        if faces is None:
+            return []
 
-        # Load Haar Cascade classifier for face detection
-        # Try multiple cascade files (different OpenCV versions store them differently)
-        # Also check bundled location for PyInstaller apps
-        bundled_cascade = None
-        if getattr(sys, 'frozen', False):
-            # Running in PyInstaller bundle
-            bundle_dir = sys._MEIPASS
-            bundled_cascade = os.path.join(bundle_dir, 'cv2', 'data', 'haarcascade_frontalface_default.xml')
+        # Map boxes back to the coordinates of the image that was passed in
+        boxes = []
+        for (x, y, w, h) in faces:
+            x1, y1 = max(0, int(round(x / scale))), max(0, int(round(y / scale)))
+            x2, y2 = min(width, int(round((x + w) / scale))), min(height, int(round((y + h) / scale)))
+            if x2 > x1 and y2 > y1:
+                boxes.append((x1, y1, x2 - x1, y2 - y1))
+        return boxes
 
-        cascade_paths = [
-            bundled_cascade,  # Try bundled location first
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml',
-            '/usr/local/share/opencv4/haarcascades/haarcascade_frontalface_default.xml',
-            '/usr/share/opencv/haarcascades/haarcascade_frontalface_default.xml',
-        ]
+    except Exception as e:
+        print(f"Face detection error: {e}")
+        return []
 
-        face_cascade = None
-        for cascade_path in cascade_paths:
-            if cascade_path and os.path.exists(cascade_path):
-                face_cascade = cv2.CascadeClassifier(cascade_path)
-                if not face_cascade.empty():
-                    break
 
-        if face_cascade is None or face_cascade.empty():
-            # Try to load from cv2.data (most reliable method)
-            try:
-                face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            except:
-                print("WARNING: Could not load face detection cascade - no photos will be selected!")
-                return []
-
-        # Detect faces
-        # Parameters tuned for portrait photography with stricter settings to reduce false positives
-        faces = face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.1,
-            minNeighbors=8,  # Increased from 5 to reduce false positives
-            minSize=(60, 60),  # Increased minimum size to avoid detecting small artifacts
-            flags=cv2.CASCADE_SCALE_IMAGE
-        )
+# Eye detection runs on the upper part of each face, resized to this width
+EYE_SEARCH_FACE_WIDTH = 160
+# Faces smaller than this (in analysis pixels) are too small to find eyes in
+EYE_MIN_FACE_SIZE = 80
 
-        return [(x, y, w, h) for (x, y, w, h) in faces]
 
-    except Exception as e:
-        print(f"Face detection error: {e}")
-        return []
+def detect_eyes(gray, face_regions):
+    """Find up to two eyes inside each detected face
+
+    The eye cascade only runs on the upper 60% of each face box, resized to
+    EYE_SEARCH_FACE_WIDTH, so it costs a fraction of the face detection.
+
+    Args:
+        gray: 8-bit grayscale image the face boxes refer to
+        face_regions: List of face boxes [(x, y, w, h), ...]
+
+    Returns:
+        List with the eye boxes [(x, y, w, h), ...] of each face (empty if none were found)
+    """
+    classifier = get_cascade_classifier(EYE_CASCADE_FILE)
+    eyes_per_face = []
+    for (x, y, w, h) in face_regions:
+        eyes = []
+        if classifier is not None and min(w, h) >= EYE_MIN_FACE_SIZE:
+            search = gray[max(0, y):y + int(h * 0.6), max(0, x):x + w]
+            scale = EYE_SEARCH_FACE_WIDTH / max(1, search.shape[1])
+            small = cv2.resize(search, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            eye_size = EYE_SEARCH_FACE_WIDTH // 10
+            found = classifier.detectMultiScale(small, scaleFactor=1.1, minNeighbors=5,
+                                                minSize=(eye_size, eye_size),
+                                                maxSize=(EYE_SEARCH_FACE_WIDTH // 2, EYE_SEARCH_FACE_WIDTH // 2))
+            # Keep the two largest candidates (brows and nostrils are smaller false positives)
+            for (ex, ey, ew, eh) in sorted(found, key=lambda box: box[2] * box[3], reverse=True)[:2]:
+                eyes.append((max(0, x) + int(ex / scale), max(0, y) + int(ey / scale),
+                             int(round(ew / scale)), int(round(eh / scale))))
+        eyes_per_face.append(eyes)
+    return eyes_per_face
+
+
+def eye_sharpness(gray, eyes, metric=DEFAULT_SHARPNESS_METRIC):
+    """Mean sharpness of eye patches, measured directly on the small crops"""
+    scores = [sharpness_score(gray[ey:ey + eh, ex:ex + ew], metric) for (ex, ey, ew, eh) in eyes]
+    return float(np.mean(scores)) if scores else 0.0
+
+
+# Long edge of the downscaled frame used for horizon detection
+HORIZON_MAX_LONG_EDGE = 1024
+# Gaussian blur kernel (px, on the downscaled frame) applied before edge detection
+HORIZON_BLUR_SIZE = 5
+# Longest line segments kept for the tilt estimate (busy scenes yield thousands)
+HORIZON_MAX_LINES = 200
+# Only tilts smaller than this (degrees) are considered horizon/vertical lines
+HORIZON_MAX_TILT = 10.0
+# Segments within this many degrees of the estimate count as agreeing with it
+HORIZON_AGREEMENT_DEGREES = 1.0
+# Tilts below this confidence are reported but not written into XMP
+TILT_MIN_CONFIDENCE = 0.5
+
+
+def segment_angles(segments):
+    """Direction (degrees) and length of (x1, y1, x2, y2) line segments, as arrays"""
+    segments = np.asarray(segments, dtype=np.float32).reshape(-1, 4)
+    dx = segments[:, 2] - segments[:, 0]
+    dy = segments[:, 3] - segments[:, 1]
+    return np.degrees(np.arctan2(dy, dx)), np.hypot(dx, dy)
+
+
+def estimate_tilt_angle(angles, weights=None, max_tilt=HORIZON_MAX_TILT):
+    """Weighted median tilt of a set of line directions
+
+    Directions are folded to -45..+45 degrees so horizontal and vertical lines both
+    count; lines tilted by max_tilt or more are ignored. Weights are typically line
+    lengths or Hough votes (uniform when omitted).
+
+    Returns:
+        (tilt angle in degrees, confidence 0-1) - the confidence is the share of the
+        kept weight within HORIZON_AGREEMENT_DEGREES of the angle
+    """
+    angles = (np.asarray(angles, dtype=np.float64).ravel() + 45.0) % 90.0 - 45.0
+    weights = np.ones_like(angles) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+    near = (np.abs(angles) < max_tilt) & (weights > 0)
+    if not near.any():
+        return 0.0, 0.0
+    angles, weights = angles[near], weights[near]
+
+    order = np.argsort(angles)
+    cumulative = np.cumsum(weights[order])
+    total = cumulative[-1]
+    angle = float(angles[order[np.searchsorted(cumulative, total / 2)]])
+    agreeing = np.abs(angles - angle) <= HORIZON_AGREEMENT_DEGREES
+    return angle, float(weights[agreeing].sum() / total)
 
 
 def detect_horizon_angle(image_array):
-    """Detect the tilt angle of the horizon/image using edge detection"""
+    """Detect the tilt angle of the horizon/image using edge detection
+
+    Runs Canny and the probabilistic Hough transform on a frame downscaled to
+    HORIZON_MAX_LONG_EDGE and keeps the HORIZON_MAX_LINES longest segments, whose
+    length-weighted median direction is the tilt (see estimate_tilt_angle). The
+    frame is blurred first: on an unblurred edge map the Hough transform links
+    texture (foliage, fabric, noise) into long segments at random angles.
+
+    Returns:
+        (tilt angle in degrees, confidence 0-1) - the confidence is the share of
+        near-horizontal/vertical line length that agrees with the angle
+    """
     try:
         if not HAS_CV2:
-            return 0.0
+            return 0.0, 0.0
 
         # Convert to grayscale if needed
-        if len(image_array.shape) == 3:
-            gray = cv2.cvtColor(image_array.astype(np.uint8), cv2.COLOR_RGB2GRAY)
-        else:
-            gray = image_array.astype(np.uint8)
+        gray = _to_gray(image_array)
+
+        # Work on a downscaled frame - tilt doesn't need full resolution
+        scale = min(1.0, HORIZON_MAX_LONG_EDGE / max(gray.shape[:2]))
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
 
-        # Apply Canny edge detection
+        # Apply Canny edge detection, after suppressing fine texture
+        gray = cv2.GaussianBlur(gray, (HORIZON_BLUR_SIZE, HORIZON_BLUR_SIZE), 0)
         edges = cv2.Canny(gray, 50, 150, apertureSize=3)
 
-        # Detect lines using Hough Transform
-        lines = cv2.HoughLines(edges, 1, np.pi / 180, 100)
+        # Detect line segments; short segments are texture, not horizons. A segment
+        # needs votes from at least half its minimum length in edge pixels
+        min_length = max(gray.shape[:2]) // 10
+        lines = cv2.HoughLinesP(edges, 1, np.pi / 180, max(1, min_length // 2),
+                                minLineLength=min_length, maxLineGap=min_length // 4)
 
         if lines is None or len(lines) == 0:
-            return 0.0
+            return 0.0, 0.0
 
-        # Calculate angles of detected lines
-        angles = []
-        for rho, theta in lines[:, 0]:
-            # Convert from Hough space to degrees
-            angle = (theta * 180 / np.pi) - 90
-            # Normalize to -45 to +45 degrees range
-            if angle > 45:
-                angle -= 90
-            elif angle < -45:
-                angle += 90
-            # Only consider small tilts (less than 10 degrees)
-            if abs(angle) < 10:
-                angles.append(angle)
-
-        if not angles:
-            return 0.0
+        # OpenCV 4 returns an (N, 1, 4) array, OpenCV 5 an (N, 4) one
+        angles, lengths = segment_angles(lines)
+        if len(lengths) > HORIZON_MAX_LINES:
+            keep = np.argpartition(lengths, -HORIZON_MAX_LINES)[-HORIZON_MAX_LINES:]
+            angles, lengths = angles[keep], lengths[keep]
 
-        # Return median angle (more robust than mean)
-        return float(np.median(angles))
+        return estimate_tilt_angle(angles, lengths)
 
     except Exception as e:
         print(f"Horizon detection error: {e}")
-        return 0.0
+        return 0.0, 0.0
 
 
 def calculate_brightness(image_array):
@@ -460,13 +1160,16 @@ def calculate_brightness(image_array):
     try:
         # Convert to grayscale if needed
         if len(image_array.shape) == 3:
-            # Use perceptual luminance formula (Y = 0.299*R + 0.587*G + 0.114*B)
-            gray = 0.299 * image_array[:,:,0] + 0.587 * image_array[:,:,1] + 0.114 * image_array[:,:,2]
+            if HAS_CV2:
+                # Perceptual luminance (Y = 0.299*R + 0.587*G + 0.114*B) as an 8-bit plane
+                gray = _to_gray(image_array)
+            else:
+                gray = 0.299 * image_array[:,:,0] + 0.587 * image_array[:,:,1] + 0.114 * image_array[:,:,2]
         else:
             gray = image_array
 
-        # Calculate mean brightness
-        brightness = float(np.mean(gray))
+        # Calculate mean brightness (cv2.mean avoids a float64 copy of the plane)
+        brightness = float(cv2.mean(gray)[0]) if HAS_CV2 else float(np.mean(gray))
         return brightness
 
     except Exception as e:
@@ -474,8 +1177,809 @@ def calculate_brightness(image_array):
         return 128.0  # Return neutral brightness on error
 
 
-def analyze_photo(file_path, sharpness_threshold=100, detect_tilt=False, include_vertical=True, max_brightness=255, min_brightness=0, require_faces=True):
-    """Analyze a photo for sharpness, orientation, tilt angle, and brightness
+# Auto exposure: selected photos get an exposure offset that moves their median
+# luminance (8-bit, gamma-encoded) to this level, roughly middle gray...
+AUTO_EXPOSURE_TARGET = 118
+# ...by at most this many stops either way
+AUTO_EXPOSURE_MAX_EV = 1.5
+# Smaller corrections aren't written
+AUTO_EXPOSURE_MIN_EV = 0.1
+# Brightening stops before this percentile of the luminance would clip
+AUTO_EXPOSURE_HIGHLIGHT_PERCENTILE = 99
+# Gamma of the 8-bit analysis image, to convert luminance levels to linear light
+ANALYSIS_GAMMA = 2.2
+
+
+def luminance_stats(gray):
+    """Mean, median and highlight luminance of an 8-bit plane from a single histogram
+
+    Returns:
+        (mean brightness, median level, AUTO_EXPOSURE_HIGHLIGHT_PERCENTILE level)
+    """
+    histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    cumulative = np.cumsum(histogram)
+    total = cumulative[-1]
+    if total == 0:
+        return 128.0, None, None
+    mean = float(np.dot(histogram, np.arange(256)) / total)
+    median = int(np.searchsorted(cumulative, total * 0.5))
+    highlight = int(np.searchsorted(cumulative, total * AUTO_EXPOSURE_HIGHLIGHT_PERCENTILE / 100))
+    return mean, median, highlight
+
+
+def exposure_offset(photo, target=AUTO_EXPOSURE_TARGET, max_ev=AUTO_EXPOSURE_MAX_EV):
+    """Exposure correction in stops that brings a photo's median luminance to target
+
+    Brightening is limited so the highlight percentile doesn't clip. Returns 0
+    for photos without luminance statistics and for corrections below
+    AUTO_EXPOSURE_MIN_EV.
+    """
+    median, highlight = photo.get('luminance_median'), photo.get('luminance_p99')
+    if median is None or highlight is None:
+        return 0.0
+    offset = ANALYSIS_GAMMA * np.log2(target / max(median, 1))
+    if offset > 0:
+        offset = min(offset, ANALYSIS_GAMMA * np.log2(255 / max(highlight, 1)))
+    offset = float(np.clip(offset, -max_ev, max_ev))
+    return round(offset, 2) if abs(offset) >= AUTO_EXPOSURE_MIN_EV else 0.0
+
+
+# Image sources for analysis, from most accurate to fastest
+ANALYSIS_MODES = {
+    'full': "Full resolution (most accurate)",
+    'half': "Half-size demosaic (~4x faster)",
+    'preview': "Embedded JPEG preview (fastest)",
+}
+DEFAULT_ANALYSIS_MODE = 'full'
+# Embedded previews with a smaller long edge than this fall back to a half-size demosaic
+MIN_PREVIEW_LONG_EDGE = 1000
+# Minimum face size in pixels at full resolution (scaled down for smaller analysis images)
+MIN_FACE_SIZE = 60
+# Long edge (px) of the downscaled copy used for face detection; 0 = analysis resolution
+FACE_DETECTION_SIZES = (0, 3000, 2000, 1600, 1200)
+DEFAULT_FACE_DETECTION_SIZE = 0
+
+
+def _rotate_for_flip(image_array, flip):
+    """Rotate an embedded preview to match LibRaw's orientation flag (raw.sizes.flip)"""
+    if flip == 3:
+        return np.rot90(image_array, 2)
+    if flip == 5:
+        return np.rot90(image_array, 1)   # 90 degrees counter-clockwise
+    if flip == 6:
+        return np.rot90(image_array, -1)  # 90 degrees clockwise
+    return image_array
+
+
+def get_output_dimensions(raw):
+    """Return (width, height) of the developed image, taking camera orientation into account"""
+    width, height = raw.sizes.width, raw.sizes.height
+    if raw.sizes.flip in (5, 6):
+        width, height = height, width
+    return width, height
+
+
+def extract_thumbnail(raw):
+    """The camera's embedded preview of an open rawpy file, or None if it has none"""
+    try:
+        return raw.extract_thumb()
+    except (rawpy.LibRawNoThumbnailError, rawpy.LibRawUnsupportedThumbnailError):
+        return None
+
+
+def load_analysis_image(raw, mode=DEFAULT_ANALYSIS_MODE, thumb=None):
+    """Load an 8-bit RGB image from an open rawpy file for analysis
+
+    Args:
+        raw: Open rawpy.RawPy object
+        mode: 'full' (full demosaic), 'half' (half-size demosaic) or 'preview'
+              (camera's embedded JPEG, falls back to 'half' if missing or too small)
+        thumb: Embedded preview if already extracted (see extract_thumbnail)
+
+    Returns:
+        (image_array, mode_used)
+    """
+    if mode == 'preview':
+        if thumb is None:
+            thumb = extract_thumbnail(raw)
+
+        preview = None
+        if thumb is not None:
+            if thumb.format == rawpy.ThumbFormat.JPEG:
+                # Orientation comes from LibRaw's flip flag, not the preview's EXIF
+                preview = cv2.imdecode(np.frombuffer(thumb.data, dtype=np.uint8),
+                                       cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+                if preview is not None:
+                    preview = cv2.cvtColor(preview, cv2.COLOR_BGR2RGB)
+            elif thumb.format == rawpy.ThumbFormat.BITMAP:
+                preview = thumb.data
+
+        if preview is not None and max(preview.shape[:2]) >= MIN_PREVIEW_LONG_EDGE:
+            return np.ascontiguousarray(_rotate_for_flip(preview, raw.sizes.flip)), 'preview'
+        mode = 'half'
+
+    image_array = raw.postprocess(use_camera_wb=True, half_size=(mode == 'half'), output_bps=8)
+    return image_array, mode
+
+
+def perceptual_hash(gray):
+    """64-bit DCT perceptual hash (pHash) of a grayscale image, as 16 hex digits
+
+    Near-identical frames (same scene, slightly moved) differ in only a few
+    bits; see hash_distance.
+    """
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])  # DC term excluded from the median
+    return f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+
+def read_capture_time(raw, thumb=None):
+    """Capture time of a photo in seconds (epoch, local time), or None if unknown
+
+    Prefers the EXIF DateTimeOriginal (with sub-seconds) of the embedded JPEG
+    preview, falling back to the timestamp LibRaw reads from the RAW metadata.
+    """
+    if thumb is not None and thumb.format == rawpy.ThumbFormat.JPEG:
+        try:
+            exif = Image.open(io.BytesIO(thumb.data)).getexif()
+            exif_ifd = exif.get_ifd(0x8769)
+            taken = exif_ifd.get(36867) or exif.get(306)  # DateTimeOriginal, DateTime
+            if taken:
+                seconds = datetime.strptime(str(taken).strip(), "%Y:%m:%d %H:%M:%S").timestamp()
+                subsec = str(exif_ifd.get(37521, "")).strip()  # SubSecTimeOriginal
+                return seconds + (float("0." + subsec) if subsec.isdigit() else 0.0)
+        except Exception:
+            pass
+    try:
+        timestamp = raw.other.timestamp  # rawpy >= 0.19
+        if isinstance(timestamp, datetime):
+            return timestamp.timestamp()
+        return float(timestamp) if timestamp else None
+    except Exception:
+        return None
+
+
+def preview_fingerprint(raw, thumb=None):
+    """Capture time and perceptual hash of a photo from its embedded preview
+
+    Cheap enough to run before the analysis: the JPEG preview is decoded at
+    1/8 size. Returns (capture_time or None, phash or None if there's no
+    usable preview).
+    """
+    if thumb is None:
+        thumb = extract_thumbnail(raw)
+    phash = None
+    if thumb is not None:
+        if thumb.format == rawpy.ThumbFormat.JPEG:
+            gray = cv2.imdecode(np.frombuffer(thumb.data, dtype=np.uint8),
+                                cv2.IMREAD_REDUCED_GRAYSCALE_8 | cv2.IMREAD_IGNORE_ORIENTATION)
+        else:
+            gray = _to_gray(thumb.data)
+        if gray is not None and gray.size:
+            phash = perceptual_hash(np.ascontiguousarray(_rotate_for_flip(gray, raw.sizes.flip)))
+    return read_capture_time(raw, thumb), phash
+
+
+def measure_tilt(file_path):
+    """Horizon tilt of a photo as (angle, confidence), measured on its embedded preview
+
+    detect_horizon_angle works on a ~1000px copy anyway, so the preview gives the
+    same estimate as the full image without the demosaic. Photos without a large
+    enough preview fall back to a half-size demosaic (see load_analysis_image).
+    """
+    mode = 'half' if preview_strategy(file_path) == 'thumbnail' else 'preview'
+    with rawpy.imread(file_path) as raw:
+        image_array, _ = load_analysis_image(raw, mode)
+    return detect_horizon_angle(_to_gray(image_array))
+
+
+# Early reject: frames whose embedded preview fails a threshold by a clear margin skip
+# the demosaic and all further stages. Brightness must miss min/max by this many levels
+EARLY_REJECT_BRIGHTNESS_MARGIN = 20
+# ... and even the sharpest preview tile must score below this fraction of the threshold
+# (the downscaled, in-camera sharpened preview scores higher than the full image).
+# Per sharpness metric: Sobel and Tenengrad are gradient magnitudes, the Laplacian
+# variance is on a squared scale, so its margin is the square of theirs
+EARLY_REJECT_SHARPNESS_RATIOS = {
+    'sobel': 0.25,
+    'tenengrad': 0.25,
+    'laplacian': 0.25 ** 2,
+}
+# Tiles along the long edge of the preview's coarse sharpness map
+EARLY_REJECT_TILES = 32
+# Smaller previews are too coarse to judge - those photos are always fully analyzed.
+# Larger JPEG previews are decoded at 1/2, 1/4 or 1/8 size, staying above this
+EARLY_REJECT_MIN_LONG_EDGE = 640
+# JPEG reduced-size decode flags by scale factor, largest first
+REDUCED_GRAYSCALE_DECODES = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                             (2, cv2.IMREAD_REDUCED_GRAYSCALE_2)) if HAS_CV2 else ()
+# Early-reject reasons, in the order they're checked
+EARLY_REJECT_REASONS = {'too_dark': "too dark", 'burned_out': "burned out", 'blurry': "blurry"}
+# analyze_photo thresholds the early-reject decision depends on
+EARLY_REJECT_THRESHOLDS = ('sharpness_threshold', 'min_brightness', 'max_brightness')
+
+
+def early_reject_reason(brightness, coarse_sharpness, sharpness_threshold=100, min_brightness=0, max_brightness=255,
+                        sharpness_metric=DEFAULT_SHARPNESS_METRIC):
+    """Why a photo clearly fails the thresholds judging by its preview, or None if it may pass
+
+    coarse_sharpness must come from sharpness_metric (see EARLY_REJECT_SHARPNESS_RATIOS).
+    Also used to check whether a cached early reject still holds for new thresholds.
+    """
+    if brightness < min_brightness - EARLY_REJECT_BRIGHTNESS_MARGIN:
+        return 'too_dark'
+    if brightness > max_brightness + EARLY_REJECT_BRIGHTNESS_MARGIN:
+        return 'burned_out'
+    if coarse_sharpness < sharpness_threshold * EARLY_REJECT_SHARPNESS_RATIOS[sharpness_metric]:
+        return 'blurry'
+    return None
+
+
+def prescreen_preview(thumb, metric=DEFAULT_SHARPNESS_METRIC):
+    """Brightness and coarse sharpness (of the sharpest tile) of an embedded preview
+
+    The sharpest tile rather than the whole frame is used so that a sharp subject
+    in front of a blurred background isn't mistaken for a blurry photo.
+
+    Returns:
+        (brightness, coarse sharpness), or None without a usable preview
+    """
+    if thumb is None:
+        return None
+    if thumb.format == rawpy.ThumbFormat.JPEG:
+        # The coarse map only needs ~EARLY_REJECT_MIN_LONG_EDGE px - the JPEG decoder
+        # can skip most of the work of a full-size preview (size from the header)
+        flag = cv2.IMREAD_GRAYSCALE
+        try:
+            long_edge = max(Image.open(io.BytesIO(thumb.data)).size)
+            flag = next((reduced for factor, reduced in REDUCED_GRAYSCALE_DECODES
+                         if long_edge // factor >= EARLY_REJECT_MIN_LONG_EDGE), flag)
+        except Exception:
+            pass  # Unreadable header - let OpenCV decode (or reject) it at full size
+        gray = cv2.imdecode(np.frombuffer(thumb.data, dtype=np.uint8), flag | cv2.IMREAD_IGNORE_ORIENTATION)
+    else:
+        gray = _to_gray(thumb.data)
+    if gray is None or max(gray.shape[:2]) < EARLY_REJECT_MIN_LONG_EDGE:
+        return None
+    coarse = SharpnessMap(gray, tiles=EARLY_REJECT_TILES, metric=metric).tiles.max()
+    return calculate_brightness(gray), float(coarse)
+
+
+def summarize_early_rejects(results):
+    """Early-reject counts per reason and the analysis time they saved
+
+    The saving is estimated from the average time of the fully analyzed photos;
+    cached results carry no timings and are left out of it.
+
+    Returns:
+        (dict reason -> count, seconds saved or None)
+    """
+    counts = {}
+    for result in results:
+        reason = result.get('early_reject')
+        if reason:
+            counts[reason] = counts.get(reason, 0) + 1
+    full = [sum(r['timings'].values()) for r in results
+            if r.get('timings') and 'decode' in r['timings'] and not r.get('early_reject')]
+    rejected = [sum(r['timings'].values()) for r in results if r.get('timings') and r.get('early_reject')]
+    if not full or not rejected:
+        return counts, None
+    return counts, len(rejected) * sum(full) / len(full) - sum(rejected)
+
+
+@contextmanager
+def timed_stage(timings, stage):
+    """Add the wall-clock time of a with-block to timings[stage]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def summarize_timings(results):
+    """Aggregate per-stage timings of analysis results
+
+    Returns:
+        dict mapping stage name to (total_seconds, photo_count)
+    """
+    summary = {}
+    for result in results:
+        for stage, seconds in result.get('timings', {}).items():
+            total, count = summary.get(stage, (0.0, 0))
+            summary[stage] = (total + seconds, count + 1)
+    return summary
+
+
+class AnalysisContext:
+    """Decoded image shared by all metric stages of one photo
+
+    The 8-bit luminance plane is computed once here; face detection, sharpness
+    and brightness all read it (or slices of it) instead of converting the
+    RGB image again or promoting it to float64.
+    """
+
+    def __init__(self, rgb):
+        self.rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+        if HAS_CV2:
+            self.gray = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY)
+        else:
+            self.gray = np.mean(self.rgb, axis=2).astype(np.uint8)
+
+    @property
+    def shape(self):
+        return self.gray.shape
+
+
+def extract_photo_metrics(file_path, analysis_mode=DEFAULT_ANALYSIS_MODE, face_detection_size=DEFAULT_FACE_DETECTION_SIZE, face_detector=DEFAULT_FACE_DETECTOR, focus_maps=False, sharpness_metric=DEFAULT_SHARPNESS_METRIC, eye_detection=True, early_reject=None, data=None):
+    """Measure sharpness, faces, brightness and orientation of a photo
+
+    These metrics don't depend on any selection threshold, so they can be cached
+    and re-evaluated with different settings (see evaluate_selection). The one
+    exception is early_reject: photos whose preview clearly fails the given
+    thresholds are returned with preview-based metrics right away, without
+    decoding the RAW data (see early_reject_reason). Horizon tilt is only
+    needed for selected photos and is measured later (see measure_tilts).
+
+    Args:
+        file_path: Path to the photo file
+        analysis_mode: Image source used for analysis (see ANALYSIS_MODES)
+        face_detection_size: Long edge to downscale to for face detection (0 = don't downscale)
+        face_detector: Face detector backend (see FACE_DETECTORS)
+        focus_maps: Save a focus heatmap of the photo (see focus_map_path)
+        sharpness_metric: Sharpness metric (see SHARPNESS_METRICS)
+        eye_detection: Score faces by the sharpness of their eyes when they can be found
+        early_reject: Optional dict of EARLY_REJECT_THRESHOLDS to prescreen the preview with
+        data: Optional file contents already read into memory (see PrefetchReader);
+              LibRaw decodes from these bytes instead of opening file_path
+    """
+    mode_used = analysis_mode
+    face_regions = []
+    eye_regions = []  # Eye boxes of each face
+    capture_time = phash = None
+    brightness = 128.0  # Default mid-brightness
+    luminance_median = luminance_p99 = None
+    center_sharpness = thirds_sharpness = 0.0
+    timings = {}  # Seconds spent per analysis stage
+    if not HAS_RAWPY:
+        # Fallback: just check file size as proxy (larger files are assumed to be better quality)
+        file_size = os.path.getsize(file_path) / (1024 * 1024)  # MB
+        sharpness = file_size * 10
+        width, height = 6000, 4000  # Default Sony ARW dimensions
+    else:
+        start = time.perf_counter()
+        with rawpy.imread(io.BytesIO(data) if data is not None else file_path) as raw:
+            # Full resolution gives the most accurate face detection; 'half' and
+            # 'preview' trade some accuracy for a much cheaper decode
+            mode = analysis_mode
+            if mode == 'preview' and preview_strategy(file_path) == 'thumbnail':
+                mode = 'half'  # The embedded thumbnail is too small to analyze
+            thumb = extract_thumbnail(raw)
+
+            # Cheap checks on the preview first - clearly black, blown out or
+            # blurry frames skip the demosaic and every later stage
+            if early_reject is not None and HAS_CV2:
+                prescreen = prescreen_preview(thumb, sharpness_metric)
+                reason = (early_reject_reason(*prescreen, sharpness_metric=sharpness_metric, **early_reject)
+                          if prescreen else None)
+                if reason:
+                    capture_time, phash = preview_fingerprint(raw, thumb)
+                    width, height = get_output_dimensions(raw)
+                    timings['prescreen'] = time.perf_counter() - start
+                    return {
+                        'sharpness': prescreen[1],
+                        'width': width,
+                        'height': height,
+                        'face_count': 0,
+                        'face_regions': [],
+                        'eye_count': 0,
+                        'center_sharpness': 0.0,
+                        'thirds_sharpness': 0.0,
+                        'brightness': prescreen[0],
+                        'capture_time': capture_time,
+                        'phash': phash,
+                        'analysis_mode': 'preview',
+                        'early_reject': reason,
+                        'timings': timings
+                    }
+
+            img_array_color, mode_used = load_analysis_image(raw, mode, thumb)
+            width, height = get_output_dimensions(raw)
+            ctx = AnalysisContext(img_array_color)
+            del img_array_color
+            timings['decode'] = time.perf_counter() - start
+
+            # Capture time and perceptual hash for burst grouping
+            with timed_stage(timings, 'fingerprint'):
+                capture_time, phash = preview_fingerprint(raw, thumb)
+                if phash is None:
+                    phash = perceptual_hash(ctx.gray)
+            del thumb
+
+            # Scale the minimum face size to the analysis resolution
+            scale = max(ctx.shape) / max(width, height, 1)
+            min_face_size = max(20, int(round(MIN_FACE_SIZE * scale)))
+
+            # Detect faces first
+            load_before = classifier_load_seconds()
+            with timed_stage(timings, 'faces'):
+                needs_color = FACE_DETECTORS.get(face_detector, FACE_DETECTORS[DEFAULT_FACE_DETECTOR])[3]
+                face_input = ctx.rgb if needs_color else ctx.gray
+                face_regions = detect_faces(face_input, min_face_size, face_detection_size, face_detector) if HAS_CV2 else []
+            # Report the one-off classifier load separately from detection itself
+            cascade_load = classifier_load_seconds() - load_before
+            if cascade_load > 0:
+                timings['cascade_load'] = cascade_load
+                timings['faces'] -= cascade_load
+
+            # Locate the eyes inside the faces - they're what has to be in focus
+            if eye_detection and face_regions and HAS_CV2:
+                load_before = classifier_load_seconds()
+                with timed_stage(timings, 'eyes'):
+                    eye_regions = detect_eyes(ctx.gray, face_regions)
+                cascade_load = classifier_load_seconds() - load_before
+                if cascade_load > 0:
+                    timings['cascade_load'] = timings.get('cascade_load', 0.0) + cascade_load
+                    timings['eyes'] -= cascade_load
+
+            # Calculate sharpness (focused on eyes or faces if detected) from one
+            # tiled gradient map that every region is scored against
+            with timed_stage(timings, 'sharpness'):
+                sharpness_map = SharpnessMap(ctx.gray, metric=sharpness_metric)
+                if face_regions:
+                    # Faces without detected eyes fall back to the center of the face box
+                    face_scores = [eye_sharpness(ctx.gray, eyes, sharpness_metric) if eyes
+                                   else sharpness_map.face_sharpness([face])
+                                   for face, eyes in zip(face_regions, eye_regions or [[]] * len(face_regions))]
+                    sharpness = float(np.mean(face_scores))
+                else:
+                    sharpness = sharpness_map.score()
+                center_sharpness, thirds_sharpness = sharpness_map.composition_scores()
+            if focus_maps:
+                with timed_stage(timings, 'focus_map'):
+                    sharpness_map.save_heatmap(focus_map_path(file_path),
+                                               list(face_regions) + [eye for eyes in eye_regions for eye in eyes])
+
+            # Brightness and the auto-exposure statistics, from one histogram
+            with timed_stage(timings, 'brightness'):
+                brightness, luminance_median, luminance_p99 = luminance_stats(ctx.gray)
+
+    return {
+        'sharpness': float(sharpness),
+        'width': width,
+        'height': height,
+        'face_count': len(face_regions),
+        'face_regions': [list(face) for face in face_regions],
+        'eye_count': sum(len(eyes) for eyes in eye_regions),
+        'center_sharpness': center_sharpness,
+        'thirds_sharpness': thirds_sharpness,
+        'brightness': brightness,
+        'luminance_median': luminance_median,
+        'luminance_p99': luminance_p99,
+        'capture_time': capture_time,
+        'phash': phash,
+        'analysis_mode': mode_used,
+        'early_reject': None,
+        'timings': timings
+    }
+
+
+# Frames taken at most this many seconds apart...
+BURST_MAX_GAP_SECONDS = 2.0
+# ...whose perceptual hashes differ in at most this many bits belong to one burst
+BURST_MAX_DISTANCE = 12
+# Frames this similar are near-duplicates even when taken at different times
+DUPLICATE_MAX_DISTANCE = 4
+
+
+def _popcount64(values):
+    """Number of set bits of each element of a uint64 array"""
+    if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+        return np.bitwise_count(values)
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return np.unpackbits(values.view(np.uint8)).reshape(values.shape + (64,)).sum(axis=-1)
+
+
+def parse_phashes(phashes):
+    """Convert hex pHash strings (None for missing) to (uint64 array, valid mask)"""
+    valid = np.array([bool(h) for h in phashes], dtype=bool)
+    hashes = np.array([int(h, 16) if h else 0 for h in phashes], dtype=np.uint64)
+    return hashes, valid
+
+
+def hash_distance(a, b):
+    """Hamming distance between two hex pHash strings"""
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def find_similar_pairs(hashes, max_distance):
+    """All index pairs (i < j) whose hashes differ in at most max_distance bits
+
+    Multi-index hashing: the 64 bits are split into max_distance + 1 chunks.
+    Two hashes within the distance must agree exactly on at least one chunk
+    (pigeonhole), so only frames sharing a chunk value are ever compared,
+    which keeps this near-linear on real shoots.
+    """
+    count = len(hashes)
+    pairs = set()
+    bounds = np.linspace(0, 64, max_distance + 2).astype(int)
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        keys = (hashes >> np.uint64(low)) & np.uint64((1 << int(high - low)) - 1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], count]
+        shared = ends - starts > 1
+        for start, end in zip(starts[shared], ends[shared]):
+            members = order[start:end]
+            member_hashes = hashes[members]
+            close = _popcount64(member_hashes[:, None] ^ member_hashes[None, :]) <= max_distance
+            first, second = np.nonzero(np.triu(close, 1))
+            pairs.update(zip(np.minimum(members[first], members[second]).tolist(),
+                             np.maximum(members[first], members[second]).tolist()))
+    return pairs
+
+
+def group_bursts(capture_times, hashes, has_hash, max_gap=BURST_MAX_GAP_SECONDS,
+                 burst_distance=BURST_MAX_DISTANCE, duplicate_distance=DUPLICATE_MAX_DISTANCE):
+    """Cluster frames into bursts / near-duplicate groups
+
+    Frames are joined (union-find) when they were taken within max_gap seconds
+    of each other and look alike (pHash distance <= burst_distance), or when
+    they are near-identical (<= duplicate_distance) whatever their capture time.
+
+    Args:
+        capture_times: float array of capture times in seconds (nan if unknown)
+        hashes, has_hash: pHashes and their valid mask (see parse_phashes)
+
+    Returns:
+        int array with a group id per frame (frames without a burst are their own group)
+    """
+    pairs = []
+
+    # Frames close in time: compare each with the frames of the preceding max_gap seconds
+    timed = np.flatnonzero(~np.isnan(capture_times) & has_hash)
+    order = timed[np.argsort(capture_times[timed], kind='stable')]
+    times = capture_times[order]
+    window_start = 0
+    for k in range(1, len(order)):
+        while times[k] - times[window_start] > max_gap:
+            window_start += 1
+        if window_start < k:
+            previous = order[window_start:k]
+            distances = _popcount64(hashes[previous] ^ hashes[order[k]])
+            pairs.extend((order[k], j) for j in previous[distances <= burst_distance])
+
+    # Near-identical frames at any time, found through the hash index
+    with_hash = np.flatnonzero(has_hash)
+    pairs.extend((with_hash[i], with_hash[j]) for i, j in find_similar_pairs(hashes[with_hash], duplicate_distance))
+
+    return connected_components(len(hashes), pairs)
+
+
+def connected_components(count, pairs):
+    """Union-find over index pairs; returns the smallest member index of each element's group"""
+    parent = np.arange(count)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+    return np.array([find(i) for i in range(count)], dtype=np.int64)
+
+
+def find_duplicates(file_paths, fingerprints, max_distance=DUPLICATE_MAX_DISTANCE):
+    """Find copies of the same shot among photos, from their preview fingerprints
+
+    Two photos are duplicates when their previews are near-identical (pHash
+    distance <= max_distance) and they were captured at the same moment - e.g.
+    the same card copied twice into one folder. The moment is only trusted to
+    the sub-second: capture times in whole seconds (no SubSecTimeOriginal) or
+    no capture time at all need identical hashes of equally sized files, since
+    burst frames shot within the same second look alike too. Burst frames are
+    left to the burst grouping.
+
+    Args:
+        file_paths: Photo paths
+        fingerprints: (capture_time, phash) per photo, None if unknown (see scan_fingerprints)
+
+    Returns:
+        dict mapping the index of each duplicate to the index of the photo kept
+        (the first of its group)
+    """
+    fingerprints = [fingerprint or (None, None) for fingerprint in fingerprints]
+    hashes, has_hash = parse_phashes([phash for _, phash in fingerprints])
+    with_hash = np.flatnonzero(has_hash)
+
+    def same_shot(i, j):
+        time_i, time_j = fingerprints[i][0], fingerprints[j][0]
+        if time_i is not None and time_j is not None:
+            if abs(time_i - time_j) >= 1e-3:
+                return False
+            if time_i % 1 and time_j % 1:  # Both to the sub-second
+                return True
+        if hashes[i] != hashes[j]:
+            return False
+        try:
+            return os.path.getsize(file_paths[i]) == os.path.getsize(file_paths[j])
+        except OSError:
+            return False
+
+    pairs = [(with_hash[i], with_hash[j]) for i, j in find_similar_pairs(hashes[with_hash], max_distance)
+             if same_shot(with_hash[i], with_hash[j])]
+    groups = connected_components(len(file_paths), pairs)
+    return {index: int(keep) for index, keep in enumerate(groups) if keep != index}
+
+
+def watched_duplicate_of(photos, result, max_distance=DUPLICATE_MAX_DISTANCE):
+    """The photo among photos that a newly analyzed photo is a copy of, or None
+
+    Same rules as find_duplicates, between the new photo and the ones analyzed
+    before it - watch mode gets its photos one at a time, so the prescan of the
+    whole folder can't catch a card that's copied in twice.
+    """
+    if result.get('phash') is None:
+        return None
+    candidates = [p for p in photos if p.get('phash') is not None]  # Duplicates and failures carry no hash
+    duplicates = find_duplicates([p['path'] for p in candidates] + [result['path']],
+                                 [(p.get('capture_time'), p['phash']) for p in candidates]
+                                 + [(result.get('capture_time'), result['phash'])],
+                                 max_distance)
+    keep = duplicates.get(len(candidates))
+    return None if keep is None else candidates[keep]
+
+
+def build_metrics_table(photos):
+    """Collect the selection-relevant metrics of analyzed photos into NumPy arrays
+
+    Built once after analysis, so thresholds can be re-applied to thousands of
+    photos with a handful of vectorized comparisons (see select_photos). Bursts
+    are grouped here too, since they don't depend on the thresholds.
+    """
+    capture_times = np.array([p.get('capture_time') if p.get('capture_time') is not None else np.nan
+                              for p in photos], dtype=np.float64)
+    hashes, has_hash = parse_phashes([p.get('phash') for p in photos])
+    burst = group_bursts(capture_times, hashes, has_hash)
+    return {
+        'sharpness': np.array([p.get('sharpness', 0) for p in photos], dtype=np.float64),
+        'brightness': np.array([p.get('brightness', 128.0) for p in photos], dtype=np.float64),
+        'face_count': np.array([p.get('face_count', 0) for p in photos], dtype=np.int32),
+        'is_horizontal': np.array([p.get('width', 0) > p.get('height', 0) for p in photos], dtype=bool),
+        'failed': np.array([bool(p.get('error')) for p in photos], dtype=bool),
+        'duplicate': np.array([bool(p.get('duplicate_of')) for p in photos], dtype=bool),
+        'early_reject': np.array([bool(p.get('early_reject')) for p in photos], dtype=bool),
+        'burst': burst,
+        'burst_size': np.bincount(burst, minlength=len(photos))[burst] if len(photos) else burst,
+        # Kept for append_metrics_row
+        'capture_time': capture_times,
+        'phash': hashes,
+        'has_hash': has_hash,
+    }
+
+
+def append_metrics_row(table, photo, max_gap=BURST_MAX_GAP_SECONDS, burst_distance=BURST_MAX_DISTANCE,
+                       duplicate_distance=DUPLICATE_MAX_DISTANCE):
+    """Metrics table with one more analyzed photo at the end (watch mode)
+
+    Gives the same table as build_metrics_table on all photos, but only the new
+    frame is compared with the others (same rules as group_bursts): it joins,
+    and possibly merges, the bursts it matches, and only their sizes change.
+    """
+    row = build_metrics_table([photo])
+    index = len(table['burst'])
+    appended = {key: np.concatenate((table[key], row[key])) for key in table}
+    burst = appended['burst']
+    burst[index] = index
+    members = np.array([index])
+    if row['has_hash'][0]:
+        distances = _popcount64(table['phash'] ^ row['phash'][0])
+        close_in_time = np.abs(table['capture_time'] - row['capture_time'][0]) <= max_gap  # False without times
+        matches = table['has_hash'] & ((distances <= duplicate_distance)
+                                       | (close_in_time & (distances <= burst_distance)))
+        groups = np.unique(table['burst'][matches])
+        if len(groups):
+            # Groups are labeled by their smallest member, as in connected_components
+            members = np.append(np.flatnonzero(np.isin(burst, groups)), index)
+            burst[members] = groups[0]
+    appended['burst_size'][members] = len(members)
+    return appended
+
+
+def select_photos(table, sharpness_threshold=100, include_vertical=True, max_brightness=255, min_brightness=0, require_faces=True, burst_keep=0, sharpness_metric=DEFAULT_SHARPNESS_METRIC):
+    """Decide which photos are selected, for a whole metrics table at once
+
+    Rejects photos that are too bright (burned out/overexposed) or too dark (underexposed/faded).
+    With burst_keep, only the best burst_keep selected frames of each burst are kept
+    (frames with faces first, then the sharpest).
+    Pure function of the metrics table (see build_metrics_table) and the thresholds.
+
+    Photos rejected early from their preview stay unselected - only the preview
+    was analyzed - but are flagged needs_analysis when the thresholds no longer
+    clearly reject them (same rules as early_reject_reason, for the
+    sharpness_metric they were analyzed with).
+
+    Returns:
+        dict of arrays: is_sharp, is_horizontal, is_burned_out, is_too_dark,
+        is_burst_duplicate, needs_analysis and selected flags, and burst_size
+    """
+    is_sharp = table['sharpness'] > sharpness_threshold
+    is_burned_out = table['brightness'] > max_brightness
+    is_too_dark = table['brightness'] < min_brightness
+    still_rejected = ((table['brightness'] < min_brightness - EARLY_REJECT_BRIGHTNESS_MARGIN)
+                      | (table['brightness'] > max_brightness + EARLY_REJECT_BRIGHTNESS_MARGIN)
+                      | (table['sharpness'] < sharpness_threshold * EARLY_REJECT_SHARPNESS_RATIOS[sharpness_metric]))
+    needs_analysis = table['early_reject'] & ~still_rejected
+
+    # Sharp AND not burned out AND not too dark (and fully analyzed without errors, not a duplicate)
+    selected = (is_sharp & ~is_burned_out & ~is_too_dark & ~table['failed'] & ~table['duplicate']
+                & ~table['early_reject'])
+    if require_faces:
+        # Only select photos with detected faces (disable for brand/product photography)
+        selected &= table['face_count'] > 0
+    if not include_vertical:
+        # Only select horizontal photos
+        selected &= table['is_horizontal']
+
+    is_burst_duplicate = np.zeros_like(selected)
+    if burst_keep > 0:
+        # Rank the selected frames of each burst and drop all but the best ones
+        candidates = np.flatnonzero(selected)
+        order = candidates[np.lexsort((-table['sharpness'][candidates],
+                                       ~(table['face_count'][candidates] > 0),
+                                       table['burst'][candidates]))]
+        bursts = table['burst'][order]
+        positions = np.arange(len(order))
+        group_starts = np.maximum.accumulate(np.where(np.r_[True, bursts[1:] != bursts[:-1]], positions, 0))
+        is_burst_duplicate[order[positions - group_starts >= burst_keep]] = True
+        selected &= ~is_burst_duplicate
+
+    return {
+        'is_sharp': is_sharp,
+        'is_horizontal': table['is_horizontal'],
+        'is_burned_out': is_burned_out,
+        'is_too_dark': is_too_dark,
+        'is_burst_duplicate': is_burst_duplicate,
+        'needs_analysis': needs_analysis,
+        'burst_size': table['burst_size'],
+        'selected': selected
+    }
+
+
+def apply_selection(photos, selection, rows=None):
+    """Write the flags computed by select_photos back onto the photo result dicts
+
+    Args:
+        rows: Indices of the photos to update (default: all)
+    """
+    columns = {key: values.tolist() for key, values in selection.items()}
+    for i in range(len(photos)) if rows is None else rows:
+        for key, values in columns.items():
+            photos[i][key] = values[i]
+
+
+def evaluate_selection(metrics, sharpness_threshold=100, include_vertical=True, max_brightness=255, min_brightness=0, require_faces=True):
+    """Decide whether a single photo is selected based on its metrics and the thresholds
+
+    Bursts need the whole shoot, so a single photo is always its own burst.
+
+    Returns:
+        dict with is_sharp, is_horizontal, is_burned_out, is_too_dark, is_burst_duplicate,
+        needs_analysis and selected flags (and burst_size 1)
+    """
+    selection = select_photos(build_metrics_table([metrics]), sharpness_threshold, include_vertical,
+                              max_brightness, min_brightness, require_faces)
+    return {key: values[0].item() for key, values in selection.items()}
+
+
+def analyze_photo(file_path, sharpness_threshold=100, include_vertical=True, max_brightness=255, min_brightness=0, require_faces=True, analysis_mode=DEFAULT_ANALYSIS_MODE, face_detection_size=DEFAULT_FACE_DETECTION_SIZE, face_detector=DEFAULT_FACE_DETECTOR, focus_maps=False, sharpness_metric=DEFAULT_SHARPNESS_METRIC, eye_detection=True, early_reject=False, data=None):
+    """Analyze a photo for sharpness, orientation and brightness
 
     Uses face detection to focus sharpness analysis on faces when present.
     Rejects photos that are too bright (burned out/overexposed) or too dark (underexposed/faded).
@@ -483,99 +1987,882 @@ def analyze_photo(file_path, sharpness_threshold=100, detect_tilt=False, include
     Args:
         file_path: Path to the photo file
         sharpness_threshold: Minimum sharpness score required
-        detect_tilt: Whether to detect and measure horizon tilt
         include_vertical: Whether to include vertical/portrait photos
         max_brightness: Maximum brightness threshold (reject if exceeded)
         min_brightness: Minimum brightness threshold (reject if below)
         require_faces: Whether to require faces in photos (disable for brand/product photography)
+        analysis_mode: Image source used for analysis (see ANALYSIS_MODES)
+        face_detection_size: Long edge to downscale to for face detection (0 = don't downscale)
+        face_detector: Face detector backend (see FACE_DETECTORS)
+        focus_maps: Save a focus heatmap of the photo (see focus_map_path)
+        sharpness_metric: Sharpness metric (see SHARPNESS_METRICS)
+        eye_detection: Score faces by the sharpness of their eyes when they can be found
+        early_reject: Skip the full analysis of photos whose preview clearly fails the thresholds
+        data: Optional prefetched file contents (see extract_photo_metrics)
     """
     try:
-        tilt_angle = 0.0
-        face_count = 0
-        brightness = 128.0  # Default mid-brightness
-        if not HAS_RAWPY:
-            # Fallback: just check file size as proxy
-            file_size = os.path.getsize(file_path) / (1024 * 1024)  # MB
-            is_sharp = file_size > 20  # Assume larger files are better quality
-            is_horizontal = True  # Default assumption
-            sharpness_score = file_size * 10
-            width, height = 6000, 4000  # Default Sony ARW dimensions
-        else:
-            with rawpy.imread(file_path) as raw:
-                # For face detection, use higher resolution for better accuracy
-                # Process at quarter size (half_size=True gives 1/2 dimensions = 1/4 pixels)
-                img_array_color = raw.postprocess(use_camera_wb=True, half_size=False, output_bps=8)
-                height, width = img_array_color.shape[:2]
-                img_array = np.mean(img_array_color, axis=2).astype(np.uint8)
-
-                # Detect faces first
-                face_regions = detect_faces(img_array_color) if HAS_CV2 else []
-                face_count = len(face_regions)
-
-                # Calculate sharpness (focused on faces if detected)
-                sharpness_score = calculate_sharpness(img_array, face_regions)
-                is_sharp = sharpness_score > sharpness_threshold
-                is_horizontal = width > height
-
-                # Calculate brightness
-                brightness = calculate_brightness(img_array_color)
-
-                # Detect tilt angle if requested
-                if detect_tilt and HAS_CV2:
-                    tilt_angle = detect_horizon_angle(img_array_color)
-
-        # Determine if photo should be selected based on filters
-        has_faces = face_count > 0
-        is_not_burned_out = brightness <= max_brightness
-        is_not_too_dark = brightness >= min_brightness
-
-        # Build selection criteria based on settings
-        if require_faces:
-            # Require faces: Only select photos with detected faces AND sharp AND not burned out AND not too dark
-            if include_vertical:
-                # Select if sharp AND has faces AND not burned out AND not too dark, regardless of orientation
-                selected = is_sharp and has_faces and is_not_burned_out and is_not_too_dark
-            else:
-                # Select only if sharp AND has faces AND horizontal AND not burned out AND not too dark
-                selected = is_sharp and has_faces and is_horizontal and is_not_burned_out and is_not_too_dark
+        prescreen = None
+        if early_reject:
+            prescreen = {'sharpness_threshold': sharpness_threshold, 'min_brightness': min_brightness,
+                         'max_brightness': max_brightness}
+        result = extract_photo_metrics(file_path, analysis_mode, face_detection_size, face_detector,
+                                       focus_maps, sharpness_metric, eye_detection, prescreen, data)
+        result.update(evaluate_selection(result, sharpness_threshold, include_vertical,
+                                         max_brightness, min_brightness, require_faces))
+        return result
+    except Exception as e:
+        print(f"Error analyzing {file_path}: {e}")
+        return failed_analysis_result(e)
+
+
+def failed_analysis_result(error):
+    """Result for a photo that could not be analyzed (never selected)"""
+    return {
+        'sharpness': 0,
+        'is_sharp': False,
+        'is_horizontal': True,
+        'width': 0,
+        'height': 0,
+        'tilt_angle': 0.0,
+        'tilt_confidence': 0.0,
+        'face_count': 0,
+        'face_regions': [],
+        'eye_count': 0,
+        'center_sharpness': 0.0,
+        'thirds_sharpness': 0.0,
+        'brightness': 128.0,
+        'luminance_median': None,
+        'luminance_p99': None,
+        'is_burned_out': False,
+        'is_too_dark': False,
+        'is_burst_duplicate': False,
+        'burst_size': 1,
+        'capture_time': None,
+        'phash': None,
+        'early_reject': None,
+        'selected': False,
+        'error': str(error)
+    }
+
+
+def duplicate_result(file_path, original_path):
+    """Result for a photo skipped as a copy of another photo in the folder (never selected)"""
+    result = failed_analysis_result(None)
+    del result['error']
+    result.update(path=str(file_path), filename=Path(file_path).name,
+                  duplicate_of=Path(original_path).name)
+    return result
+
+
+# Bump whenever metric extraction changes so cached results are recomputed
+ANALYZER_VERSION = 10
+# Bump whenever preview_fingerprint changes so the duplicate index is rebuilt
+FINGERPRINT_VERSION = 1
+# Bump whenever measure_tilt changes so cached tilts are remeasured
+TILT_VERSION = 2
+# Analysis cache database, stored in the input folder
+ANALYSIS_CACHE_FILENAME = ".photo_selector_cache.sqlite"
+# analyze_photo arguments that change the extracted metrics (thresholds don't)
+METRIC_SETTINGS = ('analysis_mode', 'face_detection_size', 'face_detector', 'focus_maps',
+                   'sharpness_metric', 'eye_detection', 'early_reject')
+# Result keys stored in the cache
+METRIC_KEYS = ('sharpness', 'width', 'height', 'face_count', 'face_regions', 'eye_count', 'center_sharpness',
+               'thirds_sharpness', 'brightness', 'luminance_median', 'luminance_p99', 'capture_time', 'phash',
+               'analysis_mode', 'early_reject')
+
+
+class AnalysisCache:
+    """Persistent SQLite cache of per-photo analysis metrics
+
+    Entries are keyed on the photo's path and the metric-affecting settings, and are
+    only reused while the file size, modification time and ANALYZER_VERSION match.
+    A cache instance must be used from the thread that created it.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS metrics (
+                path TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                analyzer_version INTEGER NOT NULL,
+                metrics TEXT NOT NULL,
+                PRIMARY KEY (path, settings)
+            )""")
+        # Preview fingerprints (capture time + pHash) - the persistent duplicate index
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                capture_time REAL,
+                phash TEXT
+            )""")
+        # Horizon tilt of selected photos (see measure_tilts)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tilts (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                angle REAL NOT NULL,
+                confidence REAL NOT NULL
+            )""")
+        self.conn.commit()
+        self._pending_writes = 0
+
+    @classmethod
+    def for_folder(cls, folder):
+        """Open the cache stored in a photo folder, or return None if it can't be created"""
+        try:
+            return cls(Path(folder) / ANALYSIS_CACHE_FILENAME)
+        except sqlite3.Error as e:
+            print(f"Analysis cache unavailable: {e}")
+            return None
+
+    @staticmethod
+    def settings_key(analyze_kwargs):
+        """Serialize the analyze_photo arguments that affect the extracted metrics"""
+        return json.dumps({key: analyze_kwargs.get(key) for key in METRIC_SETTINGS}, sort_keys=True)
+
+    def get(self, file_path, settings):
+        """Return cached metrics for an unchanged file, or None"""
+        try:
+            stat = os.stat(file_path)
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, analyzer_version, metrics FROM metrics WHERE path = ? AND settings = ?",
+                (str(Path(file_path).resolve()), settings)).fetchone()
+        except (OSError, sqlite3.Error):
+            row = None
+
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns or row[2] != ANALYZER_VERSION:
+            return None
+        return json.loads(row[3])
+
+    def put(self, file_path, settings, result):
+        """Store the metrics of a successfully analyzed photo"""
+        if result.get('error'):
+            return
+        try:
+            stat = os.stat(file_path)
+            metrics = {key: result[key] for key in METRIC_KEYS if key in result}
+            self.conn.execute(
+                "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?)",
+                (str(Path(file_path).resolve()), settings, stat.st_size, stat.st_mtime_ns,
+                 ANALYZER_VERSION, json.dumps(metrics)))
+            self._pending_writes += 1
+            # Commit in batches - a commit per photo is slow on network volumes
+            if self._pending_writes >= 50:
+                self.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Could not cache analysis of {file_path}: {e}")
+
+    def get_fingerprint(self, file_path):
+        """Return the cached (capture_time, phash) of an unchanged file, or None"""
+        try:
+            stat = os.stat(file_path)
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, version, capture_time, phash FROM fingerprints WHERE path = ?",
+                (str(Path(file_path).resolve()),)).fetchone()
+        except (OSError, sqlite3.Error):
+            return None
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns or row[2] != FINGERPRINT_VERSION:
+            return None
+        return row[3], row[4]
+
+    def put_fingerprint(self, file_path, capture_time, phash):
+        """Store the preview fingerprint of a photo"""
+        try:
+            stat = os.stat(file_path)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?, ?)",
+                (str(Path(file_path).resolve()), stat.st_size, stat.st_mtime_ns, FINGERPRINT_VERSION,
+                 capture_time, phash))
+            self._pending_writes += 1
+            if self._pending_writes >= 50:
+                self.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Could not cache fingerprint of {file_path}: {e}")
+
+    def get_tilt(self, file_path):
+        """Return the cached (angle, confidence) of an unchanged file, or None"""
+        try:
+            stat = os.stat(file_path)
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, version, angle, confidence FROM tilts WHERE path = ?",
+                (str(Path(file_path).resolve()),)).fetchone()
+        except (OSError, sqlite3.Error):
+            return None
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns or row[2] != TILT_VERSION:
+            return None
+        return row[3], row[4]
+
+    def put_tilt(self, file_path, angle, confidence):
+        """Store the measured horizon tilt of a photo"""
+        try:
+            stat = os.stat(file_path)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tilts VALUES (?, ?, ?, ?, ?, ?)",
+                (str(Path(file_path).resolve()), stat.st_size, stat.st_mtime_ns, TILT_VERSION,
+                 angle, confidence))
+            self._pending_writes += 1
+            if self._pending_writes >= 50:
+                self.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Could not cache tilt of {file_path}: {e}")
+
+    def commit(self):
+        try:
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Could not save analysis cache: {e}")
+        self._pending_writes = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+
+# Default number of analysis worker processes (leave one core free for the UI)
+DEFAULT_ANALYSIS_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+
+# Read-ahead of the streaming pipeline: how many RAW files may be buffered in
+# memory ahead of the analyzers, and how many bytes the buffered files may hold
+# at most (0 = no read-ahead, workers open the files themselves)
+DEFAULT_PREFETCH_FILES = 8
+DEFAULT_PREFETCH_MEMORY_MB = 512
+
+
+def physical_memory_mb():
+    """Installed RAM in MB, or None where it can't be queried"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+# Memory the analysis workers may use together, in MB (0 = no limit): half the RAM
+DEFAULT_MEMORY_BUDGET_MB = (physical_memory_mb() or 16384) // 2
+# Baseline of each worker process (Python, NumPy, OpenCV, LibRaw) outside any photo
+WORKER_BASE_MEMORY_MB = 200
+# Peak bytes per demosaiced pixel: LibRaw's 4 x 16-bit working image and the 8-bit RGB output
+DEMOSAIC_BYTES_PER_PIXEL = 8 + 3
+# Peak bytes per analyzed pixel: the RGB and gray planes and the float32 gradient planes
+ANALYSIS_BYTES_PER_PIXEL = 3 + 1 + 16
+
+
+def estimate_analysis_memory(file_path, data=None, analysis_mode=DEFAULT_ANALYSIS_MODE):
+    """Estimate the peak memory (bytes) of analyzing one photo from its RAW dimensions
+
+    Only the RAW header is parsed (no unpacking or decoding), so this is cheap
+    enough to run for every file before it's handed to a worker. The preview
+    mode is estimated like a half-size decode, its fallback. Returns 0 if the
+    header can't be read - the worker will report the error.
+
+    A prefetched file is counted twice: the buffer is pickled into the worker
+    process and the caller's copy is held until the job completes.
+    """
+    try:
+        raw = rawpy.RawPy()
+        if data is not None:
+            raw.open_buffer(io.BytesIO(data))
+            file_size = 2 * len(data)  # The caller's buffer and the worker's copy
         else:
-            # Don't require faces: Select based on sharpness, brightness, and orientation only
-            if include_vertical:
-                # Select if sharp AND not burned out AND not too dark, regardless of orientation
-                selected = is_sharp and is_not_burned_out and is_not_too_dark
-            else:
-                # Select only if sharp AND horizontal AND not burned out AND not too dark
-                selected = is_sharp and is_horizontal and is_not_burned_out and is_not_too_dark
+            raw.open_file(str(file_path))
+            file_size = os.path.getsize(file_path)
+        sizes = raw.sizes
+        raw.close()
+    except Exception:
+        return 0
+    pixels = sizes.iwidth * sizes.iheight
+    if analysis_mode != 'full':
+        pixels //= 4
+    return (file_size + sizes.raw_width * sizes.raw_height * 2
+            + pixels * (DEMOSAIC_BYTES_PER_PIXEL + ANALYSIS_BYTES_PER_PIXEL))
 
-        return {
-            'sharpness': sharpness_score,
-            'is_sharp': is_sharp,
-            'is_horizontal': is_horizontal,
-            'width': width,
-            'height': height,
-            'tilt_angle': tilt_angle,
-            'face_count': face_count,
-            'brightness': brightness,
-            'is_burned_out': brightness > max_brightness,
-            'is_too_dark': brightness < min_brightness,
-            'selected': selected
-        }
+
+def peak_rss_mb(children=False):
+    """Peak resident memory of this process (or its finished child processes) in MB, None if unknown"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def summarize_memory(results):
+    """Largest per-photo memory estimate, worker peak RSS and read-ahead peak of analysis results, in MB
+
+    Returns:
+        (max estimate or None, max worker peak RSS or None, max read-ahead buffer or None)
+    """
+    estimates = [r['memory_estimate_mb'] for r in results if r.get('memory_estimate_mb')]
+    peaks = [r['peak_rss_mb'] for r in results if r.get('peak_rss_mb')]
+    prefetched = [r['prefetch_peak_mb'] for r in results if r.get('prefetch_peak_mb')]
+    return ((max(estimates) if estimates else None), (max(peaks) if peaks else None),
+            (max(prefetched) if prefetched else None))
+
+
+class PrefetchReader:
+    """Read photo files into memory ahead of analysis in a background thread
+
+    Overlaps disk / network share latency with decoding: while the workers
+    analyze, the reader is already fetching the next files. Read-ahead is
+    bounded by a file count and a memory budget of buffered files - a file's
+    bytes are returned to the budget when it's handed out, so the budget never
+    limits how many files are analyzed at once (that's the memory budget of
+    iter_parallel_analysis).
+
+    Iterating yields (index, file_path, data, read_seconds) in input order;
+    data is None if prefetching is disabled or the file couldn't be read (the
+    worker then opens it itself and reports the error).
+    """
+
+    def __init__(self, file_paths, max_files=DEFAULT_PREFETCH_FILES,
+                 max_bytes=DEFAULT_PREFETCH_MEMORY_MB * 1024 * 1024):
+        self.enabled = max_files > 0 and max_bytes > 0
+        self._items = enumerate(file_paths)
+        self._max_files = max(1, max_files)
+        self._max_bytes = max_bytes
+        self._ready = deque()   # (index, file_path, data, read_seconds)
+        self._reserved = {}     # index -> bytes of a file being read or buffered
+        self._exhausted = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self.peak_bytes = 0
+        if self.enabled:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _has_room(self, size):
+        # A file bigger than the whole budget is still admitted once nothing else is held
+        in_use = sum(self._reserved.values())
+        return len(self._ready) < self._max_files and (not self._reserved or in_use + size <= self._max_bytes)
+
+    def _run(self):
+        for index, file_path in self._items:
+            file_path = str(file_path)
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                size = 0
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._has_room(size))
+                if self._closed:
+                    return
+                self._reserved[index] = size
+                self.peak_bytes = max(self.peak_bytes, sum(self._reserved.values()))
+
+            start = time.perf_counter()
+            try:
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            item = (index, file_path, data, time.perf_counter() - start)
+
+            with self._cond:
+                self._ready.append(item)
+                self._cond.notify_all()
+        with self._cond:
+            self._exhausted = True
+            self._cond.notify_all()
+
+    def next(self, timeout=None):
+        """Return the next prefetched item, None if none is ready within timeout
+
+        Raises StopIteration once every file has been handed out.
+        """
+        if not self.enabled:
+            index, file_path = next(self._items)
+            return index, str(file_path), None, 0.0
+        with self._cond:
+            self._cond.wait_for(lambda: self._ready or self._exhausted, timeout)
+            if self._ready:
+                item = self._ready.popleft()
+                self._reserved.pop(item[0], None)
+                self._cond.notify_all()
+                return item
+            if self._exhausted:
+                raise StopIteration
+            return None
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.next()
+            except StopIteration:
+                return
+
+    def close(self):
+        """Stop reading ahead and drop buffered files"""
+        with self._cond:
+            self._closed = True
+            self._ready.clear()
+            self._cond.notify_all()
+
+
+def _analyze_worker(file_path, analyze_kwargs, data=None):
+    """Process pool entry point: analyze a single photo and tag the result with its path"""
+    result = analyze_photo(file_path, data=data, **analyze_kwargs)
+    result['path'] = file_path
+    result['filename'] = Path(file_path).name
+    result['peak_rss_mb'] = peak_rss_mb()  # Of the whole worker process so far
+    return result
+
+
+def iter_parallel_analysis(file_paths, analyze_kwargs, workers=DEFAULT_ANALYSIS_WORKERS,
+                           ordered=False, should_cancel=None, worker=_analyze_worker,
+                           prefetch_files=DEFAULT_PREFETCH_FILES, prefetch_mb=DEFAULT_PREFETCH_MEMORY_MB,
+                           memory_budget_mb=0, estimate_memory=None):
+    """Analyze photos in a process pool, yielding (index, result) tuples
+
+    Runs as a streaming pipeline: a PrefetchReader thread reads the next files
+    into memory while the workers decode and analyze the previous ones. Work is
+    submitted lazily with at most two jobs per worker in flight, so
+    cancellation takes effect quickly and file_paths may be any iterable.
+
+    With a memory budget, each file's peak memory is estimated before it's
+    submitted and it waits while the files in flight would exceed the budget
+    (minus the workers' baseline), so a folder of large-sensor files runs on
+    fewer cores instead of running out of memory. One file is always admitted.
+
+    A worker that dies (e.g. a LibRaw segfault) breaks the whole pool and fails
+    every file in flight. The pool is then replaced and those files are retried
+    one at a time, so only the file that crashes on its own is reported as failed.
+
+    Args:
+        file_paths: Iterable of photo paths
+        analyze_kwargs: Keyword arguments passed to analyze_photo
+        workers: Number of worker processes (1 = analyze in the calling thread)
+        ordered: Yield results in input order instead of as they complete
+        should_cancel: Optional callable - when it returns True, pending work is
+                       cancelled and the generator stops
+        worker: Picklable function called as worker(file_path, analyze_kwargs, data)
+        prefetch_files: Maximum number of files read ahead (0 = no read-ahead)
+        prefetch_mb: Memory budget of files read ahead but not yet submitted, in MB
+        memory_budget_mb: Memory budget of the workers in MB (0 = no limit)
+        estimate_memory: Called as estimate_memory(file_path, data) for a file's
+                         peak memory in bytes (default: estimate_analysis_memory
+                         for the analysis_mode in analyze_kwargs)
+    """
+    if should_cancel is None:
+        should_cancel = lambda: False
+    reader = PrefetchReader(file_paths, prefetch_files, prefetch_mb * 1024 * 1024)
+
+    def finish(index, result, read_seconds):
+        if reader.enabled:
+            result.setdefault('timings', {})['read'] = read_seconds
+            result['prefetch_peak_mb'] = reader.peak_bytes / (1024 * 1024)  # Read-ahead peak so far
+        return result
+
+    if workers <= 1:
+        # Serial path - no process pool overhead, reads still overlap with analysis
+        try:
+            for index, file_path, data, read_seconds in reader:
+                if should_cancel():
+                    return
+                yield index, finish(index, worker(file_path, analyze_kwargs, data), read_seconds)
+        finally:
+            reader.close()
+        return
+
+    max_in_flight = workers * 2
+    budget = None
+    if memory_budget_mb > 0:
+        budget = (memory_budget_mb - workers * WORKER_BASE_MEMORY_MB) * 1024 * 1024
+        if estimate_memory is None:
+            mode = analyze_kwargs.get('analysis_mode', DEFAULT_ANALYSIS_MODE)
+            estimate_memory = lambda file_path, data: estimate_analysis_memory(file_path, data, mode)
+    memory_in_flight = 0
+
+    def new_pool():
+        # LibRaw uses OpenMP, which can deadlock in forked children - always spawn
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    executor = new_pool()
+    pool_number = 0     # Incremented whenever a broken pool is replaced
+    pending = {}        # future -> (index, file_path, read_seconds, memory estimate, retried alone, pool_number)
+    finished = {}       # index -> result, buffered for ordered delivery
+    held = None         # Item read but waiting for memory to be freed
+    suspects = deque()  # (index, file_path, read_seconds, estimate) in flight when a worker died
+    next_index = 0
+    exhausted = False
+    executor_broken = False
+    cancelled = False
+    try:
+        while True:
+            if executor_broken:
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = new_pool()
+                pool_number += 1
+                executor_broken = False
+            if suspects and not pending:
+                # Retry files from a broken pool one at a time - workers read them again
+                index, file_path, read_seconds, estimate = suspects.popleft()
+                memory_in_flight += estimate
+                future = executor.submit(worker, file_path, analyze_kwargs, None)
+                pending[future] = (index, file_path, read_seconds, estimate, True, pool_number)
+
+            # Keep the pool busy without queueing the whole folder up front; only
+            # block on the reader when there's nothing else to wait for
+            while not suspects and not exhausted and len(pending) + len(finished) < max_in_flight:
+                if held is None:
+                    try:
+                        item = reader.next(timeout=0 if pending else 0.2)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if item is None:
+                        break
+                    held = item + (estimate_memory(item[1], item[2]) if budget is not None else 0,)
+                index, file_path, data, read_seconds, estimate = held
+                if budget is not None and pending and memory_in_flight + estimate > budget:
+                    break  # Wait for a running file to finish
+                try:
+                    future = executor.submit(worker, file_path, analyze_kwargs, data)
+                except BrokenProcessPool:
+                    executor_broken = True  # A worker just died - the file is submitted to the new pool
+                    break
+                held = None
+                memory_in_flight += estimate
+                pending[future] = (index, file_path, read_seconds, estimate, False, pool_number)
+
+            if should_cancel():
+                cancelled = True
+                return
+            if not pending:
+                if exhausted and held is None and not suspects:
+                    break
+                continue
+
+            # Poll quickly while the reader may still hand over work for idle slots
+            starved = not exhausted and held is None and len(pending) + len(finished) < max_in_flight
+            done, _ = wait(pending, timeout=0.01 if starved else 0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, file_path, read_seconds, estimate, alone, pool = pending.pop(future)
+                memory_in_flight -= estimate
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    executor_broken |= pool == pool_number
+                    if not alone:
+                        suspects.append((index, file_path, read_seconds, estimate))
+                        continue
+                    # Crashed the worker on its own - report it like an analysis error
+                    print(f"Error analyzing {file_path}: {e}")
+                    result = failed_analysis_result(e)
+                    result['path'] = file_path
+                    result['filename'] = Path(file_path).name
+                except Exception as e:
+                    # Analysis raised in the worker - report it like an analysis error
+                    print(f"Error analyzing {file_path}: {e}")
+                    result = failed_analysis_result(e)
+                    result['path'] = file_path
+                    result['filename'] = Path(file_path).name
+                result = finish(index, result, read_seconds)
+                if estimate:
+                    result['memory_estimate_mb'] = estimate / (1024 * 1024)
+                if ordered:
+                    finished[index] = result
+                else:
+                    yield index, result
+
+            while next_index in finished:
+                yield next_index, finished.pop(next_index)
+                next_index += 1
+    finally:
+        # On cancel (or if the caller stops iterating) drop queued jobs and don't
+        # block on the ones already running
+        reader.close()
+        executor.shutdown(wait=not cancelled and not pending, cancel_futures=True)
+
+
+def _fingerprint_worker(file_path, analyze_kwargs, data=None):
+    """Process pool entry point of the duplicate prescan: fingerprint a photo's embedded preview"""
+    try:
+        with rawpy.imread(file_path) as raw:
+            capture_time, phash = preview_fingerprint(raw)
     except Exception as e:
-        print(f"Error analyzing {file_path}: {e}")
-        return {
-            'sharpness': 0,
-            'is_sharp': False,
-            'is_horizontal': True,
-            'width': 0,
-            'height': 0,
-            'tilt_angle': 0.0,
-            'face_count': 0,
-            'brightness': 128.0,
-            'is_burned_out': False,
-            'is_too_dark': False,
-            'selected': False,
-            'error': str(e)
-        }
+        print(f"Could not read preview of {file_path}: {e}")
+        capture_time, phash = None, None
+    return {'path': file_path, 'capture_time': capture_time, 'phash': phash}
+
+
+def scan_fingerprints(file_paths, cache=None, workers=DEFAULT_ANALYSIS_WORKERS, should_cancel=None):
+    """Fingerprint the embedded previews of photos before the full analysis
+
+    Only the preview is read (no demosaic), and fingerprints of unchanged
+    files come from the cache, so this costs a fraction of the analysis.
+
+    Returns:
+        list with (capture_time, phash) per photo - None for photos that weren't
+        scanned because should_cancel returned True
+    """
+    file_paths = [str(file_path) for file_path in file_paths]
+    fingerprints = [cache.get_fingerprint(file_path) if cache else None for file_path in file_paths]
+    to_scan = [index for index, fingerprint in enumerate(fingerprints) if fingerprint is None]
+    if to_scan:
+        # Workers open the files themselves - reading ahead whole RAW files would waste I/O
+        for position, result in iter_parallel_analysis([file_paths[index] for index in to_scan], {},
+                                                       workers=max(1, min(workers, len(to_scan))),
+                                                       should_cancel=should_cancel, worker=_fingerprint_worker,
+                                                       prefetch_files=0):
+            fingerprints[to_scan[position]] = (result['capture_time'], result['phash'])
+            if cache and result['phash'] is not None:
+                cache.put_fingerprint(result['path'], result['capture_time'], result['phash'])
+        if cache:
+            cache.commit()
+    return fingerprints
+
+
+def _tilt_worker(file_path, analyze_kwargs, data=None):
+    """Process pool entry point of measure_tilts: measure the horizon tilt of a photo"""
+    try:
+        tilt_angle, tilt_confidence = measure_tilt(file_path)
+    except Exception as e:
+        print(f"Could not measure tilt of {file_path}: {e}")
+        tilt_angle, tilt_confidence = 0.0, None
+    return {'path': file_path, 'tilt_angle': tilt_angle, 'tilt_confidence': tilt_confidence}
+
+
+def measure_tilts(photos, cache=None, workers=DEFAULT_ANALYSIS_WORKERS, should_cancel=None):
+    """Measure the horizon tilt of selected photos that don't have one yet
+
+    Tilt only matters for the XMP of photos that are kept, so it's measured after
+    the selection instead of during the analysis - with a typical keep rate most
+    frames never run the Hough transform. Tilts of unchanged files come from the
+    cache. Sets tilt_angle and tilt_confidence on the photos in place.
+
+    Returns:
+        Number of photos measured (not counting cached ones)
+    """
+    if not HAS_CV2:
+        return 0
+    to_measure = []
+    for photo in photos:
+        if not photo.get('selected') or 'tilt_confidence' in photo:
+            continue
+        tilt = cache.get_tilt(photo['path']) if cache else None
+        if tilt is None:
+            to_measure.append(photo)
+        else:
+            photo['tilt_angle'], photo['tilt_confidence'] = tilt
+    if to_measure:
+        # Only the preview is decoded - reading ahead whole RAW files would waste I/O
+        for position, result in iter_parallel_analysis([photo['path'] for photo in to_measure], {},
+                                                       workers=max(1, min(workers, len(to_measure))),
+                                                       should_cancel=should_cancel, worker=_tilt_worker,
+                                                       prefetch_files=0):
+            photo = to_measure[position]
+            photo['tilt_angle'], photo['tilt_confidence'] = result['tilt_angle'], result['tilt_confidence'] or 0.0
+            if cache and result['tilt_confidence'] is not None:
+                cache.put_tilt(photo['path'], result['tilt_angle'], result['tilt_confidence'])
+        if cache:
+            cache.commit()
+    return len(to_measure)
+
+
+def iter_cached_analysis(file_paths, analyze_kwargs, cache=None, workers=DEFAULT_ANALYSIS_WORKERS,
+                         ordered=False, should_cancel=None, prefetch_files=DEFAULT_PREFETCH_FILES,
+                         prefetch_mb=DEFAULT_PREFETCH_MEMORY_MB, duplicates=None,
+                         memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """Analyze photos, reusing cached metrics for unchanged files
+
+    Cached photos are re-evaluated against the current thresholds and yielded
+    first; only new or modified files are read and decoded (see iter_parallel_analysis).
+    Photos listed in duplicates (see find_duplicates) aren't analyzed at all.
+
+    Yields:
+        (index, result, from_cache) tuples, index being the position in file_paths
+    """
+    file_paths = [str(file_path) for file_path in file_paths]
+    settings = AnalysisCache.settings_key(analyze_kwargs)
+    selection_kwargs = {key: value for key, value in analyze_kwargs.items() if key not in METRIC_SETTINGS}
+    duplicates = duplicates or {}
+
+    to_analyze = []  # Indices of files that need decoding
+    for index, file_path in enumerate(file_paths):
+        if index in duplicates:
+            yield index, duplicate_result(file_path, file_paths[duplicates[index]]), False
+            continue
+        metrics = cache.get(file_path, settings) if cache else None
+        if metrics is not None and metrics.get('early_reject') and not early_reject_reason(
+                metrics['brightness'], metrics['sharpness'],
+                sharpness_metric=analyze_kwargs.get('sharpness_metric', DEFAULT_SHARPNESS_METRIC),
+                **{key: selection_kwargs[key] for key in EARLY_REJECT_THRESHOLDS if key in selection_kwargs}):
+            metrics = None  # Rejected early under stricter thresholds - analyze it fully now
+        if metrics is None:
+            to_analyze.append(index)
+            continue
+        result = dict(metrics)
+        result.update(evaluate_selection(result, **selection_kwargs))
+        result['path'] = file_path
+        result['filename'] = Path(file_path).name
+        yield index, result, True
+
+    pending_paths = [file_paths[index] for index in to_analyze]
+    workers = max(1, min(workers, len(pending_paths)))
+    for position, result in iter_parallel_analysis(pending_paths, analyze_kwargs, workers=workers,
+                                                   ordered=ordered, should_cancel=should_cancel,
+                                                   prefetch_files=prefetch_files, prefetch_mb=prefetch_mb,
+                                                   memory_budget_mb=memory_budget_mb):
+        if cache:
+            cache.put(result['path'], settings, result)
+        yield to_analyze[position], result, False
+
+    if cache:
+        cache.commit()
+
+
+def find_raw_files(folder):
+    """List the supported RAW files in a folder (see RAW_FORMATS), sorted by name
+
+    Extensions are matched case-insensitively on a single directory listing, so
+    no file is listed twice on case-insensitive file systems.
+    """
+    with os.scandir(folder) as entries:
+        return sorted((Path(entry.path) for entry in entries if raw_format(entry.name) and entry.is_file()),
+                      key=lambda file_path: file_path.name)
+
+
+# Seconds a new file's size and modification time must stay unchanged before it's analyzed
+WATCH_SETTLE_SECONDS = 2.0
+# How often the watcher rescans the folder (polling) or re-checks files still being written
+WATCH_POLL_SECONDS = 1.0
+
+
+class FolderWatcher:
+    """Yield new RAW files as they land in a folder, once they're completely written
+
+    Uses watchdog (inotify / FSEvents / ReadDirectoryChangesW) when it's
+    installed and otherwise rescans the folder every WATCH_POLL_SECONDS. A
+    file is handed out only after its size and modification time stayed the
+    same for WATCH_SETTLE_SECONDS, so frames still being copied off a card
+    aren't decoded half-written. Files passed as known (e.g. the ones already
+    analyzed) are never yielded.
+
+    Iteration blocks until the next file is ready and ends after stop().
+    """
+
+    def __init__(self, folder, known=(), settle_seconds=WATCH_SETTLE_SECONDS, poll_interval=WATCH_POLL_SECONDS):
+        self.folder = Path(folder)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self._known = {os.path.normcase(str(file_path)) for file_path in known}
+        self._pending = {}     # normalized path -> (file_path, size, mtime_ns, unchanged since)
+        self._changed = set()  # paths reported by watchdog since the last check
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._observer = None
+
+    @property
+    def uses_events(self):
+        """True when file system events are used instead of polling"""
+        return self._observer is not None
+
+    def start(self):
+        """Start listening for file system events (no-op when polling)"""
+        if HAS_WATCHDOG and self._observer is None:
+            try:
+                observer = Observer()
+                observer.schedule(self, str(self.folder), recursive=False)
+                observer.start()
+                self._observer = observer
+            except Exception as e:
+                print(f"Folder events unavailable ({e}) - polling {self.folder} instead")
+
+    def dispatch(self, event):
+        """watchdog event handler: remember created, modified and moved-in RAW files"""
+        if event.is_directory:
+            return
+        file_path = getattr(event, 'dest_path', None) or event.src_path
+        if raw_format(file_path):
+            with self._lock:
+                self._changed.add(file_path)
+            self._wake.set()
+
+    def _collect(self, rescan):
+        """Add unseen RAW files to the pending set"""
+        if rescan:
+            candidates = find_raw_files(self.folder)
+        else:
+            with self._lock:
+                candidates, self._changed = self._changed, set()
+        for file_path in candidates:
+            key = os.path.normcase(str(file_path))
+            if key not in self._known and key not in self._pending:
+                self._pending[key] = (Path(file_path), None, None, time.monotonic())
+
+    def _settled(self):
+        """Pending files whose size and modification time stopped changing, in name order"""
+        now = time.monotonic()
+        ready = []
+        for key, (file_path, size, mtime_ns, since) in list(self._pending.items()):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                del self._pending[key]  # Removed or renamed (e.g. a copy tool's temp file)
+                continue
+            if stat.st_size == 0 or (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self._pending[key] = (file_path, stat.st_size, stat.st_mtime_ns, now)
+            elif now - since >= self.settle_seconds:
+                del self._pending[key]
+                self._known.add(key)
+                ready.append(file_path)
+        return sorted(ready)
+
+    def __iter__(self):
+        self.start()
+        # Always rescan first - files may have landed before the observer started
+        rescan = True
+        while not self._stopped:
+            self._collect(rescan or not self.uses_events)
+            rescan = False
+            for file_path in self._settled():
+                if self._stopped:
+                    return
+                yield file_path
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def stop(self):
+        """Stop watching; a blocked iteration ends promptly"""
+        self._stopped = True
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+
+
+def iter_watched_analysis(watcher, analyze_kwargs, cache=None, workers=DEFAULT_ANALYSIS_WORKERS,
+                          should_cancel=None, prefetch_files=DEFAULT_PREFETCH_FILES,
+                          prefetch_mb=DEFAULT_PREFETCH_MEMORY_MB, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """Analyze photos as a FolderWatcher reports them, until it is stopped or cancelled
+
+    The process pool stays up for the whole session, so every new frame only
+    costs its own analysis. Results are stored in the cache as they arrive.
+    Read-ahead stays on so that waiting for the next file happens in the
+    reader thread, not while results are pending.
+
+    Yields:
+        analysis results in completion order
+    """
+    settings = AnalysisCache.settings_key(analyze_kwargs)
+    for _, result in iter_parallel_analysis(watcher, analyze_kwargs, workers=workers,
+                                            should_cancel=should_cancel,
+                                            prefetch_files=max(1, prefetch_files), prefetch_mb=max(1, prefetch_mb),
+                                            memory_budget_mb=memory_budget_mb):
+        if cache:
+            cache.put(result['path'], settings, result)
+            cache.commit()
+        yield result
 
 
 class PhotoSelectorApp:
@@ -609,7 +2896,24 @@ class PhotoSelectorApp:
         self.min_brightness_threshold = tk.IntVar(value=30)  # Minimum brightness threshold (reject too dark/faded images)
         self.max_brightness_threshold = tk.IntVar(value=220)  # Maximum brightness threshold (reject burned out images)
         self.auto_straighten = tk.BooleanVar(value=True)
+        self.auto_exposure = tk.BooleanVar(value=False)  # Per-photo exposure offset in the XMP
         self.require_faces = tk.BooleanVar(value=True)  # Require face detection (disable for brand/product photography)
+        self.burst_keep = tk.IntVar(value=0)  # Keep only the best N frames of each burst (0 = all)
+        self.analysis_workers = tk.IntVar(value=DEFAULT_ANALYSIS_WORKERS)  # Parallel analysis processes
+        self.ordered_results = tk.BooleanVar(value=False)  # Report results in file order instead of as completed
+        self.memory_budget = tk.IntVar(value=DEFAULT_MEMORY_BUDGET_MB)  # MB the analysis workers may use (0 = no limit)
+        self.prefetch_files = tk.IntVar(value=DEFAULT_PREFETCH_FILES)  # Files read ahead of the analysis (0 = off)
+        self.prefetch_mb = tk.IntVar(value=DEFAULT_PREFETCH_MEMORY_MB)  # Read-ahead memory budget in MB
+        self.analysis_mode = tk.StringVar(value=ANALYSIS_MODES[DEFAULT_ANALYSIS_MODE])  # Image source for analysis
+        self.use_cache = tk.BooleanVar(value=True)  # Reuse metrics of unchanged photos from previous runs
+        self.skip_duplicates = tk.BooleanVar(value=True)  # Skip copies of the same shot (e.g. merged cards)
+        self.save_focus_maps = tk.BooleanVar(value=False)  # Save a focus heatmap per photo for review
+        self.watch_folder = tk.BooleanVar(value=False)  # Keep analyzing new photos as they're copied in
+        self.face_detection_size = tk.StringVar(value=self._face_size_label(DEFAULT_FACE_DETECTION_SIZE))
+        self.face_detector = tk.StringVar(value=FACE_DETECTORS[DEFAULT_FACE_DETECTOR][0])
+        self.sharpness_metric = tk.StringVar(value=SHARPNESS_METRICS[DEFAULT_SHARPNESS_METRIC])
+        self.eye_detection = tk.BooleanVar(value=True)  # Judge portraits by the sharpness of the eyes
+        self.early_reject = tk.BooleanVar(value=True)  # Skip full analysis of frames whose preview clearly fails
         self.preset_file = tk.StringVar(value="(Using built-in preset)")
         self.custom_xmp_content = None
         # Separate presets for dark and light photos
@@ -620,6 +2924,12 @@ class PhotoSelectorApp:
         self.watermark_file = tk.StringVar(value="(Using built-in camera icon)")
         self.watermark_path = None
         self.photos = []
+        self.metrics_table = None  # NumPy view of self.photos metrics for instant re-filtering
+        self.analysis_metric = DEFAULT_SHARPNESS_METRIC  # Sharpness metric self.photos were analyzed with
+        self._shown_selection = None  # select_photos result the results area shows (None = not rendered yet)
+        self.analysis_running = False
+        self.watcher = None  # FolderWatcher while watching the input folder
+        self._reselect_job = None
         self.cancel_requested = False
 
         self.setup_styles()
@@ -628,6 +2938,12 @@ class PhotoSelectorApp:
         # Update header title when project name changes
         self.project_name.trace_add('write', self._update_title)
 
+        # Re-filter analyzed photos live when a selection setting changes
+        for variable in (self.sharpness_threshold, self.min_brightness_threshold,
+                         self.max_brightness_threshold, self.brightness_threshold, self.require_faces,
+                         self.burst_keep):
+            variable.trace_add('write', self._on_selection_setting_changed)
+
         # Auto-load watermark.png if it exists in the same directory
         self._load_default_watermark()
 
@@ -986,12 +3302,225 @@ class PhotoSelectorApp:
                                     style='TCheckbutton')
         check_auto.pack(anchor=tk.W, pady=5)
 
+        check_exposure = ttk.Checkbutton(settings_content,
+                                        text="Auto exposure (correct each photo toward middle gray)",
+                                        variable=self.auto_exposure,
+                                        style='TCheckbutton')
+        check_exposure.pack(anchor=tk.W, pady=5)
+
         check_faces = ttk.Checkbutton(settings_content,
                                      text="Require face detection (disable for brand/product photography)",
                                      variable=self.require_faces,
                                      style='TCheckbutton')
         check_faces.pack(anchor=tk.W, pady=5)
 
+        # Best-of-burst selection
+        burst_container = tk.Frame(settings_content, bg=self.colors['card'])
+        burst_container.pack(fill=tk.X, pady=(5, 0))
+
+        burst_label = ttk.Label(burst_container, text="Keep best", style='TLabel')
+        burst_label.pack(side=tk.LEFT)
+
+        burst_spinbox = tk.Spinbox(burst_container,
+                                   from_=0,
+                                   to=10,
+                                   textvariable=self.burst_keep,
+                                   font=('SF Pro Text', 12),
+                                   bg=self.colors['input_bg'],
+                                   fg=self.colors['text'],
+                                   relief='flat',
+                                   width=3)
+        burst_spinbox.pack(side=tk.LEFT, padx=8, ipady=2)
+
+        burst_help = ttk.Label(burst_container,
+                               text="frames per burst / near-duplicate group (0 = keep all)",
+                               style='Secondary.TLabel')
+        burst_help.pack(side=tk.LEFT)
+
+        # Separator
+        separator_perf = tk.Frame(settings_content, height=1, bg=self.colors['border'])
+        separator_perf.pack(fill=tk.X, pady=15)
+
+        # Parallel analysis
+        workers_label = ttk.Label(settings_content, text="Analysis Workers", style='TLabel')
+        workers_label.pack(anchor=tk.W, pady=(0, 8))
+
+        workers_container = tk.Frame(settings_content, bg=self.colors['card'])
+        workers_container.pack(fill=tk.X)
+
+        workers_spinbox = tk.Spinbox(workers_container,
+                                     from_=1,
+                                     to=max(1, os.cpu_count() or 1),
+                                     textvariable=self.analysis_workers,
+                                     font=('SF Pro Text', 12),
+                                     bg=self.colors['input_bg'],
+                                     fg=self.colors['text'],
+                                     relief='flat',
+                                     width=5)
+        workers_spinbox.pack(side=tk.LEFT, ipady=4)
+
+        check_ordered = ttk.Checkbutton(workers_container,
+                                        text="Show results in file order",
+                                        variable=self.ordered_results,
+                                        style='TCheckbutton')
+        check_ordered.pack(side=tk.LEFT, padx=15)
+
+        memory_label = ttk.Label(workers_container, text="Memory budget (MB):", style='TLabel')
+        memory_label.pack(side=tk.LEFT, padx=(15, 5))
+
+        memory_spinbox = tk.Spinbox(workers_container,
+                                    from_=0,
+                                    to=physical_memory_mb() or 262144,
+                                    increment=512,
+                                    textvariable=self.memory_budget,
+                                    font=('SF Pro Text', 12),
+                                    bg=self.colors['input_bg'],
+                                    fg=self.colors['text'],
+                                    relief='flat',
+                                    width=7)
+        memory_spinbox.pack(side=tk.LEFT, ipady=4)
+
+        installed = physical_memory_mb()
+        workers_help = ttk.Label(settings_content,
+                                 text=f"Number of photos analyzed in parallel (this computer has {os.cpu_count() or 1} CPU cores"
+                                      + (f" and {installed / 1024:.0f} GB RAM" if installed else "")
+                                      + ") - large files wait while the memory budget is used up (0 = no limit)",
+                                 style='Secondary.TLabel')
+        workers_help.pack(anchor=tk.W, pady=(5, 0))
+
+        prefetch_container = tk.Frame(settings_content, bg=self.colors['card'])
+        prefetch_container.pack(fill=tk.X, pady=(10, 0))
+
+        prefetch_label = ttk.Label(prefetch_container, text="Read ahead (files):", style='TLabel')
+        prefetch_label.pack(side=tk.LEFT, padx=(0, 5))
+
+        prefetch_files_spinbox = tk.Spinbox(prefetch_container,
+                                            from_=0,
+                                            to=64,
+                                            textvariable=self.prefetch_files,
+                                            font=('SF Pro Text', 12),
+                                            bg=self.colors['input_bg'],
+                                            fg=self.colors['text'],
+                                            relief='flat',
+                                            width=4)
+        prefetch_files_spinbox.pack(side=tk.LEFT, ipady=4)
+
+        prefetch_mb_label = ttk.Label(prefetch_container, text="Read-ahead memory (MB):", style='TLabel')
+        prefetch_mb_label.pack(side=tk.LEFT, padx=(15, 5))
+
+        prefetch_mb_spinbox = tk.Spinbox(prefetch_container,
+                                         from_=0,
+                                         to=16384,
+                                         increment=128,
+                                         textvariable=self.prefetch_mb,
+                                         font=('SF Pro Text', 12),
+                                         bg=self.colors['input_bg'],
+                                         fg=self.colors['text'],
+                                         relief='flat',
+                                         width=6)
+        prefetch_mb_spinbox.pack(side=tk.LEFT, ipady=4)
+
+        prefetch_help = ttk.Label(settings_content,
+                                  text="Photos read into memory ahead of the analysis - raise on slow network shares "
+                                       "and card readers (0 = workers read files themselves)",
+                                  style='Secondary.TLabel')
+        prefetch_help.pack(anchor=tk.W, pady=(5, 0))
+
+        # Analysis quality / speed
+        mode_label = ttk.Label(settings_content, text="Analysis Quality", style='TLabel')
+        mode_label.pack(anchor=tk.W, pady=(15, 8))
+
+        mode_combo = ttk.Combobox(settings_content,
+                                  textvariable=self.analysis_mode,
+                                  values=list(ANALYSIS_MODES.values()),
+                                  state='readonly',
+                                  font=('SF Pro Text', 11),
+                                  width=40)
+        mode_combo.pack(anchor=tk.W)
+
+        mode_help = ttk.Label(settings_content,
+                              text="Faster modes analyze a smaller image - re-check the sharpness threshold when switching",
+                              style='Secondary.TLabel')
+        mode_help.pack(anchor=tk.W, pady=(5, 0))
+
+        # Sharpness metric
+        metric_label = ttk.Label(settings_content, text="Sharpness Metric", style='TLabel')
+        metric_label.pack(anchor=tk.W, pady=(15, 8))
+
+        metric_combo = ttk.Combobox(settings_content,
+                                    textvariable=self.sharpness_metric,
+                                    values=list(SHARPNESS_METRICS.values()),
+                                    state='readonly',
+                                    font=('SF Pro Text', 11),
+                                    width=50)
+        metric_combo.pack(anchor=tk.W)
+
+        check_eyes = ttk.Checkbutton(settings_content,
+                                     text="Measure sharpness on the eyes when they can be found",
+                                     variable=self.eye_detection,
+                                     style='TCheckbutton')
+        check_eyes.pack(anchor=tk.W, pady=(8, 0))
+
+        check_early_reject = ttk.Checkbutton(settings_content,
+                                             text="Reject clearly black, blown-out or blurry frames from the preview "
+                                                  "without full analysis",
+                                             variable=self.early_reject,
+                                             style='TCheckbutton')
+        check_early_reject.pack(anchor=tk.W, pady=(5, 0))
+
+        # Face detector backend
+        detector_label = ttk.Label(settings_content, text="Face Detector", style='TLabel')
+        detector_label.pack(anchor=tk.W, pady=(15, 8))
+
+        detector_combo = ttk.Combobox(settings_content,
+                                      textvariable=self.face_detector,
+                                      values=[label for label, _, _, _ in FACE_DETECTORS.values()],
+                                      state='readonly',
+                                      font=('SF Pro Text', 11),
+                                      width=60)
+        detector_combo.pack(anchor=tk.W)
+
+        # Face detection resolution
+        face_size_label = ttk.Label(settings_content, text="Face Detection Size", style='TLabel')
+        face_size_label.pack(anchor=tk.W, pady=(15, 8))
+
+        face_size_combo = ttk.Combobox(settings_content,
+                                       textvariable=self.face_detection_size,
+                                       values=[self._face_size_label(size) for size in FACE_DETECTION_SIZES],
+                                       state='readonly',
+                                       font=('SF Pro Text', 11),
+                                       width=40)
+        face_size_combo.pack(anchor=tk.W)
+
+        face_size_help = ttk.Label(settings_content,
+                                   text="Detecting faces on a smaller copy is much faster but may miss very small faces",
+                                   style='Secondary.TLabel')
+        face_size_help.pack(anchor=tk.W, pady=(5, 0))
+
+        check_cache = ttk.Checkbutton(settings_content,
+                                      text="Reuse previous analysis results for unchanged photos",
+                                      variable=self.use_cache,
+                                      style='TCheckbutton')
+        check_cache.pack(anchor=tk.W, pady=(10, 5))
+
+        check_duplicates = ttk.Checkbutton(settings_content,
+                                           text="Skip duplicate copies of the same shot (e.g. merged camera cards)",
+                                           variable=self.skip_duplicates,
+                                           style='TCheckbutton')
+        check_duplicates.pack(anchor=tk.W, pady=(0, 5))
+
+        check_focus_maps = ttk.Checkbutton(settings_content,
+                                           text=f"Save focus heatmaps (in {FOCUS_MAP_DIRNAME}/ next to the photos)",
+                                           variable=self.save_focus_maps,
+                                           style='TCheckbutton')
+        check_focus_maps.pack(anchor=tk.W, pady=(0, 5))
+
+        check_watch = ttk.Checkbutton(settings_content,
+                                      text="Watch the input folder and analyze new photos as they arrive (Cancel stops)",
+                                      variable=self.watch_folder,
+                                      style='TCheckbutton')
+        check_watch.pack(anchor=tk.W, pady=(0, 5))
+
         # Separator
         separator4 = tk.Frame(settings_content, height=1, bg=self.colors['border'])
         separator4.pack(fill=tk.X, pady=15)
@@ -1200,6 +3729,11 @@ class PhotoSelectorApp:
         self.log_text.tag_config('info', foreground='#0284c7', font=('SF Mono', 10))
         self.log_text.tag_config('warning', foreground='#ea580c')
 
+    @staticmethod
+    def _face_size_label(size):
+        """Label shown in the face detection size dropdown"""
+        return "Analysis resolution" if size == 0 else f"Downscale to {size} px (long edge)"
+
     def _update_title(self, *args):
         """Update header title based on project name"""
         project = self.project_name.get().strip()
@@ -1258,7 +3792,7 @@ class PhotoSelectorApp:
         browse_btn.pack(side=tk.LEFT, padx=(10, 0))
 
     def select_input_folder(self):
-        folder = filedialog.askdirectory(title="Select Input Folder with ARW Photos")
+        folder = filedialog.askdirectory(title="Select Input Folder with RAW Photos")
         if folder:
             self.input_folder.set(folder)
 
@@ -1307,10 +3841,12 @@ class PhotoSelectorApp:
                 with open(file, 'r', encoding='utf-8') as f:
                     self.custom_xmp_content_dark = f.read()
 
-                # Validate that it's a proper XMP file
-                if '<x:xmpmeta' not in self.custom_xmp_content_dark or 'crs:' not in self.custom_xmp_content_dark:
+                # Validate that it's a proper XMP file (parsed once here, reused for every sidecar)
+                try:
+                    xmp_preset(self.custom_xmp_content_dark)
+                except ValueError as e:
                     messagebox.showerror("Invalid XMP",
-                                       "The selected file does not appear to be a valid Camera Raw XMP preset.")
+                                       f"The selected file does not appear to be a valid Camera Raw XMP preset ({e}).")
                     self.custom_xmp_content_dark = None
                     return
 
@@ -1337,10 +3873,12 @@ class PhotoSelectorApp:
                 with open(file, 'r', encoding='utf-8') as f:
                     self.custom_xmp_content_light = f.read()
 
-                # Validate that it's a proper XMP file
-                if '<x:xmpmeta' not in self.custom_xmp_content_light or 'crs:' not in self.custom_xmp_content_light:
+                # Validate that it's a proper XMP file (parsed once here, reused for every sidecar)
+                try:
+                    xmp_preset(self.custom_xmp_content_light)
+                except ValueError as e:
                     messagebox.showerror("Invalid XMP",
-                                       "The selected file does not appear to be a valid Camera Raw XMP preset.")
+                                       f"The selected file does not appear to be a valid Camera Raw XMP preset ({e}).")
                     self.custom_xmp_content_light = None
                     return
 
@@ -1418,6 +3956,9 @@ class PhotoSelectorApp:
         """Cancel the current workflow (analysis or processing)"""
         self.cancel_requested = True
         self.cancel_btn.config(state='disabled')
+        watcher = self.watcher
+        if watcher is not None:
+            watcher.stop()
         self.update_status("Cancelling...")
         self.log_to_activity("Workflow cancellation requested by user", 'warning')
 
@@ -1437,142 +3978,481 @@ class PhotoSelectorApp:
         self.log_text.delete(1.0, tk.END)
         self.photos = []
 
-        # Find all ARW files
-        arw_files = list(Path(input_dir).glob("*.ARW")) + list(Path(input_dir).glob("*.arw"))
+        # Find all RAW files
+        raw_files = find_raw_files(input_dir)
+        watch = self.watch_folder.get()
+
+        if not raw_files and not watch:
+            messagebox.showwarning("Warning", f"No RAW files ({', '.join(RAW_FORMATS)}) found in the selected folder")
+            return
 
-        if not arw_files:
-            messagebox.showwarning("Warning", "No ARW files found in the selected folder")
+        face_detector = next((name for name, (label, _, _, _) in FACE_DETECTORS.items()
+                              if label == self.face_detector.get()), DEFAULT_FACE_DETECTOR)
+        problem = face_detector_problem(face_detector)
+        if problem:
+            messagebox.showerror("Error", f"Face detector not available: {problem}")
             return
 
-        self.log_to_activity(f"Found {len(arw_files)} ARW files in {input_dir}", 'info')
-        self.update_status(f"Preparing to analyze {len(arw_files)} photos...")
-        self.progress['maximum'] = len(arw_files)
+        self.log_to_activity(f"Found {len(raw_files)} RAW files in {input_dir}", 'info')
+        self.update_status(f"Preparing to analyze {len(raw_files)} photos...")
+        self.progress['maximum'] = len(raw_files)
         self.progress['value'] = 0
 
         # Reset cancel flag and enable cancel button
         self.cancel_requested = False
+        self.analysis_running = True
+        self.metrics_table = None
+        self._shown_selection = None
         self.cancel_btn.config(state='normal')
         self.analyze_btn.config(state='disabled')
 
+        # Start watching before the analysis so no photo copied in meanwhile is missed
+        self.watcher = FolderWatcher(input_dir, known=raw_files) if watch else None
+
         # Analyze in a separate thread
-        thread = threading.Thread(target=self._analyze_thread, args=(arw_files,))
+        thread = threading.Thread(target=self._analyze_thread, args=(input_dir, raw_files))
         thread.start()
     
-    def _analyze_thread(self, arw_files):
-        threshold = self.sharpness_threshold.get()
+    def _analyze_thread(self, input_dir, raw_files):
+        settings = self._selection_settings()
+        threshold = settings['sharpness_threshold']
         detect_tilt = self.auto_straighten.get()
-        include_vertical = True  # Always include vertical photos
-        max_brightness = self.max_brightness_threshold.get()
-        min_brightness = self.min_brightness_threshold.get()
-        require_faces = self.require_faces.get()
+        max_brightness = settings['max_brightness']
+        min_brightness = settings['min_brightness']
+        require_faces = settings['require_faces']
+        brightness_threshold = self.brightness_threshold.get()
+        try:
+            workers = int(self.analysis_workers.get())
+            if self.watcher is None:
+                workers = min(workers, len(raw_files))
+            workers = max(1, workers)
+        except (tk.TclError, ValueError):
+            workers = DEFAULT_ANALYSIS_WORKERS
+        try:
+            memory_budget_mb = max(0, int(self.memory_budget.get()))
+        except (tk.TclError, ValueError):
+            memory_budget_mb = DEFAULT_MEMORY_BUDGET_MB
+        try:
+            prefetch_files = max(0, int(self.prefetch_files.get()))
+            prefetch_mb = max(0, int(self.prefetch_mb.get()))
+        except (tk.TclError, ValueError):
+            prefetch_files, prefetch_mb = DEFAULT_PREFETCH_FILES, DEFAULT_PREFETCH_MEMORY_MB
+        ordered = self.ordered_results.get()
+        analysis_mode = next((mode for mode, label in ANALYSIS_MODES.items()
+                              if label == self.analysis_mode.get()), DEFAULT_ANALYSIS_MODE)
+        face_detection_size = next((size for size in FACE_DETECTION_SIZES
+                                    if self._face_size_label(size) == self.face_detection_size.get()),
+                                   DEFAULT_FACE_DETECTION_SIZE)
+
+        sharpness_metric = next((name for name, label in SHARPNESS_METRICS.items()
+                                 if label == self.sharpness_metric.get()), DEFAULT_SHARPNESS_METRIC)
+
+        face_detector = next((name for name, (label, _, _, _) in FACE_DETECTORS.items()
+                              if label == self.face_detector.get()), DEFAULT_FACE_DETECTOR)
 
         # Log start of analysis with settings to activity log
         self.root.after(0, self.log_to_activity,
-                       f"Starting photo analysis...", 'info')
+                       f"Starting photo analysis with {workers} worker{'s' if workers != 1 else ''}...", 'info')
         self.root.after(0, self.log_to_activity,
-                       f"Settings: Sharpness={threshold}, Brightness range={min_brightness}-{max_brightness}, Auto-straighten={'ON' if detect_tilt else 'OFF'}, Require faces={'ON' if require_faces else 'OFF'}", 'secondary')
-
-        for i, file_path in enumerate(arw_files, 1):
-            # Check if cancellation was requested
-            if self.cancel_requested:
-                self.root.after(0, self.log_to_activity, "Analysis cancelled by user", 'warning')
-                self.root.after(0, self.update_status, "Cancelled")
-                self.root.after(0, lambda: self.progress.config(value=0))
-                self.root.after(0, lambda: self.analyze_btn.config(state='normal'))
-                self.root.after(0, lambda: self.cancel_btn.config(state='disabled'))
-                return
+                       f"Settings: Sharpness={threshold}, Brightness range={min_brightness}-{max_brightness}, Auto-straighten={'ON' if detect_tilt else 'OFF'}, Require faces={'ON' if require_faces else 'OFF'}, Mode={analysis_mode}, Face detection size={face_detection_size or 'full'}, Face detector={face_detector}, Sharpness metric={sharpness_metric}, Eyes={'ON' if self.eye_detection.get() else 'OFF'}, Early reject={'ON' if self.early_reject.get() else 'OFF'}", 'secondary')
 
-            # Update status and progress
-            self.root.after(0, self.update_status, f"Analyzing {i}/{len(arw_files)}: {file_path.name}")
-            self.root.after(0, lambda val=i: self.progress.config(value=val))
+        analyze_kwargs = dict(settings, analysis_mode=analysis_mode,
+                              face_detection_size=face_detection_size, face_detector=face_detector,
+                              focus_maps=self.save_focus_maps.get(), sharpness_metric=sharpness_metric,
+                              eye_detection=self.eye_detection.get(), early_reject=self.early_reject.get())
 
-            result = analyze_photo(str(file_path), threshold, detect_tilt, include_vertical, max_brightness, min_brightness, require_faces)
-            result['path'] = str(file_path)
-            result['filename'] = file_path.name
-            self.photos.append(result)
+        # Cache lives next to the photos; it's opened here because SQLite
+        # connections can't be shared between threads
+        cache = AnalysisCache.for_folder(input_dir) if self.use_cache.get() else None
 
-            # Log all photos with status to results - use color tags
-            status_icon = "✓" if result['selected'] else "✗"
-            status_parts = [f"{status_icon} {file_path.name}"]
+        analyzed = []  # (index, result) pairs in completion order
+        cached_count = 0
+        try:
+            duplicates = {}
+            if self.skip_duplicates.get():
+                # Cheap prescan of the embedded previews, so copies are never fully analyzed
+                self.root.after(0, self.update_status, "Scanning previews for duplicates...")
+                fingerprints = scan_fingerprints(raw_files, cache, workers,
+                                                 should_cancel=lambda: self.cancel_requested)
+                if not self.cancel_requested:
+                    duplicates = find_duplicates(raw_files, fingerprints)
+                    if duplicates:
+                        self.root.after(0, self.log_to_activity,
+                                       f"Found {len(duplicates)} duplicate{'s' if len(duplicates) != 1 else ''} - "
+                                       f"skipping them", 'warning')
+
+            results = iter_cached_analysis(raw_files, analyze_kwargs, cache=cache, workers=workers,
+                                           ordered=ordered, should_cancel=lambda: self.cancel_requested,
+                                           prefetch_files=prefetch_files, prefetch_mb=prefetch_mb,
+                                           duplicates=duplicates, memory_budget_mb=memory_budget_mb)
+            for done_count, (index, result, from_cache) in enumerate(results, 1):
+                analyzed.append((index, result))
+                cached_count += from_cache
+
+                # Update status and progress
+                self.root.after(0, self.update_status, f"Analyzed {done_count}/{len(raw_files)}: {result['filename']}")
+                self.root.after(0, lambda val=done_count: self.progress.config(value=val))
+
+                self.root.after(0, self.log_message,
+                                *self._format_result_line(result, settings, detect_tilt, brightness_threshold))
+        except Exception as e:
+            self.root.after(0, self.log_to_activity, f"Analysis failed: {e}", 'error')
+            self.cancel_requested = True
+        finally:
+            if cache and (self.watcher is None or self.cancel_requested):
+                cache.close()
+
+        # Check if cancellation was requested
+        if self.cancel_requested:
+            if self.watcher is not None:
+                self.watcher.stop()
+                self.watcher = None
+            self.analysis_running = False
+            self.root.after(0, self.log_to_activity, "Analysis cancelled by user", 'warning')
+            self.root.after(0, self.update_status, "Cancelled")
+            self.root.after(0, lambda: self.progress.config(value=0))
+            self.root.after(0, lambda: self.analyze_btn.config(state='normal'))
+            self.root.after(0, lambda: self.cancel_btn.config(state='disabled'))
+            return
 
-            # Add sharpness value
-            status_parts.append(f"Sharp: {result['sharpness']:.1f}")
+        # Keep photos in folder order regardless of completion order
+        analyzed.sort(key=lambda item: item[0])
+        self.photos = [result for _, result in analyzed]
+        self.metrics_table = build_metrics_table(self.photos)
+        self.analysis_metric = sharpness_metric
+        self.analysis_running = False
 
-            # Add brightness value
-            brightness = result.get('brightness', 128.0)
-            brightness_threshold = self.brightness_threshold.get()
-            brightness_category = "dark" if brightness < brightness_threshold else "light"
-            status_parts.append(f"Bright: {brightness:.1f} ({brightness_category})")
-
-            # Add face count if faces detected
-            if result.get('face_count', 0) > 0:
-                status_parts.append(f"Faces: {result['face_count']}")
-
-            # Add tilt if detected
-            if detect_tilt and abs(result.get('tilt_angle', 0)) > 0.1:
-                status_parts.append(f"Tilt: {result['tilt_angle']:.2f}°")
-
-            # Add rejection reason if not selected
-            if not result['selected']:
-                reasons = []
-                if require_faces and result.get('face_count', 0) == 0:
-                    reasons.append("no faces")
-                if not result['is_sharp']:
-                    reasons.append(f"low sharpness (<{threshold})")
-                if result.get('is_too_dark', False):
-                    reasons.append(f"too dark (<{min_brightness})")
-                if result.get('is_burned_out', False):
-                    reasons.append(f"burned out (>{max_brightness})")
-                if not include_vertical and not result['is_horizontal']:
-                    reasons.append("vertical")
-                if reasons:
-                    status_parts.append(f"({', '.join(reasons)})")
-
-            # Use colored output in results area
-            tag = 'success' if result['selected'] else 'secondary'
-            self.root.after(0, self.log_message, " | ".join(status_parts), tag)
-        
         selected_count = sum(1 for p in self.photos if p['selected'])
 
-        # Calculate dark vs light photo statistics
-        brightness_threshold = self.brightness_threshold.get()
-        selected_photos = [p for p in self.photos if p['selected']]
-        dark_count = sum(1 for p in selected_photos if p.get('brightness', 128.0) < brightness_threshold)
-        light_count = len(selected_photos) - dark_count
-
-        # Completion summary - add to results
-        self.root.after(0, self.log_message,
-                       f"\n{'='*60}", 'accent')
-        self.root.after(0, self.log_message,
-                       f"ANALYSIS COMPLETE", 'success')
-        self.root.after(0, self.log_message,
-                       f"{'='*60}", 'accent')
-        self.root.after(0, self.log_message,
-                       f"Photos analyzed: {len(self.photos)}", 'info')
-        self.root.after(0, self.log_message,
-                       f"Photos selected: {selected_count}", 'success')
-        self.root.after(0, self.log_message,
-                       f"  - Dark photos (< {brightness_threshold}): {dark_count}", 'info')
-        self.root.after(0, self.log_message,
-                       f"  - Light photos (>= {brightness_threshold}): {light_count}", 'info')
-        self.root.after(0, self.log_message,
-                       f"Photos rejected: {len(self.photos) - selected_count}", 'secondary')
-        self.root.after(0, self.log_message,
-                       f"{'='*60}\n", 'accent')
-
         # Log to activity log
+        if cached_count:
+            self.root.after(0, self.log_to_activity,
+                           f"Reused {cached_count} cached results, analyzed {len(self.photos) - cached_count} new or changed photos", 'secondary')
+        self._log_timing_summary()
+        self._log_memory_summary(memory_budget_mb)
+        self._log_early_reject_summary()
         self.root.after(0, self.log_to_activity,
                        f"Analysis complete: {selected_count}/{len(self.photos)} photos selected", 'success')
 
-        # Update status
-        self.root.after(0, self.update_status,
-                       f"Analysis complete: {selected_count} of {len(self.photos)} photos selected")
+        # Re-render the results in folder order with the current slider values
+        # (they may have been moved while the analysis was running)
+        self.root.after(0, self._reapply_selection)
+
+        if self.watcher is not None:
+            self._watch_folder(analyze_kwargs, cache, workers, memory_budget_mb, prefetch_files, prefetch_mb)
 
         self.root.after(0, lambda: self.progress.config(value=0))
         self.root.after(0, lambda: self.analyze_btn.config(state='normal'))
         self.root.after(0, lambda: self.cancel_btn.config(state='disabled'))
         self.root.after(0, lambda: self.process_btn.config(state='normal'))
-    
+
+    def _watch_folder(self, analyze_kwargs, cache, workers, memory_budget_mb, prefetch_files, prefetch_mb):
+        """Analyze photos copied into the input folder until the user cancels"""
+        watcher = self.watcher
+        how = "file system events" if HAS_WATCHDOG else "polling"
+        self.root.after(0, self.log_to_activity,
+                       f"Watching {watcher.folder} for new photos ({how}) - press Cancel to stop", 'info')
+        self.root.after(0, self.update_status, "Watching for new photos...")
+        new_count = 0
+        try:
+            for result in iter_watched_analysis(watcher, analyze_kwargs, cache=cache, workers=workers,
+                                                should_cancel=lambda: self.cancel_requested,
+                                                prefetch_files=prefetch_files, prefetch_mb=prefetch_mb,
+                                                memory_budget_mb=memory_budget_mb):
+                new_count += 1
+                self.root.after(0, self._add_watched_result, result)
+        except Exception as e:
+            self.root.after(0, self.log_to_activity, f"Watching failed: {e}", 'error')
+        finally:
+            watcher.stop()
+            self.watcher = None
+            if cache:
+                cache.close()
+        self.root.after(0, self.log_to_activity,
+                       f"Stopped watching: {new_count} new photo{'s' if new_count != 1 else ''} analyzed", 'success')
+        self.root.after(0, self._reapply_selection)
+
+    def _add_watched_result(self, result):
+        """Add a photo analyzed in watch mode and refresh the selection (runs on the UI thread)
+
+        A copy of a photo analyzed before is marked as a duplicate (see
+        watched_duplicate_of). The photo is appended to the metrics table, which
+        regroups the burst it joins (see append_metrics_row), and to the results
+        area; only the lines whose selection changed (e.g. the rest of its burst)
+        and the summary are redrawn.
+        """
+        original = watched_duplicate_of(self.photos, result) if self.skip_duplicates.get() else None
+        if original is not None:
+            result = duplicate_result(result['path'], original['path'])
+            self.log_to_activity(f"New photo {result['filename']} is a duplicate of {original['filename']} - skipped",
+                                 'warning')
+        else:
+            self.log_to_activity(f"New photo analyzed: {result['filename']}", 'secondary')
+        self.photos.append(result)
+        if self.metrics_table is not None:
+            self.metrics_table = append_metrics_row(self.metrics_table, result)
+        try:
+            settings = self._selection_settings()
+            brightness_threshold = self.brightness_threshold.get()
+            burst_keep = max(0, self.burst_keep.get())
+        except (tk.TclError, ValueError):
+            self._shown_selection = None  # Slider/entry temporarily holds an invalid value
+        if self.metrics_table is None or self._shown_selection is None or self._reselect_job is not None:
+            self._on_selection_setting_changed()  # Not rendered yet, or a full refresh is due anyway
+            return
+
+        selection = select_photos(self.metrics_table, burst_keep=burst_keep, sharpness_metric=self.analysis_metric,
+                                  **settings)
+        changed = np.ones(len(self.photos), dtype=bool)
+        changed[:-1] = False
+        for key, values in selection.items():
+            changed[:-1] |= values[:-1] != self._shown_selection[key]
+        rows = np.flatnonzero(changed).tolist()
+        apply_selection(self.photos, selection, rows)
+
+        detect_tilt = self.auto_straighten.get()
+        shown_count = len(self.photos) - 1
+        self.results_text.delete(f"{shown_count + 1}.0", tk.END)  # The summary
+        for i in rows[:-1]:
+            line, tag = self._format_result_line(self.photos[i], settings, detect_tilt, brightness_threshold,
+                                                 burst_keep)
+            self.results_text.delete(f"{i + 1}.0", f"{i + 1}.end")
+            self.results_text.insert(f"{i + 1}.0", line, tag)
+        line, tag = self._format_result_line(result, settings, detect_tilt, brightness_threshold, burst_keep)
+        chunks = [line + "\n", tag]
+        for line, tag in self._results_summary(selection, brightness_threshold, burst_keep):
+            chunks.extend((line + "\n", tag))
+        self.results_text.insert(tk.END, *chunks)
+        self.results_text.see(tk.END)
+        self._shown_selection = selection
+        self.status_label.config(text=f"Watching for new photos: {int(selection['selected'].sum())} of "
+                                      f"{len(self.photos)} photos selected")
+
+    def _log_timing_summary(self):
+        """Log average time per analysis stage and the savings from loading the face cascade once"""
+        timings = summarize_timings(self.photos)
+        if not timings:
+            return  # Everything came from the cache
+
+        stages = [f"{stage} {total / count:.2f}s" for stage, (total, count) in timings.items()
+                  if stage != 'cascade_load']
+        self.root.after(0, self.log_to_activity,
+                       f"Average time per photo: {', '.join(stages)}", 'secondary')
+        if 'faces' in timings:
+            faces_total, faces_count = timings['faces']
+            if faces_total > 0:
+                self.root.after(0, self.log_to_activity,
+                               f"Face detection throughput: {faces_count / faces_total:.1f} images/sec per worker", 'secondary')
+
+        if 'cascade_load' in timings:
+            load_total, load_count = timings['cascade_load']
+            analyzed_count = timings.get('decode', (0.0, 0))[1]
+            load_each = load_total / load_count
+            saved = load_each * max(0, analyzed_count - load_count)
+            self.root.after(0, self.log_to_activity,
+                           f"Face detector loaded {load_count}x ({load_each * 1000:.0f} ms each) for {analyzed_count} photos - "
+                           f"saved ~{saved:.1f}s vs loading it per photo", 'secondary')
+
+    def _log_early_reject_summary(self):
+        """Log how many photos were rejected from their preview and the time that saved"""
+        counts, saved = summarize_early_rejects(self.photos)
+        if not counts:
+            return
+        reasons = ", ".join(f"{label} {counts[reason]}" for reason, label in EARLY_REJECT_REASONS.items()
+                            if reason in counts)
+        self.root.after(0, self.log_to_activity,
+                       f"Rejected early from the preview: {sum(counts.values())} ({reasons})"
+                       + (f" - saved ~{saved:.1f}s of analysis" if saved is not None and saved > 0 else ""),
+                       'secondary')
+
+    def _log_memory_summary(self, memory_budget_mb):
+        """Log the largest per-photo memory estimate against the measured peak memory"""
+        estimate, worker_peak, prefetch_peak = summarize_memory(self.photos)
+        parts = []
+        if estimate:
+            parts.append(f"largest photo ~{estimate:.0f} MB (estimated)")
+        if worker_peak:
+            parts.append(f"worker peak {worker_peak:.0f} MB")
+        main_peak = peak_rss_mb()
+        if main_peak:
+            parts.append(f"app peak {main_peak:.0f} MB")
+        if prefetch_peak:
+            parts.append(f"read-ahead peak {prefetch_peak:.0f} MB")
+        if parts:
+            budget = f"budget {memory_budget_mb} MB" if memory_budget_mb else "no budget"
+            self.root.after(0, self.log_to_activity, f"Memory: {', '.join(parts)} ({budget})", 'secondary')
+
+    def _selection_settings(self):
+        """Current selection thresholds from the GUI, as evaluate_selection/select_photos kwargs"""
+        return {
+            'sharpness_threshold': self.sharpness_threshold.get(),
+            'include_vertical': True,  # Always include vertical photos
+            'max_brightness': self.max_brightness_threshold.get(),
+            'min_brightness': self.min_brightness_threshold.get(),
+            'require_faces': self.require_faces.get(),
+        }
+
+    def _on_selection_setting_changed(self, *args):
+        """Re-filter analyzed photos shortly after a threshold changes (debounced for slider drags)"""
+        if not self.photos or self.analysis_running:
+            return
+        if self._reselect_job is not None:
+            self.root.after_cancel(self._reselect_job)
+        self._reselect_job = self.root.after(100, self._reapply_selection)
+
+    def _reapply_selection(self):
+        """Apply the current thresholds to all analyzed photos and refresh the results list"""
+        self._reselect_job = None
+        if not self.photos:
+            return
+        try:
+            settings = self._selection_settings()
+            brightness_threshold = self.brightness_threshold.get()
+            burst_keep = max(0, self.burst_keep.get())
+        except (tk.TclError, ValueError):
+            return  # Slider/entry temporarily holds an invalid value
+
+        if self.metrics_table is None:
+            self.metrics_table = build_metrics_table(self.photos)
+        selection = select_photos(self.metrics_table, burst_keep=burst_keep, sharpness_metric=self.analysis_metric,
+                                  **settings)
+        apply_selection(self.photos, selection)
+        self._render_results(selection, settings, brightness_threshold, burst_keep)
+
+        selected_count = int(selection['selected'].sum())
+        state = "Watching for new photos" if self.watcher is not None else "Analysis complete"
+        self.status_label.config(text=f"{state}: {selected_count} of {len(self.photos)} photos selected")
+
+    def _render_results(self, selection, settings, brightness_threshold, burst_keep=0):
+        """Replace the results area with all analyzed photos and the summary in one update"""
+        detect_tilt = self.auto_straighten.get()
+        chunks = []
+        for photo in self.photos:
+            line, tag = self._format_result_line(photo, settings, detect_tilt, brightness_threshold, burst_keep)
+            chunks.extend((line + "\n", tag))
+        for line, tag in self._results_summary(selection, brightness_threshold, burst_keep):
+            chunks.extend((line + "\n", tag))
+
+        # A single insert keeps re-filtering thousands of photos responsive
+        self.results_text.delete(1.0, tk.END)
+        self.results_text.insert(tk.END, *chunks)
+        self.results_text.see(tk.END)
+        self._shown_selection = selection
+
+    def _results_summary(self, selection, brightness_threshold, burst_keep=0):
+        """Summary lines under the results, counted from the metrics table and selection arrays
+
+        Returns:
+            list of (line, tag) tuples
+        """
+        table = self.metrics_table
+        selected = selection['selected']
+        selected_count = int(selected.sum())
+
+        # Calculate dark vs light photo statistics
+        dark_count = int((selected & (table['brightness'] < brightness_threshold)).sum())
+        light_count = selected_count - dark_count
+
+        # Completion summary
+        summary = [
+            (f"\n{'='*60}", 'accent'),
+            ("ANALYSIS COMPLETE", 'success'),
+            (f"{'='*60}", 'accent'),
+            (f"Photos analyzed: {len(self.photos)}", 'info'),
+            (f"Photos selected: {selected_count}", 'success'),
+            (f"  - Dark photos (< {brightness_threshold}): {dark_count}", 'info'),
+            (f"  - Light photos (>= {brightness_threshold}): {light_count}", 'info'),
+            (f"Photos rejected: {len(self.photos) - selected_count}", 'secondary'),
+        ]
+        duplicate_count = int(table['duplicate'].sum())
+        if duplicate_count:
+            summary.append((f"  - Duplicates skipped: {duplicate_count}", 'secondary'))
+        needs_analysis = selection['needs_analysis']
+        early_counts, _ = summarize_early_rejects([self.photos[i]
+                                                   for i in np.flatnonzero(table['early_reject'] & ~needs_analysis)])
+        for reason, label in EARLY_REJECT_REASONS.items():
+            if reason in early_counts:
+                summary.append((f"  - Rejected from the preview as {label}: {early_counts[reason]}", 'secondary'))
+        if needs_analysis.any():
+            summary.append((f"  - Need full analysis for the new thresholds (run Analyze again): "
+                            f"{int(needs_analysis.sum())}", 'warning'))
+        if burst_keep > 0:
+            burst_count = len(np.unique(table['burst'][table['burst_size'] > 1]))
+            dropped = int(selection['is_burst_duplicate'].sum())
+            summary.append((f"  - Best {burst_keep} kept in {burst_count} bursts: {dropped} similar frames dropped",
+                            'secondary'))
+        summary.append((f"{'='*60}\n", 'accent'))
+        return summary
+
+    def _format_result_line(self, result, settings, detect_tilt, brightness_threshold, burst_keep=0):
+        """Format one analyzed photo with its status for the results area
+
+        Returns:
+            (line, tag) tuple
+        """
+        # Log all photos with status to results - use color tags
+        status_icon = "✓" if result['selected'] else "✗"
+        status_parts = [f"{status_icon} {result['filename']}"]
+
+        # Add sharpness value
+        status_parts.append(f"Sharp: {result['sharpness']:.1f}")
+
+        # Add brightness value
+        brightness = result.get('brightness', 128.0)
+        brightness_category = "dark" if brightness < brightness_threshold else "light"
+        status_parts.append(f"Bright: {brightness:.1f} ({brightness_category})")
+
+        # Add face count if faces detected
+        if result.get('face_count', 0) > 0:
+            status_parts.append(f"Faces: {result['face_count']}")
+            if result.get('eye_count', 0) > 0:
+                status_parts.append(f"Eyes: {result['eye_count']}")
+
+        # Add burst size if the photo belongs to a burst
+        if burst_keep > 0 and result.get('burst_size', 1) > 1:
+            status_parts.append(f"Burst: {result['burst_size']}")
+
+        # Add tilt if detected
+        if detect_tilt and abs(result.get('tilt_angle', 0)) > 0.1:
+            low_confidence = result.get('tilt_confidence', 0.0) < TILT_MIN_CONFIDENCE
+            status_parts.append(f"Tilt: {result['tilt_angle']:.2f}°" + (" (uncertain)" if low_confidence else ""))
+
+        # Duplicates weren't analyzed - nothing else to report
+        if result.get('duplicate_of'):
+            return f"✗ {result['filename']} | (duplicate of {result['duplicate_of']})", 'secondary'
+
+        # Add rejection reason if not selected
+        if not result['selected']:
+            reasons = []
+            if result.get('error'):
+                reasons.append(f"error: {result['error']}")
+            if result.get('needs_analysis'):
+                # Rejected from the preview under stricter thresholds - the cache
+                # analyzes it fully on the next run
+                return (f"? {result['filename']} | Sharp: {result['sharpness']:.1f} (preview) | "
+                        f"needs full analysis for the new thresholds - run Analyze again", 'warning')
+            if result.get('early_reject'):
+                # Only the preview was checked - no faces were looked for
+                reasons.append(f"rejected from preview: {EARLY_REJECT_REASONS[result['early_reject']]}")
+            elif settings['require_faces'] and result.get('face_count', 0) == 0:
+                reasons.append("no faces")
+            if not result['is_sharp']:
+                reasons.append(f"low sharpness (<{settings['sharpness_threshold']})")
+            if result.get('is_too_dark', False):
+                reasons.append(f"too dark (<{settings['min_brightness']})")
+            if result.get('is_burned_out', False):
+                reasons.append(f"burned out (>{settings['max_brightness']})")
+            if not settings['include_vertical'] and not result['is_horizontal']:
+                reasons.append("vertical")
+            if result.get('is_burst_duplicate', False):
+                reasons.append(f"burst - {burst_keep} better frame{'s' if burst_keep != 1 else ''} kept")
+            if reasons:
+                status_parts.append(f"({', '.join(reasons)})")
+
+        # Use colored output in results area
+        tag = 'success' if result['selected'] else 'secondary'
+        return " | ".join(status_parts), tag
+
     def process_photos(self):
         output_dir = self.output_folder.get()
         if not output_dir:
@@ -1612,15 +4492,49 @@ class PhotoSelectorApp:
         # Track mapping of original RAW files to new names for Photoshop processing
         photo_mappings = []
 
-        for i, photo in enumerate(selected_photos, 1):
-            # Check if cancellation was requested
+        dng_count = sum(1 for p in selected_photos if raw_format(p['path']) == 'DNG')
+        if dng_count:
+            self.root.after(0, self.log_to_activity,
+                           f"{dng_count} DNG file{'s' if dng_count != 1 else ''}: Camera Raw reads DNG settings from "
+                           f"the file itself and ignores XMP sidecars - apply the preset to them in Lightroom/Bridge",
+                           'warning')
+
+        # Tilt is only measured now, for the photos that are kept (see measure_tilts)
+        straighten = self.auto_straighten.get()
+        if straighten and selected_photos:
+            self.root.after(0, self.update_status, "Measuring horizon tilt...")
+            cache = (AnalysisCache.for_folder(Path(selected_photos[0]['path']).parent)
+                     if self.use_cache.get() else None)
+            try:
+                workers = max(1, int(self.analysis_workers.get()))
+            except (tk.TclError, ValueError):
+                workers = DEFAULT_ANALYSIS_WORKERS
+            start = time.perf_counter()
+            try:
+                measured = measure_tilts(selected_photos, cache, workers,
+                                         should_cancel=lambda: self.cancel_requested)
+            finally:
+                if cache:
+                    cache.close()
+            self.root.after(0, self.log_to_activity,
+                           f"Horizon tilt measured for {measured} selected photo{'s' if measured != 1 else ''} "
+                           f"in {time.perf_counter() - start:.1f}s"
+                           + (f" ({len(selected_photos) - measured} from cache)" if measured < len(selected_photos) else ""),
+                           'secondary')
+
+        # Save XMP sidecars in INPUT folder (stay with original RAW files), with the dark
+        # or light preset depending on the brightness threshold - written by a thread
+        # pool, atomically, and skipped if unchanged (see write_xmp_sidecars)
+        auto_exposure = self.auto_exposure.get()
+        sidecars = write_xmp_sidecars(selected_photos, self.brightness_threshold.get(),
+                                      self.custom_xmp_content_dark, self.custom_xmp_content_light, straighten,
+                                      auto_exposure, should_cancel=lambda: self.cancel_requested)
+        unchanged_count = 0
+
+        for i, (photo, (xmp_path, preset_type, written, error)) in enumerate(zip(selected_photos, sidecars), 1):
+            # Check if cancellation was requested (the writer also stops queueing sidecars)
             if self.cancel_requested:
-                self.root.after(0, self.log_to_activity, "Processing cancelled by user", 'warning')
-                self.root.after(0, self.update_status, "Cancelled")
-                self.root.after(0, lambda: self.progress.config(value=0))
-                self.root.after(0, lambda: self.analyze_btn.config(state='normal'))
-                self.root.after(0, lambda: self.cancel_btn.config(state='disabled'))
-                return
+                break
 
             try:
                 # Update progress
@@ -1628,7 +4542,6 @@ class PhotoSelectorApp:
                 self.root.after(0, lambda val=i: self.progress.config(value=val))
 
                 # Extract original number from filename (e.g., DSC00595 -> 00595)
-                import re
                 original_filename = Path(photo['filename']).stem  # Remove extension
 
                 # Try to extract number from various Sony camera filename formats
@@ -1651,38 +4564,17 @@ class PhotoSelectorApp:
                 self.root.after(0, self.log_to_activity,
                               f"Processing {original_filename}{original_ext}", 'info')
 
-                # Generate and save XMP sidecar file with preset (including rotation if detected)
-                tilt_angle = photo.get('tilt_angle', 0.0)
+                # XMP sidecar with preset (including rotation if detected)
+                if error is not None:
+                    raise error
+                unchanged_count += not written
+                tilt_angle = straighten_angle(photo) if straighten else 0.0
                 brightness = photo.get('brightness', 128.0)
-                brightness_threshold = self.brightness_threshold.get()
-
-                # Create XMP sidecar in INPUT folder (next to RAW file)
-                xmp_path = original_raw_path.with_suffix('.xmp')
-
-                # Determine if photo is dark or light based on brightness threshold
-                is_dark = brightness < brightness_threshold
-
-                # Choose appropriate XMP preset based on brightness
-                if is_dark:
-                    # Use dark preset
-                    if self.custom_xmp_content_dark:
-                        xmp_content = generate_xmp_with_rotation(tilt_angle, base_xmp=self.custom_xmp_content_dark)
-                        preset_type = "dark (custom)"
-                    else:
-                        xmp_content = generate_xmp_with_rotation(tilt_angle)
-                        preset_type = "dark (built-in)"
-                else:
-                    # Use light preset
-                    if self.custom_xmp_content_light:
-                        xmp_content = generate_xmp_with_rotation(tilt_angle, base_xmp=self.custom_xmp_content_light)
-                        preset_type = "light (custom)"
-                    else:
-                        xmp_content = generate_xmp_with_rotation(tilt_angle)
-                        preset_type = "light (built-in)"
-
-                # Save XMP sidecar in INPUT folder (stays with original RAW file)
-                with open(xmp_path, 'w', encoding='utf-8') as xmp_file:
-                    xmp_file.write(xmp_content)
+                exposure = exposure_offset(photo) if auto_exposure else 0.0
+                if straighten and tilt_skipped(photo):
+                    self.root.after(0, self.log_to_activity,
+                                  f"  → Tilt {photo['tilt_angle']:.2f}° not applied: confidence "
+                                  f"{photo['tilt_confidence']:.0%} is below {TILT_MIN_CONFIDENCE:.0%}", 'warning')
 
                 # Store mapping for later (for renaming JPEGs)
                 photo_mappings.append({
@@ -1690,27 +4582,40 @@ class PhotoSelectorApp:
                     'new_basename': new_base_name,
                     'preset_type': preset_type,
                     'brightness': brightness,
-                    'tilt_angle': tilt_angle
+                    'tilt_angle': tilt_angle,
+                    'exposure_offset': exposure
                 })
 
                 # Log XMP creation with brightness and tilt info
+                unchanged = "" if written else " (sidecar unchanged)"
+                exposure_info = f", exposure {exposure:+.2f} EV" if exposure else ""
                 if abs(tilt_angle) > 0.1:
                     self.root.after(0, self.log_to_activity,
-                                  f"  → XMP {preset_type} applied, brightness={brightness:.1f}, rotation={abs(tilt_angle):.2f}°", 'success')
+                                  f"  → XMP {preset_type} applied, brightness={brightness:.1f}{exposure_info}, rotation={abs(tilt_angle):.2f}°{unchanged}", 'success')
                 else:
                     self.root.after(0, self.log_to_activity,
-                                  f"  → XMP {preset_type} applied, brightness={brightness:.1f}", 'secondary')
+                                  f"  → XMP {preset_type} applied, brightness={brightness:.1f}{exposure_info}{unchanged}", 'secondary')
 
             except Exception as e:
                 self.root.after(0, self.log_to_activity,
                               f"Error processing {photo['filename']}: {e}", 'error')
 
+        if self.cancel_requested:
+            sidecars.close()
+            self.root.after(0, self.log_to_activity, "Processing cancelled by user", 'warning')
+            self.root.after(0, self.update_status, "Cancelled")
+            self.root.after(0, lambda: self.progress.config(value=0))
+            self.root.after(0, lambda: self.analyze_btn.config(state='normal'))
+            self.root.after(0, lambda: self.cancel_btn.config(state='disabled'))
+            return
+
         # Get input folder from first photo
         input_dir = str(Path(selected_photos[0]['path']).parent) if selected_photos else None
 
         # Log completion to activity log
         self.root.after(0, self.log_to_activity,
-                       f"✓ XMP sidecars created in input folder for {len(selected_photos)} photos", 'success')
+                       f"✓ XMP sidecars created in input folder for {len(selected_photos)} photos"
+                       + (f" ({unchanged_count} already up to date)" if unchanged_count else ""), 'success')
         self.root.after(0, self.update_status,
                        f"XMP sidecars created: {len(selected_photos)} files in input folder")
 
@@ -1870,16 +4775,357 @@ class PhotoSelectorApp:
                            f"4. Export as JPEG to:\n   {output_dir}"))
 
 
-def main():
+# Columns of the command-line analyzer's CSV output (JSON Lines has the same keys)
+CLI_RESULT_FIELDS = ('filename', 'path', 'selected', 'sharpness', 'center_sharpness', 'thirds_sharpness',
+                     'brightness', 'luminance_median', 'luminance_p99', 'exposure_offset', 'face_count', 'eye_count',
+                     'width', 'height', 'tilt_angle', 'tilt_confidence', 'is_sharp', 'is_horizontal', 'is_burned_out',
+                     'is_too_dark', 'is_burst_duplicate', 'burst_size', 'capture_time', 'phash',
+                     'duplicate_of', 'early_reject', 'analysis_mode', 'cached', 'xmp', 'error')
+
+
+def build_cli_parser():
+    """Argument parser of the headless `analyze` command"""
+    parser = argparse.ArgumentParser(
+        prog="photo_selector.py analyze",
+        description="Analyze a folder of RAW photos without the GUI and stream one result per photo.")
+    parser.add_argument("folder", help=f"Folder with RAW files ({', '.join(RAW_FORMATS)})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_ANALYSIS_WORKERS,
+                        help=f"Analysis worker processes (default: {DEFAULT_ANALYSIS_WORKERS})")
+    parser.add_argument("--format", choices=('jsonl', 'csv'), default='jsonl',
+                        help="Output format (default: jsonl)")
+    parser.add_argument("--output", "-o", help="Write results to this file instead of stdout")
+    parser.add_argument("--ordered", action="store_true",
+                        help="Emit results in file order instead of as they complete")
+    parser.add_argument("--mode", choices=list(ANALYSIS_MODES), default=DEFAULT_ANALYSIS_MODE,
+                        help=f"Image source for analysis (default: {DEFAULT_ANALYSIS_MODE})")
+    parser.add_argument("--detector", choices=list(FACE_DETECTORS), default=DEFAULT_FACE_DETECTOR,
+                        help=f"Face detector backend (default: {DEFAULT_FACE_DETECTOR})")
+    parser.add_argument("--face-size", type=int, default=DEFAULT_FACE_DETECTION_SIZE,
+                        help="Long edge to downscale to for face detection (0 = full size)")
+    parser.add_argument("--sharpness", type=int, default=20, help="Sharpness threshold (default: 20)")
+    parser.add_argument("--sharpness-metric", choices=list(SHARPNESS_METRICS), default=DEFAULT_SHARPNESS_METRIC,
+                        help=f"Sharpness metric (default: {DEFAULT_SHARPNESS_METRIC})")
+    parser.add_argument("--min-brightness", type=int, default=30, help="Reject darker photos (default: 30)")
+    parser.add_argument("--max-brightness", type=int, default=220, help="Reject brighter photos (default: 220)")
+    parser.add_argument("--brightness-threshold", type=int, default=100,
+                        help="Dark/light preset boundary for --write-xmp (default: 100)")
+    parser.add_argument("--burst-keep", type=int, default=0,
+                        help="Keep only the best N frames of each burst / near-duplicate group "
+                             "(0 = keep all; results are then written after the whole folder is analyzed)")
+    parser.add_argument("--keep-duplicates", dest="skip_duplicates", action="store_false",
+                        help="Analyze duplicate copies of the same shot instead of skipping them")
+    parser.add_argument("--no-early-reject", dest="early_reject", action="store_false",
+                        help="Fully analyze every photo, even if its preview is clearly black, blown out or blurry")
+    parser.add_argument("--no-eyes", dest="eye_detection", action="store_false",
+                        help="Score faces by their center instead of the detected eyes")
+    parser.add_argument("--no-require-faces", dest="require_faces", action="store_false",
+                        help="Don't require faces (brand/product photography)")
+    parser.add_argument("--no-straighten", dest="detect_tilt", action="store_false",
+                        help="Skip horizon tilt detection (otherwise measured for selected photos only, which "
+                             "are then written after the analysis)")
+    parser.add_argument("--focus-maps", action="store_true",
+                        help=f"Save a focus heatmap PNG per photo in {FOCUS_MAP_DIRNAME}/")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="Don't read or update the analysis cache")
+    parser.add_argument("--prefetch-mb", type=int, default=DEFAULT_PREFETCH_MEMORY_MB,
+                        help=f"Read-ahead memory budget in MB, 0 to disable (default: {DEFAULT_PREFETCH_MEMORY_MB})")
+    parser.add_argument("--prefetch-files", type=int, default=DEFAULT_PREFETCH_FILES,
+                        help=f"Files read ahead of the analysis at most, 0 to disable (default: {DEFAULT_PREFETCH_FILES})")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help=f"Memory budget of the analysis workers in MB; large files wait while it's used up, "
+                             f"0 for no limit (default: {DEFAULT_MEMORY_BUDGET_MB}, half the RAM)")
+    parser.add_argument("--watch", action="store_true",
+                        help="After the existing photos, keep analyzing new ones as they're copied into the "
+                             "folder until Ctrl+C")
+    parser.add_argument("--write-xmp", action="store_true",
+                        help="Write XMP sidecars for selected photos next to the RAW files")
+    parser.add_argument("--auto-exposure", action="store_true",
+                        help="With --write-xmp, add a per-photo exposure offset toward middle gray to the preset")
+    parser.add_argument("--preset-dark", help="Custom XMP preset for dark photos")
+    parser.add_argument("--preset-light", help="Custom XMP preset for light photos")
+    return parser
+
+
+def _cli_record(result, from_cache, xmp_path):
+    """Flatten an analysis result into a CLI output row"""
+    record = {key: result.get(key) for key in CLI_RESULT_FIELDS}
+    record['cached'] = bool(from_cache)
+    record['xmp'] = str(xmp_path) if xmp_path else None
+    return record
+
+
+def run_cli_analysis(args):
+    """Headless analysis: stream results to stdout/--output and print a summary to stderr
+
+    Returns:
+        Process exit code
+    """
+    folder = Path(args.folder)
+    if not folder.is_dir():
+        print(f"Error: {folder} is not a folder", file=sys.stderr)
+        return 1
+    raw_files = find_raw_files(folder)
+    if not raw_files and not args.watch:
+        print(f"Error: no RAW files ({', '.join(RAW_FORMATS)}) found in {folder}", file=sys.stderr)
+        return 1
+    problem = face_detector_problem(args.detector)
+    if problem:
+        print(f"Error: {problem}", file=sys.stderr)
+        return 1
+
+    presets = {}
+    for kind in ('dark', 'light'):
+        preset_path = getattr(args, f'preset_{kind}')
+        if preset_path:
+            try:
+                with open(preset_path, 'r', encoding='utf-8') as f:
+                    presets[kind] = f.read()
+                xmp_preset(presets[kind])
+            except OSError as e:
+                print(f"Error: could not read preset {preset_path}: {e}", file=sys.stderr)
+                return 1
+            except ValueError as e:
+                print(f"Error: {preset_path} is not a Camera Raw XMP preset: {e}", file=sys.stderr)
+                return 1
+
+    # Analysis errors are printed by the workers; keep them off the result stream
+    # by pointing file descriptor 1 (inherited by the worker processes) at stderr
+    # while the analysis runs
+    sys.stdout.flush()
+    try:
+        if args.output:
+            out = open(args.output, 'w', encoding='utf-8', newline='')
+        else:
+            out = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8', newline='')
+    except OSError as e:
+        print(f"Error: could not open {args.output} for writing: {e}", file=sys.stderr)
+        return 1
+    saved_stdout = os.dup(sys.stdout.fileno())
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    try:
+        return _run_cli_pipeline(args, folder, raw_files, presets, out)
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved_stdout, sys.stdout.fileno())
+        os.close(saved_stdout)
+
+
+def _run_cli_pipeline(args, folder, raw_files, presets, out):
+    """Analyze for run_cli_analysis, writing results to out (closed when done)
+
+    Returns:
+        Process exit code
+    """
+    analyze_kwargs = {
+        'sharpness_threshold': args.sharpness,
+        'include_vertical': True,
+        'max_brightness': args.max_brightness,
+        'min_brightness': args.min_brightness,
+        'require_faces': args.require_faces,
+        'analysis_mode': args.mode,
+        'face_detection_size': args.face_size,
+        'face_detector': args.detector,
+        'focus_maps': args.focus_maps,
+        'sharpness_metric': args.sharpness_metric,
+        'eye_detection': args.eye_detection,
+        'early_reject': args.early_reject,
+    }
+    workers = max(1, args.workers if args.watch else min(args.workers, len(raw_files)))
+    print(f"Analyzing {len(raw_files)} photos in {folder} with {workers} worker{'s' if workers != 1 else ''}...",
+          file=sys.stderr)
+
+    writer = None
+    if args.format == 'csv':
+        writer = csv.DictWriter(out, fieldnames=CLI_RESULT_FIELDS)
+        writer.writeheader()
+
+    cache = AnalysisCache.for_folder(folder) if args.use_cache else None
+    # Started before the analysis so photos copied in meanwhile are picked up too
+    watcher = FolderWatcher(folder, known=raw_files) if args.watch else None
+    start = time.perf_counter()
+    results = []  # (index, result, from_cache)
+    cached_count = 0
+    xmp_count = 0
+    interrupted = False
+    # Selected photos wait for their tilt, measured in one parallel pass after the analysis
+    awaiting_tilt = []  # (result, from_cache)
+
+    def emit(result, from_cache):
+        nonlocal xmp_count
+        xmp_path = None
+        if args.auto_exposure and result['selected']:
+            result['exposure_offset'] = exposure_offset(result)
+        if args.write_xmp and result['selected']:
+            try:
+                xmp_path, _ = write_xmp_sidecar(result, args.brightness_threshold,
+                                                presets.get('dark'), presets.get('light'), args.detect_tilt,
+                                                args.auto_exposure)
+                xmp_count += 1
+            except OSError as e:
+                print(f"Error writing XMP for {result['filename']}: {e}", file=sys.stderr)
+
+        record = _cli_record(result, from_cache, xmp_path)
+        if writer:
+            writer.writerow(record)
+        else:
+            out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    try:
+        duplicates = {}
+        if args.skip_duplicates:
+            duplicates = find_duplicates(raw_files, scan_fingerprints(raw_files, cache, workers))
+            if duplicates:
+                print(f"Skipping {len(duplicates)} duplicate{'s' if len(duplicates) != 1 else ''}", file=sys.stderr)
+
+        for index, result, from_cache in iter_cached_analysis(raw_files, analyze_kwargs, cache=cache,
+                                                              workers=workers, ordered=args.ordered,
+                                                              prefetch_files=args.prefetch_files,
+                                                              prefetch_mb=args.prefetch_mb,
+                                                              duplicates=duplicates,
+                                                              memory_budget_mb=args.memory_mb):
+            results.append((index, result, from_cache))
+            cached_count += from_cache
+            if args.burst_keep:
+                continue
+            if args.detect_tilt and result['selected']:
+                awaiting_tilt.append((result, from_cache))
+            else:
+                emit(result, from_cache)
+
+        if awaiting_tilt:
+            measure_tilts([result for result, _ in awaiting_tilt], cache, workers)
+            while awaiting_tilt:
+                emit(*awaiting_tilt.pop(0))
+
+        if watcher is not None:
+            print(f"Watching {folder} for new photos ({'file system events' if HAS_WATCHDOG else 'polling'}) - "
+                  f"press Ctrl+C to stop", file=sys.stderr)
+            try:
+                for result in iter_watched_analysis(watcher, analyze_kwargs, cache=cache, workers=workers,
+                                                    prefetch_files=args.prefetch_files,
+                                                    prefetch_mb=args.prefetch_mb, memory_budget_mb=args.memory_mb):
+                    original = (watched_duplicate_of([r for _, r, _ in results], result)
+                                if args.skip_duplicates else None)
+                    if original is not None:
+                        result = duplicate_result(result['path'], original['path'])
+                    results.append((len(results), result, False))
+                    if not args.burst_keep:
+                        if args.detect_tilt and result['selected']:
+                            # Photos arrive one at a time here - measure this one right away
+                            measure_tilts([result], cache, workers=1)
+                        emit(result, False)
+            except KeyboardInterrupt:
+                pass  # Ctrl+C is how watching ends - still write burst results and the summary
+            finally:
+                watcher.stop()
+
+        if args.burst_keep:
+            # Bursts need every frame, so results are written once the whole folder is analyzed
+            results.sort(key=lambda item: item[0])
+            photos = [result for _, result, _ in results]
+            selection = select_photos(build_metrics_table(photos), burst_keep=args.burst_keep,
+                                      **{key: analyze_kwargs[key] for key in
+                                         ('sharpness_threshold', 'include_vertical', 'max_brightness',
+                                          'min_brightness', 'require_faces', 'sharpness_metric')})
+            apply_selection(photos, selection)
+            if args.detect_tilt:
+                measure_tilts(photos, cache, workers)
+            for _, result, from_cache in results:
+                emit(result, from_cache)
+    except (KeyboardInterrupt, BrokenPipeError):
+        # Ctrl+C, or whoever reads the output (e.g. `| head`) went away
+        interrupted = True
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        if cache:
+            cache.close()
+        try:
+            out.close()
+        except BrokenPipeError:
+            pass
+
+    elapsed = time.perf_counter() - start
+    results = [result for _, result, _ in results]
+    selected = sum(1 for r in results if r['selected'])
+    failed = sum(1 for r in results if 'error' in r)
+    total = max(len(raw_files), len(results))
+    print(f"{'Interrupted' if interrupted else 'Done'}: {len(results)}/{total} photos in {elapsed:.1f}s "
+          f"({len(results) / elapsed if elapsed > 0 else 0:.1f} photos/sec, {cached_count} from cache)", file=sys.stderr)
+    print(f"  Selected: {selected}", file=sys.stderr)
+    duplicate_count = sum(1 for r in results if r.get('duplicate_of'))
+    # Photos rejected from their preview are counted per early-reject reason below,
+    # the checks of the full analysis only over the fully analyzed photos
+    analyzed = [r for r in results if 'error' not in r and not r.get('duplicate_of') and not r.get('early_reject')]
+    early_count = sum(1 for r in results if r.get('early_reject'))
+    print(f"  Rejected: {len(results) - selected - failed - duplicate_count} "
+          f"(blurry {sum(1 for r in analyzed if not r['is_sharp'])}, "
+          f"no faces {sum(1 for r in analyzed if args.require_faces and r['face_count'] == 0)}, "
+          f"burned out {sum(1 for r in analyzed if r['is_burned_out'])}, "
+          f"too dark {sum(1 for r in analyzed if r['is_too_dark'])}"
+          + (f", from the preview {early_count}" if early_count else "") + ")", file=sys.stderr)
+    if args.burst_keep:
+        print(f"  Dropped as burst duplicates: {sum(1 for r in results if r.get('is_burst_duplicate'))} "
+              f"(best {args.burst_keep} kept per burst)", file=sys.stderr)
+    if duplicate_count:
+        print(f"  Duplicates skipped: {duplicate_count}", file=sys.stderr)
+    early_counts, saved = summarize_early_rejects(results)
+    if early_counts:
+        print(f"  Rejected early from the preview: "
+              + ", ".join(f"{label} {early_counts[reason]}" for reason, label in EARLY_REJECT_REASONS.items()
+                          if reason in early_counts)
+              + (f" (saved ~{saved:.1f}s of analysis)" if saved is not None and saved > 0 else ""), file=sys.stderr)
+    if failed:
+        print(f"  Failed: {failed}", file=sys.stderr)
+    if awaiting_tilt:
+        print(f"  Not written (interrupted before their tilt was measured): {len(awaiting_tilt)} selected",
+              file=sys.stderr)
+    if args.write_xmp:
+        print(f"  XMP sidecars written: {xmp_count}", file=sys.stderr)
+    if args.detect_tilt:
+        skipped = sum(1 for r in results if r['selected'] and tilt_skipped(r))
+        if skipped:
+            print(f"  Tilt not applied (confidence below {TILT_MIN_CONFIDENCE:.0%}): {skipped}", file=sys.stderr)
+    if args.auto_exposure:
+        corrected = [r['exposure_offset'] for r in results if r.get('exposure_offset')]
+        print(f"  Exposure corrected: {len(corrected)}"
+              + (f" ({min(corrected):+.2f} to {max(corrected):+.2f} EV)" if corrected else ""), file=sys.stderr)
+    estimate, worker_peak, prefetch_peak = summarize_memory(results)
+    if worker_peak:
+        print(f"  Peak memory: worker {worker_peak:.0f} MB, main process {peak_rss_mb():.0f} MB"
+              + (f", largest photo ~{estimate:.0f} MB estimated" if estimate else "")
+              + (f" (budget {args.memory_mb} MB)" if args.memory_mb else ""), file=sys.stderr)
+    if prefetch_peak:
+        print(f"  Read-ahead peak: {prefetch_peak:.0f} of {args.prefetch_mb} MB", file=sys.stderr)
+    return 130 if interrupted else 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'analyze':
+        # Headless command-line analyzer: photo_selector.py analyze <folder> [options]
+        if not HAS_RAWPY:
+            print("Error: rawpy library not found! Install it with: pip install rawpy numpy scipy Pillow",
+                  file=sys.stderr)
+            return 1
+        return run_cli_analysis(build_cli_parser().parse_args(argv[1:]))
+
     if not HAS_RAWPY:
         print("\nWARNING: rawpy library not found!")
         print("Install it with: pip install rawpy numpy scipy Pillow")
         print("The app will run with limited functionality.\n")
-    
+    if tk is None:
+        print("Error: tkinter is not available - use `photo_selector.py analyze <folder>` for headless analysis")
+        return 1
+
     root = tk.Tk()
     app = PhotoSelectorApp(root)
     root.mainloop()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    # Required for the analysis process pool in PyInstaller bundles
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The app is a single module at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def raw_files(tmp_path):
+    """Write fake RAW files of the given sizes (zero bytes) into tmp_path, returning their paths
+
+    They're named DSC00000.ARW, DSC00001.ARW, ... unless names are given; files
+    that already exist are left as they are.
+    """
+    def write(sizes, names=None):
+        names = names or [f"DSC{i:05d}.ARW" for i in range(len(sizes))]
+        paths = []
+        for name, size in zip(names, sizes):
+            path = tmp_path / name
+            if not path.exists():
+                path.write_bytes(bytes(size))
+            paths.append(path)
+        return paths
+    return write
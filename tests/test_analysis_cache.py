@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+import photo_selector
+from photo_selector import AnalysisCache
+
+ANALYZE_KWARGS = {'sharpness_threshold': 100, 'min_brightness': 30, 'max_brightness': 220, 'require_faces': False,
+                  'analysis_mode': 'half', 'sharpness_metric': 'sobel', 'early_reject': True}
+METRICS = {'sharpness': 250.0, 'width': 6000, 'height': 4000, 'face_count': 1, 'brightness': 128.0,
+           'capture_time': 1700000000.0, 'phash': '00ff00ff00ff00ff', 'early_reject': None}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = AnalysisCache(tmp_path / photo_selector.ANALYSIS_CACHE_FILENAME)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / "DSC00001.ARW"
+    path.write_bytes(b"raw data")
+    return path
+
+
+def test_unchanged_file_hits(cache, photo):
+    settings = AnalysisCache.settings_key(ANALYZE_KWARGS)
+    cache.put(photo, settings, dict(METRICS, selected=True, timings={'decode': 1.0}))
+    assert cache.get(photo, settings) == METRICS  # Only METRIC_KEYS are stored
+
+
+def test_entries_survive_reopening(tmp_path, photo):
+    settings = AnalysisCache.settings_key(ANALYZE_KWARGS)
+    cache = AnalysisCache.for_folder(tmp_path)
+    cache.put(photo, settings, METRICS)
+    cache.close()
+    cache = AnalysisCache.for_folder(tmp_path)
+    assert cache.get(photo, settings) == METRICS
+    cache.close()
+
+
+def test_modified_file_misses(cache, photo):
+    settings = AnalysisCache.settings_key(ANALYZE_KWARGS)
+    cache.put(photo, settings, METRICS)
+    stat = os.stat(photo)
+    os.utime(photo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.get(photo, settings) is None
+
+    cache.put(photo, settings, METRICS)
+    photo.write_bytes(b"longer raw data")
+    os.utime(photo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))  # Same mtime, new size
+    assert cache.get(photo, settings) is None
+
+
+@pytest.mark.parametrize("key, value", [('analysis_mode', 'full'), ('sharpness_metric', 'laplacian'),
+                                        ('face_detector', 'lbp'), ('early_reject', False)])
+def test_changed_metric_settings_miss(cache, photo, key, value):
+    cache.put(photo, AnalysisCache.settings_key(ANALYZE_KWARGS), METRICS)
+    assert cache.get(photo, AnalysisCache.settings_key(dict(ANALYZE_KWARGS, **{key: value}))) is None
+
+
+def test_thresholds_are_not_part_of_the_key(cache, photo):
+    cache.put(photo, AnalysisCache.settings_key(ANALYZE_KWARGS), METRICS)
+    looser = dict(ANALYZE_KWARGS, sharpness_threshold=10, min_brightness=0, require_faces=True)
+    assert cache.get(photo, AnalysisCache.settings_key(looser)) == METRICS
+
+
+def test_analyzer_version_bump_misses(cache, photo, monkeypatch):
+    settings = AnalysisCache.settings_key(ANALYZE_KWARGS)
+    cache.put(photo, settings, METRICS)
+    monkeypatch.setattr(photo_selector, 'ANALYZER_VERSION', photo_selector.ANALYZER_VERSION + 1)
+    assert cache.get(photo, settings) is None
+
+
+def test_failed_analysis_is_not_stored(cache, photo):
+    settings = AnalysisCache.settings_key(ANALYZE_KWARGS)
+    cache.put(photo, settings, dict(METRICS, error="LibRaw error"))
+    assert cache.get(photo, settings) is None
+
+
+def test_fingerprints_and_tilts_are_keyed_on_the_file(cache, photo):
+    cache.put_fingerprint(photo, 1700000000.0, '00ff00ff00ff00ff')
+    cache.put_tilt(photo, 1.5, 0.8)
+    assert cache.get_fingerprint(photo) == (1700000000.0, '00ff00ff00ff00ff')
+    assert cache.get_tilt(photo) == (1.5, 0.8)
+    photo.write_bytes(b"edited raw data")
+    assert cache.get_fingerprint(photo) is None
+    assert cache.get_tilt(photo) is None
+
+
+def cached_run(monkeypatch, paths, cache, **kwargs):
+    """Run iter_cached_analysis with a stub analysis; returns (analyzed paths, results)"""
+    analyzed = []
+
+    def analyze(file_paths, analyze_kwargs, **_):
+        for index, file_path in enumerate(file_paths):
+            analyzed.append(file_path)
+            yield index, dict(METRICS, path=file_path, filename=os.path.basename(file_path))
+
+    monkeypatch.setattr(photo_selector, 'iter_parallel_analysis', analyze)
+    results = list(photo_selector.iter_cached_analysis(paths, dict(ANALYZE_KWARGS, **kwargs), cache=cache))
+    return analyzed, {index: (result, from_cache) for index, result, from_cache in results}
+
+
+def test_second_run_reuses_the_cache(monkeypatch, cache, raw_files):
+    paths = [str(path) for path in raw_files([0] * 3)]
+    analyzed, _ = cached_run(monkeypatch, paths, cache)
+    assert analyzed == paths
+    analyzed, results = cached_run(monkeypatch, paths, cache)
+    assert analyzed == []
+    assert all(from_cache and result['selected'] for result, from_cache in results.values())
+
+
+def test_early_rejects_are_reanalyzed_once_the_thresholds_no_longer_reject_them(monkeypatch, cache, photo):
+    settings = AnalysisCache.settings_key(ANALYZE_KWARGS)
+    # Preview sharpness 10 is clearly blurry at a threshold of 100, but not at 30
+    cache.put(photo, settings, dict(METRICS, sharpness=10.0, early_reject='blurry'))
+
+    analyzed, results = cached_run(monkeypatch, [str(photo)], cache)
+    assert analyzed == []
+    assert results[0][1] and not results[0][0]['selected']
+
+    analyzed, results = cached_run(monkeypatch, [str(photo)], cache, sharpness_threshold=30)
+    assert analyzed == [str(photo)]
+    assert cache.get(photo, settings)['early_reject'] is None  # Replaced by the full analysis
@@ -0,0 +1,83 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import photo_selector
+from photo_selector import build_metrics_table, find_similar_pairs, group_bursts, parse_phashes, select_photos
+
+
+def flipped(phash, bits):
+    """phash with the given bit positions inverted"""
+    for bit in bits:
+        phash ^= 1 << bit
+    return phash
+
+
+def bursts(capture_times, phashes):
+    hashes, has_hash = parse_phashes([f"{h:016x}" if h is not None else None for h in phashes])
+    times = np.array([np.nan if t is None else t for t in capture_times], dtype=np.float64)
+    return group_bursts(times, hashes, has_hash).tolist()
+
+
+def test_similar_frames_close_in_time_form_a_burst():
+    scene, other = 0x0123456789ABCDEF, 0xFEDCBA9876543210
+    labels = bursts([0.0, 0.5, 1.2, 1.5, 30.0],
+                    [scene, flipped(scene, range(10)), flipped(scene, range(12)), other,
+                     flipped(scene, range(40, 48))])
+    # Frame 3 is a different scene; frame 4 is too late for a burst and too different for a duplicate
+    assert labels == [0, 0, 0, 3, 4]
+
+
+def test_burst_chains_across_the_time_gap():
+    scene = 0x0123456789ABCDEF
+    # Each frame is within 2 s of the previous one, not of the first
+    assert bursts([0.0, 1.5, 3.0, 4.5], [scene] * 4) == [0, 0, 0, 0]
+
+
+def test_near_duplicates_group_whatever_their_time():
+    scene = 0x0123456789ABCDEF
+    labels = bursts([0.0, 500.0, None, 900.0],
+                    [scene, flipped(scene, range(4)), flipped(scene, [60]), flipped(scene, range(50, 55))])
+    assert labels == [0, 0, 0, 3]
+
+
+def test_frames_without_hash_stay_alone():
+    scene = 0x0123456789ABCDEF
+    assert bursts([0.0, 0.1, 0.2], [scene, None, scene]) == [0, 1, 0]
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 4, 12])
+def test_multi_index_pairs_match_brute_force(max_distance):
+    rng = np.random.default_rng(max_distance)
+    bases = rng.integers(0, 2**63, size=8, dtype=np.uint64)
+    hashes = []
+    for base in bases:
+        for _ in range(12):
+            hashes.append(flipped(int(base), rng.choice(64, size=int(rng.integers(0, 16)), replace=False).tolist()))
+    hashes = np.array(hashes, dtype=np.uint64)
+    expected = {(i, j) for i, j in itertools.combinations(range(len(hashes)), 2)
+                if bin(int(hashes[i]) ^ int(hashes[j])).count("1") <= max_distance}
+    assert find_similar_pairs(hashes, max_distance) == expected
+
+
+def test_popcount_fallback_matches(monkeypatch):
+    values = np.array([0, 1, 2**64 - 1, 0x0123456789ABCDEF], dtype=np.uint64)
+    monkeypatch.delattr(np, 'bitwise_count', raising=False)
+    assert photo_selector._popcount64(values).tolist() == [0, 1, 64, 32]
+
+
+def test_burst_keep_prefers_faces_then_sharpness():
+    scene = 0x0123456789ABCDEF
+    photos = [{'sharpness': sharpness, 'brightness': 128.0, 'face_count': faces, 'width': 6000, 'height': 4000,
+               'capture_time': float(i) * 0.5, 'phash': f"{scene:016x}"}
+              for i, (sharpness, faces) in enumerate([(300, 0), (200, 1), (250, 1), (50, 1)])]
+    table = build_metrics_table(photos)
+    assert table['burst_size'].tolist() == [4] * 4
+
+    keep_one = select_photos(table, require_faces=False, burst_keep=1)
+    assert keep_one['selected'].tolist() == [False, False, True, False]
+    assert keep_one['is_burst_duplicate'].tolist() == [True, True, False, False]  # Frame 3 isn't sharp anyway
+
+    keep_two = select_photos(table, require_faces=False, burst_keep=2)
+    assert keep_two['selected'].tolist() == [False, True, True, False]
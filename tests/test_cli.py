@@ -0,0 +1,93 @@
+import csv
+import json
+import os
+
+import pytest
+
+import photo_selector
+
+THRESHOLDS = {'sharpness_threshold': 20, 'min_brightness': 30, 'max_brightness': 220, 'require_faces': True}
+# filename -> metrics of the stub analysis
+METRICS = {
+    'DSC00001.ARW': {'sharpness': 80.0, 'brightness': 120.0, 'face_count': 2},                      # Selected
+    'DSC00002.ARW': {'sharpness': 5.0, 'brightness': 120.0, 'face_count': 1},                       # Blurry
+    'DSC00003.ARW': {'sharpness': 80.0, 'brightness': 120.0, 'face_count': 0},                      # No faces
+    'DSC00004.ARW': {'sharpness': 80.0, 'brightness': 240.0, 'face_count': 1},                      # Burned out
+    'DSC00005.ARW': {'sharpness': 1.0, 'brightness': 2.0, 'face_count': 0, 'early_reject': 'too_dark'},
+}
+
+
+@pytest.fixture
+def folder(tmp_path, raw_files, monkeypatch):
+    """Folder of (empty) RAW files analyzed by a stub instead of LibRaw"""
+    raw_files([0] * len(METRICS), list(METRICS))
+
+    def analyze(file_paths, analyze_kwargs, **kwargs):
+        for index, file_path in enumerate(file_paths):
+            name = os.path.basename(file_path)
+            result = dict(METRICS[name], width=6000, height=4000, early_reject=METRICS[name].get('early_reject'))
+            result.update(photo_selector.evaluate_selection(result, **THRESHOLDS))
+            result.update(path=str(file_path), filename=name)
+            yield index, result, False
+
+    monkeypatch.setattr(photo_selector, 'iter_cached_analysis', analyze)
+    return tmp_path
+
+
+def analyze(folder, *options):
+    return photo_selector.main(['analyze', str(folder), '--no-cache', '--keep-duplicates', '--no-straighten',
+                                '--workers', '1', *options])
+
+
+def test_jsonl_rows_have_every_column(folder, capfd):
+    assert analyze(folder, '--ordered') == 0
+    out, err = capfd.readouterr()
+    rows = [json.loads(line) for line in out.splitlines()]
+    assert [row['filename'] for row in rows] == sorted(METRICS)
+    assert all(tuple(row) == photo_selector.CLI_RESULT_FIELDS for row in rows)
+    assert [row['selected'] for row in rows] == [True, False, False, False, False]
+    assert rows[4]['early_reject'] == 'too_dark'
+    assert not any(row['cached'] or row['xmp'] for row in rows)
+    assert "Selected: 1" in err
+
+
+def test_csv_output_file(folder, tmp_path, capfd):
+    output = tmp_path / "results.csv"
+    assert analyze(folder, '--format', 'csv', '--output', str(output)) == 0
+    assert capfd.readouterr().out == ""
+    with open(output, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+    assert tuple(reader.fieldnames) == photo_selector.CLI_RESULT_FIELDS
+    assert sorted(row['filename'] for row in rows) == sorted(METRICS)
+
+
+def test_summary_counts_match_the_row_flags(folder, capfd):
+    assert analyze(folder) == 0
+    err = capfd.readouterr().err
+    # The preview reject is also not sharp, but only counted as rejected from the preview
+    assert "Rejected: 4 (blurry 1, no faces 1, burned out 1, too dark 0, from the preview 1)" in err
+    assert "Rejected early from the preview: too dark 1" in err
+
+
+def test_stdout_is_restored_after_the_run(folder, capfd):
+    assert analyze(folder) == 0
+    capfd.readouterr()
+    os.write(1, b"after\n")
+    print("printed")
+    out, err = capfd.readouterr()
+    assert out == "after\nprinted\n" and err == ""
+
+
+@pytest.mark.parametrize("options, message", [
+    (['--output', '/nonexistent/results.jsonl'], "could not open /nonexistent/results.jsonl"),
+    (['--preset-dark', '/nonexistent/preset.xmp'], "could not read preset"),
+])
+def test_errors_exit_with_1(folder, capfd, options, message):
+    assert analyze(folder, *options) == 1
+    assert message in capfd.readouterr().err
+
+
+def test_missing_folder_exits_with_1(tmp_path, capfd):
+    assert analyze(tmp_path / "missing") == 1
+    assert "is not a folder" in capfd.readouterr().err
@@ -0,0 +1,38 @@
+from photo_selector import find_duplicates
+
+SCENE = 0x0123456789ABCDEF
+
+
+def test_copies_of_the_same_moment_are_duplicates(raw_files):
+    paths = raw_files([10, 10, 10, 10])
+    fingerprints = [(100.25, f"{SCENE:016x}"), (100.25, f"{SCENE ^ 0b111:016x}"),
+                    (100.5, f"{SCENE:016x}"),  # Burst frame, not a copy
+                    (100.25, f"{SCENE ^ 0xFFFF:016x}")]  # Same moment, different picture
+    assert find_duplicates(paths, fingerprints) == {1: 0}
+
+
+def test_burst_frames_in_the_same_second_are_not_duplicates(raw_files):
+    # Whole-second capture times can't tell burst frames apart: near-identical
+    # previews of differently sized files are two shots
+    paths = raw_files([10, 12, 10])
+    fingerprints = [(100.0, f"{SCENE:016x}"), (100.0, f"{SCENE ^ 0b111:016x}"),
+                    (100.0, f"{SCENE:016x}")]  # Identical preview and size - a copy
+    assert find_duplicates(paths, fingerprints) == {2: 0}
+
+
+def test_without_capture_time_only_identical_hash_and_size_count(raw_files):
+    paths = raw_files([10, 10, 12, 10])
+    fingerprints = [(None, f"{SCENE:016x}"), (None, f"{SCENE:016x}"), (None, f"{SCENE:016x}"),
+                    (None, f"{SCENE ^ 1:016x}")]
+    assert find_duplicates(paths, fingerprints) == {1: 0}
+
+
+def test_photos_without_fingerprint_are_kept(raw_files):
+    paths = raw_files([10, 10, 10])
+    assert find_duplicates(paths, [None, (None, None), (100.0, f"{SCENE:016x}")]) == {}
+
+
+def test_duplicates_point_at_the_first_copy(raw_files):
+    paths = raw_files([10, 10, 10])
+    fingerprints = [(100.0, f"{SCENE:016x}")] * 3
+    assert find_duplicates(paths, fingerprints) == {1: 0, 2: 0}
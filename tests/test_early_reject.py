@@ -0,0 +1,61 @@
+import pytest
+
+import photo_selector
+from photo_selector import early_reject_reason
+
+THRESHOLDS = {'sharpness_threshold': 100, 'min_brightness': 30, 'max_brightness': 220}
+MARGIN = photo_selector.EARLY_REJECT_BRIGHTNESS_MARGIN
+
+
+def test_every_sharpness_metric_has_a_ratio():
+    assert set(photo_selector.EARLY_REJECT_SHARPNESS_RATIOS) == set(photo_selector.SHARPNESS_METRICS)
+
+
+@pytest.mark.parametrize("brightness, reason", [
+    (30 - MARGIN - 1, 'too_dark'),
+    (30 - MARGIN, None),
+    (220 + MARGIN, None),
+    (220 + MARGIN + 1, 'burned_out'),
+])
+def test_brightness_needs_a_clear_margin(brightness, reason):
+    assert early_reject_reason(brightness, 1000, **THRESHOLDS) == reason
+
+
+@pytest.mark.parametrize("metric", list(photo_selector.SHARPNESS_METRICS))
+def test_blurry_below_the_metric_ratio(metric):
+    limit = THRESHOLDS['sharpness_threshold'] * photo_selector.EARLY_REJECT_SHARPNESS_RATIOS[metric]
+    assert early_reject_reason(128, limit * 0.99, sharpness_metric=metric, **THRESHOLDS) == 'blurry'
+    assert early_reject_reason(128, limit, sharpness_metric=metric, **THRESHOLDS) is None
+
+
+def test_laplacian_margin_is_squared():
+    # A fifth of the threshold is clearly blurry for a gradient metric, but for the
+    # Laplacian variance it corresponds to gradients at ~45% (sqrt 0.2) of the threshold
+    assert early_reject_reason(128, 20, sharpness_metric='sobel', **THRESHOLDS) == 'blurry'
+    assert early_reject_reason(128, 20, sharpness_metric='laplacian', **THRESHOLDS) is None
+
+
+def test_brightness_is_checked_before_sharpness():
+    assert early_reject_reason(0, 0, **THRESHOLDS) == 'too_dark'
+    assert early_reject_reason(255, 0, **THRESHOLDS) == 'burned_out'
+
+
+@pytest.mark.parametrize("metric", list(photo_selector.SHARPNESS_METRICS))
+def test_reselection_flags_early_rejects_the_new_thresholds_would_not_reject(metric):
+    # Preview brightness / coarse sharpness of photos rejected early at THRESHOLDS
+    previews = [(5, 1000), (250, 1000), (128, 1), (128, 60), (0, 0)]
+    photos = [{'brightness': brightness, 'sharpness': sharpness, 'width': 3, 'height': 2,
+               'early_reject': early_reject_reason(brightness, sharpness, sharpness_metric=metric, **THRESHOLDS)}
+              for brightness, sharpness in previews]
+    table = photo_selector.build_metrics_table([p for p in photos if p['early_reject']])
+    looser = {'sharpness_threshold': 10, 'min_brightness': 0, 'max_brightness': 255}
+
+    selection = photo_selector.select_photos(table, require_faces=False, sharpness_metric=metric, **THRESHOLDS)
+    assert not selection['needs_analysis'].any()
+
+    selection = photo_selector.select_photos(table, require_faces=False, sharpness_metric=metric, **looser)
+    expected = [early_reject_reason(p['brightness'], p['sharpness'], sharpness_metric=metric, **looser) is None
+                for p in photos if p['early_reject']]
+    assert selection['needs_analysis'].tolist() == expected
+    assert any(expected)
+    assert not selection['selected'].any()  # Only the preview was analyzed
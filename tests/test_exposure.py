@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import photo_selector
+from photo_selector import exposure_offset, luminance_stats, render_xmp_sidecar
+
+GAMMA = photo_selector.ANALYSIS_GAMMA
+TARGET = photo_selector.AUTO_EXPOSURE_TARGET
+
+
+def plane(levels):
+    """8-bit plane with the given {level: pixel count} histogram"""
+    return np.concatenate([np.full(count, level, dtype=np.uint8) for level, count in levels.items()]).reshape(1, -1)
+
+
+def offset_of(levels):
+    _, median, highlight = luminance_stats(plane(levels))
+    return exposure_offset({'luminance_median': median, 'luminance_p99': highlight})
+
+
+def test_stats_from_a_known_histogram():
+    mean, median, highlight = luminance_stats(plane({40: 300, 100: 400, 200: 299, 250: 1}))
+    assert mean == pytest.approx((40 * 300 + 100 * 400 + 200 * 299 + 250) / 1000)
+    assert median == 100
+    assert highlight == 200  # 99% of the pixels are at or below 200
+
+
+@pytest.mark.parametrize("levels, expected", [
+    ({TARGET: 1000}, 0.0),                                            # Already at the target
+    ({100: 990, 150: 10}, GAMMA * np.log2(TARGET / 100)),             # Brightened to the target
+    ({200: 1000}, -photo_selector.AUTO_EXPOSURE_MAX_EV),              # Darkening clamped
+    ({40: 1000}, photo_selector.AUTO_EXPOSURE_MAX_EV),                # Brightening clamped
+    ({80: 900, 200: 100}, GAMMA * np.log2(255 / 200)),                # Stops before the highlights clip
+    ({80: 900, 250: 100}, 0.0),                                       # Highlight limit below the minimum step
+    ({TARGET - 2: 1000}, 0.0),                                        # Below AUTO_EXPOSURE_MIN_EV
+])
+def test_offset_moves_the_median_to_the_target(levels, expected):
+    assert offset_of(levels) == pytest.approx(round(expected, 2))
+
+
+def test_no_statistics_no_offset():
+    assert exposure_offset({'brightness': 20.0}) == 0.0
+
+
+def preset_with_exposure(value):
+    return photo_selector.XMP_PRESET.replace('crs:Exposure2012="-0.40"', f'crs:Exposure2012="{value}"')
+
+
+@pytest.mark.parametrize("base, median, expected", [
+    ("-0.40", 59, "+1.10"),   # Preset exposure plus the +1.5 EV offset
+    ("+4.50", 59, "+5.00"),   # Clamped to Camera Raw's +5
+    ("-4.80", 255, "-5.00"),  # Clamped to Camera Raw's -5
+])
+def test_offset_is_added_to_the_preset_exposure(tmp_path, base, median, expected):
+    photo = {'path': str(tmp_path / "DSC00001.ARW"), 'brightness': 128.0,
+             'luminance_median': median, 'luminance_p99': median}
+    preset = preset_with_exposure(base)
+    xmp, _ = render_xmp_sidecar(photo, 100, dark_xmp=preset, light_xmp=preset, auto_exposure=True)
+    assert f'crs:Exposure2012="{expected}"' in xmp
+    xmp, _ = render_xmp_sidecar(photo, 100, dark_xmp=preset, light_xmp=preset)
+    assert f'crs:Exposure2012="{base}"' in xmp  # Only with auto exposure
@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+import pytest
+
+import photo_selector
+
+pytestmark = pytest.mark.skipif(not photo_selector.HAS_CV2, reason="needs OpenCV")
+
+
+@pytest.fixture
+def recorded_detectors(monkeypatch):
+    """Haar backend that records its input, and a capped backend whose model is missing"""
+    calls = []
+
+    def haar(image, min_face_size):
+        calls.append((image.shape[:2], min_face_size))
+        return [(10, 10, 20, 20)]
+
+    monkeypatch.setitem(photo_selector.FACE_DETECTORS, 'haar', ("Haar", haar, 0, False))
+    monkeypatch.setitem(photo_selector.FACE_DETECTORS, 'missing', ("Missing", lambda image, size: None, 300, True))
+    return calls
+
+
+@pytest.mark.parametrize("max_long_edge, shape, min_size, box", [
+    (1000, (667, 1000), 20, (30, 30, 60, 60)),
+    (0, (2000, 3000), 60, (10, 10, 20, 20)),
+])
+def test_fallback_to_haar_keeps_the_callers_downscale(recorded_detectors, max_long_edge, shape, min_size, box):
+    image = np.zeros((2000, 3000), dtype=np.uint8)
+    faces = photo_selector.detect_faces(image, 60, max_long_edge=max_long_edge, detector='missing')
+    assert recorded_detectors == [(shape, min_size)]
+    assert faces == [box]  # In the coordinates of the image passed in
+
+
+def test_models_load_once_per_thread(monkeypatch):
+    monkeypatch.setattr(photo_selector, '_classifier_registry', threading.local())
+    loaded = []
+
+    def load():
+        loaded.append(threading.get_ident())
+        return object()
+
+    def lookups():
+        return {id(photo_selector._load_once('model', load)) for _ in range(50)}
+
+    before = photo_selector.classifier_loads()
+    assert len(lookups()) == 1
+    thread = threading.Thread(target=lookups)
+    thread.start()
+    thread.join()
+    assert len(loaded) == 2 and loaded[0] != loaded[1]
+    assert photo_selector.classifier_loads() - before == 2
+
+
+def test_lbp_cascade_ships_in_models():
+    assert photo_selector.model_path(photo_selector.LBP_CASCADE_FILE).parent == photo_selector.get_models_dir()
+    assert photo_selector.face_detector_problem('lbp') is None
+    assert photo_selector._load_cascade(photo_selector.LBP_CASCADE_FILE) is not None
+
+
+def test_missing_model_is_reported_by_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(photo_selector, 'get_models_dir', lambda: tmp_path)
+    for detector, filename in [('lbp', photo_selector.LBP_CASCADE_FILE), ('yunet', photo_selector.YUNET_MODEL_FILE)]:
+        problem = photo_selector.face_detector_problem(detector)
+        if detector == 'yunet' and not hasattr(photo_selector.cv2, 'FaceDetectorYN'):
+            assert "OpenCV 4.5.4" in problem
+        else:
+            assert str(tmp_path / filename) in problem
+        assert not photo_selector.face_detector_available(detector)
+    assert photo_selector.face_detector_problem('haar') is None  # From cv2.data, not models/
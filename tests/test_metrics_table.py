@@ -0,0 +1,51 @@
+import numpy as np
+
+from photo_selector import append_metrics_row, build_metrics_table, select_photos
+
+
+def shoot(count, seed):
+    """Photos in bursts of similar frames, some near-duplicates and a few without time or hash"""
+    rng = np.random.default_rng(seed)
+    base = int(rng.integers(0, 2**63))
+    photos = []
+    time = 0.0
+    for i in range(count):
+        if rng.random() < 0.3:
+            base = int(rng.integers(0, 2**63))  # New scene
+            time += 10.0
+        time += float(rng.choice([0.2, 0.5, 3.0]))
+        flips = rng.choice(64, size=int(rng.integers(0, 14)), replace=False)
+        phash = base ^ int(np.bitwise_or.reduce(np.uint64(1) << flips.astype(np.uint64), initial=np.uint64(0)))
+        photos.append({
+            'filename': f"DSC{i:05d}.ARW",
+            'sharpness': float(rng.uniform(50, 300)),
+            'brightness': float(rng.uniform(20, 240)),
+            'face_count': int(rng.integers(0, 3)),
+            'width': 6000, 'height': 4000,
+            'capture_time': None if rng.random() < 0.1 else time,
+            'phash': None if rng.random() < 0.05 else f"{phash:016x}",
+        })
+    return photos
+
+
+def test_appending_rows_matches_a_rebuilt_table():
+    for seed in range(5):
+        photos = shoot(60, seed)
+        table = build_metrics_table(photos[:1])
+        for count in range(2, len(photos) + 1):
+            table = append_metrics_row(table, photos[count - 1])
+            rebuilt = build_metrics_table(photos[:count])
+            for key in rebuilt:
+                np.testing.assert_array_equal(table[key], rebuilt[key], err_msg=f"{key} after {count} photos")
+
+
+def test_appended_table_selects_like_a_rebuilt_one():
+    photos = shoot(40, 7)
+    table = build_metrics_table(photos[:10])
+    for photo in photos[10:]:
+        table = append_metrics_row(table, photo)
+    for burst_keep in (0, 1, 2):
+        appended = select_photos(table, burst_keep=burst_keep)
+        rebuilt = select_photos(build_metrics_table(photos), burst_keep=burst_keep)
+        for key in rebuilt:
+            np.testing.assert_array_equal(appended[key], rebuilt[key])
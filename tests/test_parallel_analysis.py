@@ -0,0 +1,159 @@
+import os
+import time
+
+import photo_selector
+from photo_selector import PrefetchReader, iter_parallel_analysis
+
+
+def test_prefetch_frees_the_budget_when_a_file_is_handed_out(raw_files):
+    # Six 300 KB files under a 1 MB budget: only three fit at once, but files
+    # taken from the reader (and being analyzed) no longer count against it
+    paths = raw_files([300 * 1024] * 6)
+    reader = PrefetchReader(paths, max_files=8, max_bytes=1024 * 1024)
+    try:
+        items = [reader.next(timeout=5) for _ in paths]
+    finally:
+        reader.close()
+    assert [index for index, _, _, _ in items] == list(range(6))
+    assert all(len(data) == 300 * 1024 for _, _, data, _ in items)
+    assert reader.peak_bytes <= 1024 * 1024
+
+
+def test_prefetch_disabled_yields_paths_only(raw_files):
+    paths = raw_files([10] * 3)
+    reader = PrefetchReader(paths, max_files=0)
+    assert [(index, data) for index, _, data, _ in reader] == [(0, None), (1, None), (2, None)]
+
+
+def timed_worker(file_path, analyze_kwargs, data=None):
+    """Stub analysis: sleeps for the file's delay and records when it ran"""
+    start = time.time()
+    time.sleep(analyze_kwargs['delays'].get(os.path.basename(file_path), analyze_kwargs.get('delay', 0.0)))
+    if os.path.basename(file_path) in analyze_kwargs.get('fail', ()):
+        raise ValueError("corrupt file")
+    if os.path.basename(file_path) in analyze_kwargs.get('crash', ()):
+        os._exit(1)  # Like a LibRaw segfault - takes the worker process down
+    return {'path': file_path, 'filename': os.path.basename(file_path), 'start': start, 'end': time.time(),
+            'prefetched': data is not None}
+
+
+def max_concurrent(results):
+    """Largest number of stub analyses that ran at the same time"""
+    return max(sum(1 for other in results if other['start'] <= result['start'] < other['end'])
+               for result in results)
+
+
+def run(paths, workers=2, **kwargs):
+    analyze_kwargs = {'delays': kwargs.pop('delays', {}), 'delay': kwargs.pop('delay', 0.0),
+                      'fail': kwargs.pop('fail', ()), 'crash': kwargs.pop('crash', ())}
+    kwargs.setdefault('prefetch_files', 0)
+    return list(iter_parallel_analysis(paths, analyze_kwargs, workers=workers, worker=timed_worker, **kwargs))
+
+
+def test_ordered_results_follow_the_input(raw_files):
+    paths = raw_files([10] * 4)
+    delays = {path.name: 0.6 - 0.15 * i for i, path in enumerate(paths)}  # Later files finish first
+    results = run(paths, workers=4, delays=delays, ordered=True)
+    assert [index for index, _ in results] == [0, 1, 2, 3]
+    assert [result['path'] for _, result in results] == [str(path) for path in paths]
+
+
+def test_unordered_results_arrive_as_they_complete(raw_files):
+    paths = raw_files([10] * 4)
+    delays = {path.name: 0.6 - 0.15 * i for i, path in enumerate(paths)}
+    results = run(paths, workers=4, delays=delays)
+    assert sorted(index for index, _ in results) == [0, 1, 2, 3]
+    assert results[0][0] != 0
+    assert all(result['path'] == str(paths[index]) for index, result in results)
+
+
+def test_cancel_stops_submitting(raw_files):
+    paths = raw_files([10] * 20)
+    seen = []
+    for index, _ in iter_parallel_analysis(paths, {'delays': {}, 'delay': 0.2}, workers=2, worker=timed_worker,
+                                           prefetch_files=0, should_cancel=lambda: bool(seen)):
+        seen.append(index)
+    assert len(seen) <= 2 * 2  # At most what was in flight when cancelled
+
+
+def test_failing_file_is_reported_and_the_rest_analyzed(raw_files):
+    paths = raw_files([10] * 6)
+    results = dict(run(paths, fail={paths[2].name}))
+    assert sorted(results) == list(range(6))
+    assert "corrupt file" in results[2]['error'] and not results[2]['selected']
+    assert not any(result.get('error') for index, result in results.items() if index != 2)
+
+
+def test_crashed_worker_only_fails_its_own_file(raw_files):
+    # The crash breaks the pool and every file in flight; they're retried one by one
+    paths = raw_files([10] * 8)
+    results = dict(run(paths, workers=3, delay=0.2, crash={paths[1].name}))
+    assert sorted(results) == list(range(8))
+    assert results[1]['error']
+    assert not any(result.get('error') for index, result in results.items() if index != 1)
+
+
+def test_read_ahead_budget_does_not_limit_the_workers(raw_files):
+    # Only three 300 KB files fit in a 1 MB read-ahead budget, but all six workers stay busy
+    paths = raw_files([300 * 1024] * 12)
+    results = [result for _, result in run(paths, workers=6, delay=1.0, prefetch_files=8, prefetch_mb=1)]
+    assert all(result['prefetched'] for result in results)
+    assert max_concurrent(results) == 6
+
+
+def test_memory_budget_limits_files_in_flight(raw_files, monkeypatch):
+    monkeypatch.setattr(photo_selector, 'WORKER_BASE_MEMORY_MB', 0)
+    paths = raw_files([10] * 8)
+    # 4 MB per file in a 10 MB budget: two at a time although four workers are free
+    results = run(paths, workers=4, delay=0.5, memory_budget_mb=10, ordered=True,
+                  estimate_memory=lambda file_path, data: 4 * 1024 * 1024)
+    assert [index for index, _ in results] == list(range(8))
+    assert max_concurrent([result for _, result in results]) == 2
+    assert all(result['memory_estimate_mb'] == 4 for _, result in results)
+
+
+def test_file_over_the_budget_runs_alone(raw_files, monkeypatch):
+    monkeypatch.setattr(photo_selector, 'WORKER_BASE_MEMORY_MB', 0)
+    paths = raw_files([10] * 4)
+    sizes = {paths[1].name: 50, paths[2].name: 1}  # MB
+    results = dict(run(paths, workers=4, delay=0.5, memory_budget_mb=10,
+                       estimate_memory=lambda file_path, data: sizes.get(os.path.basename(file_path), 1) * 1024 * 1024))
+    assert sorted(results) == [0, 1, 2, 3]
+    big = results[1]
+    assert not any(other['start'] < big['end'] and big['start'] < other['end']
+                   for index, other in results.items() if index != 1)
+
+
+class FakeRaw:
+    """rawpy.RawPy stand-in with the header of a 24 MP sensor"""
+
+    class sizes:
+        raw_width, raw_height = 6048, 4024
+        iwidth, iheight = 6000, 4000
+
+    def open_file(self, path):
+        pass
+
+    def open_buffer(self, buffer):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_estimate_scales_with_the_decode(raw_files, monkeypatch):
+    monkeypatch.setattr(photo_selector.rawpy, 'RawPy', FakeRaw)
+    path = raw_files([1000])[0]
+    full = photo_selector.estimate_analysis_memory(path, analysis_mode='full')
+    half = photo_selector.estimate_analysis_memory(path, analysis_mode='half')
+    pixels = 6000 * 4000
+    per_pixel = photo_selector.DEMOSAIC_BYTES_PER_PIXEL + photo_selector.ANALYSIS_BYTES_PER_PIXEL
+    assert full - half == pixels * per_pixel - pixels // 4 * per_pixel
+    assert photo_selector.estimate_analysis_memory(path, analysis_mode='preview') == half
+    # A prefetched buffer is held by the caller and unpickled in the worker
+    assert photo_selector.estimate_analysis_memory(path, b"x" * 1000, 'full') == full + 1000
+
+
+def test_unreadable_header_estimates_zero(raw_files):
+    path = raw_files([10])[0]
+    assert photo_selector.estimate_analysis_memory(path) == 0
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import photo_selector
+from photo_selector import SharpnessMap, combine_sharpness, sharpness_planes
+
+METRICS = list(photo_selector.SHARPNESS_METRICS)
+
+
+def textured_frame(width=512, height=256, seed=0):
+    """Noise on the left half, a smooth gradient on the right"""
+    rng = np.random.default_rng(seed)
+    gray = np.tile(np.linspace(40, 200, width), (height, 1))
+    gray[:, :width // 2] = rng.integers(0, 256, size=(height, width // 2))
+    return gray.astype(np.uint8)
+
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_tile_aligned_region_matches_the_pixels(metric):
+    gray = textured_frame()
+    sharpness_map = SharpnessMap(gray, tiles=64, metric=metric)  # 8 px tiles
+    planes = sharpness_planes(gray, metric)
+    for x, y, w, h in [(16, 24, 64, 40), (200, 0, 120, 256), (0, 0, 512, 256)]:
+        expected = combine_sharpness(metric, np.array([plane[y:y + h, x:x + w].mean(dtype=np.float64)
+                                                       for plane in planes]))
+        assert sharpness_map.region_score(x, y, w, h) == pytest.approx(expected, rel=1e-4)
+
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_whole_frame_region_is_the_photo_score(metric):
+    sharpness_map = SharpnessMap(textured_frame(), tiles=64, metric=metric)
+    assert sharpness_map.region_score(0, 0, 512, 256) == pytest.approx(sharpness_map.score(), rel=1e-6)
+
+
+def test_partially_covered_tiles_count_by_area():
+    gray = textured_frame()
+    sharpness_map = SharpnessMap(gray, tiles=64)
+    # Each tile spread over its 8x8 pixels - a region's score is the mean over its pixels
+    pixels = np.kron(sharpness_map.tiles, np.ones((8, 8)))
+    for x, y, w, h in [(3, 5, 17, 11), (250.5, 100.25, 13.5, 7.75)]:
+        x1, y1, x2, y2 = int(x), int(y), int(np.ceil(x + w)), int(np.ceil(y + h))
+        weights = np.zeros_like(pixels)
+        weights[y1:y2, x1:x2] = 1.0
+        weights[y1, :] *= 1 - (y - y1)
+        weights[y2 - 1, :] *= 1 - (y2 - (y + h))
+        weights[:, x1] *= 1 - (x - x1)
+        weights[:, x2 - 1] *= 1 - (x2 - (x + w))
+        expected = (pixels * weights).sum() / weights.sum()
+        assert sharpness_map.region_score(x, y, w, h) == pytest.approx(expected, rel=1e-6)
+
+
+def test_regions_are_clipped_to_the_frame():
+    sharpness_map = SharpnessMap(textured_frame(), tiles=64)
+    assert sharpness_map.region_score(-50, -50, 100, 100) == pytest.approx(sharpness_map.region_score(0, 0, 50, 50))
+    assert sharpness_map.region_score(600, 0, 50, 50) == 0.0
+    assert sharpness_map.region_score(10, 10, 0, 20) == 0.0
+
+
+def test_composition_scores_find_the_sharp_area():
+    gray = np.full((300, 600), 128, dtype=np.uint8)
+    rng = np.random.default_rng(1)
+    gray[75:125, 150:250] = rng.integers(0, 256, size=(50, 100))  # Around the top-left thirds point
+    center, thirds = SharpnessMap(gray, tiles=60).composition_scores()
+    assert thirds > 10 * center
+    assert thirds > 0
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import benchmark_analysis
+import photo_selector
+
+
+@pytest.mark.parametrize("tilt", [-4.0, -1.2, 0.0, 2.5, 6.0])
+@pytest.mark.parametrize("megapixels", [2, 12])
+def test_detect_horizon_angle_recovers_tilt(tilt, megapixels):
+    angle, confidence = photo_selector.detect_horizon_angle(benchmark_analysis.tilted_frame(megapixels, tilt))
+    assert angle == pytest.approx(tilt, abs=benchmark_analysis.TILT_TOLERANCE)
+    assert confidence >= photo_selector.TILT_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_detect_horizon_angle_ignores_texture(seed):
+    # Textured frame without any horizon: no confident tilt
+    _, confidence = photo_selector.detect_horizon_angle(benchmark_analysis.synthetic_frame(6, seed))
+    assert confidence < photo_selector.TILT_MIN_CONFIDENCE
+
+
+def _kept_directions(lines):
+    """Directions (degrees) of (rho, theta) lines as estimate_tilt_angle receives them"""
+    return np.degrees(lines[:, 1].astype(np.float64)) - 90
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("count", [101, 1001])
+def test_estimate_tilt_angle_matches_legacy_loop(seed, count):
+    lines = benchmark_analysis.synthetic_hough_lines(count, 2.5, seed).astype(np.float64)
+    folded = (_kept_directions(lines) + 45) % 90 - 45
+    kept = np.flatnonzero(np.abs(folded) < photo_selector.HORIZON_MAX_TILT)
+    if len(kept) % 2 == 0:
+        # The legacy loop averages the two middle angles of an even count; the
+        # weighted median picks one of them, so compare on odd counts
+        lines = np.delete(lines, kept[0], axis=0)
+    angle, _ = photo_selector.estimate_tilt_angle(_kept_directions(lines))
+    assert angle == pytest.approx(benchmark_analysis.legacy_tilt_loop(lines), abs=1e-9)
+
+
+def test_estimate_tilt_angle_weighted_median():
+    rng = np.random.default_rng(0)
+    angles = rng.uniform(-9, 9, 301)
+    weights = rng.uniform(0.1, 10, 301)
+    # Reference: smallest angle at which the sorted cumulative weight reaches half
+    order = np.argsort(angles)
+    total, running = weights.sum(), 0.0
+    for index in order:
+        running += weights[index]
+        if running >= total / 2:
+            expected = angles[index]
+            break
+    angle, confidence = photo_selector.estimate_tilt_angle(angles, weights)
+    assert angle == pytest.approx(expected)
+    assert 0 < confidence < 1
+
+
+def test_estimate_tilt_angle_folds_verticals_and_ignores_steep_lines():
+    angle, confidence = photo_selector.estimate_tilt_angle([1.5, 91.5, -88.5, 30.0, -60.0])
+    assert angle == pytest.approx(1.5)
+    assert confidence == pytest.approx(1.0)
+    assert photo_selector.estimate_tilt_angle([30.0, -25.0]) == (0.0, 0.0)
+
+
+def test_low_confidence_tilt_is_not_written():
+    photo = {'tilt_angle': 3.0, 'tilt_confidence': photo_selector.TILT_MIN_CONFIDENCE / 2}
+    assert photo_selector.straighten_angle(photo) == 0.0
+    assert photo_selector.tilt_skipped(photo)
+    photo['tilt_confidence'] = 0.9
+    assert photo_selector.straighten_angle(photo) == 3.0
+    assert not photo_selector.tilt_skipped(photo)
+
+
+@pytest.mark.parametrize("shape", [(-1, 1, 4), (-1, 4)])
+def test_segment_angles_accepts_both_hough_shapes(shape):
+    # cv2.HoughLinesP returns (N, 1, 4) on OpenCV 4 and (N, 4) on OpenCV 5
+    segments = np.array([[0, 0, 10, 0], [0, 0, 0, 5], [0, 0, 3, 4]], dtype=np.int32).reshape(shape)
+    angles, lengths = photo_selector.segment_angles(segments)
+    assert angles == pytest.approx([0.0, 90.0, np.degrees(np.arctan2(4, 3))])
+    assert lengths == pytest.approx([10.0, 5.0, 5.0])
+
+
+@pytest.mark.parametrize("shape", [(-1, 1, 4), (-1, 4)])
+def test_detect_horizon_angle_with_either_hough_shape(monkeypatch, shape):
+    hough = photo_selector.cv2.HoughLinesP
+    monkeypatch.setattr(photo_selector.cv2, "HoughLinesP",
+                        lambda *args, **kwargs: hough(*args, **kwargs).reshape(shape))
+    angle, _ = photo_selector.detect_horizon_angle(benchmark_analysis.tilted_frame(2, 2.5))
+    assert angle == pytest.approx(2.5, abs=benchmark_analysis.TILT_TOLERANCE)
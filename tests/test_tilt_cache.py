@@ -0,0 +1,73 @@
+import pytest
+
+import photo_selector
+from photo_selector import AnalysisCache, measure_tilts
+
+
+@pytest.fixture
+def measured(monkeypatch):
+    """Stub tilt pass: records the paths it measures, 1.5 degrees at 0.8 confidence"""
+    paths = []
+
+    def measure(file_paths, analyze_kwargs, **kwargs):
+        for index, file_path in enumerate(file_paths):
+            paths.append(file_path)
+            confidence = None if file_path.endswith("unreadable.ARW") else 0.8
+            yield index, {'path': file_path, 'tilt_angle': 1.5 if confidence else 0.0, 'tilt_confidence': confidence}
+
+    monkeypatch.setattr(photo_selector, 'iter_parallel_analysis', measure)
+    return paths
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = AnalysisCache(tmp_path / photo_selector.ANALYSIS_CACHE_FILENAME)
+    yield cache
+    cache.close()
+
+
+def photos(raw_files, names, selected=True):
+    return [{'path': str(path), 'filename': path.name, 'selected': selected}
+            for path in raw_files([8] * len(names), names)]
+
+
+def test_only_selected_photos_without_a_tilt_are_measured(raw_files, measured):
+    kept = photos(raw_files, ["DSC00001.ARW"])
+    rejected = photos(raw_files, ["DSC00002.ARW"], selected=False)
+    known = photos(raw_files, ["DSC00003.ARW"])
+    known[0].update(tilt_angle=-2.0, tilt_confidence=0.9)
+
+    assert measure_tilts(kept + rejected + known) == 1
+    assert measured == [kept[0]['path']]
+    assert (kept[0]['tilt_angle'], kept[0]['tilt_confidence']) == (1.5, 0.8)
+    assert 'tilt_confidence' not in rejected[0]
+    assert known[0]['tilt_angle'] == -2.0
+
+
+def test_cached_tilts_are_reused(raw_files, measured, cache):
+    assert measure_tilts(photos(raw_files, ["DSC00001.ARW", "DSC00002.ARW"]), cache) == 2
+    again = photos(raw_files, ["DSC00001.ARW", "DSC00002.ARW"])
+    assert measure_tilts(again, cache) == 0
+    assert len(measured) == 2
+    assert all((photo['tilt_angle'], photo['tilt_confidence']) == (1.5, 0.8) for photo in again)
+
+
+def test_modified_file_is_remeasured(tmp_path, raw_files, measured, cache):
+    measure_tilts(photos(raw_files, ["DSC00001.ARW", "DSC00002.ARW"]), cache)
+    (tmp_path / "DSC00002.ARW").write_bytes(b"edited raw data")
+    assert measure_tilts(photos(raw_files, ["DSC00001.ARW", "DSC00002.ARW"]), cache) == 1
+    assert measured[-1] == str(tmp_path / "DSC00002.ARW")
+
+
+def test_tilt_version_bump_remeasures(raw_files, measured, cache, monkeypatch):
+    measure_tilts(photos(raw_files, ["DSC00001.ARW"]), cache)
+    monkeypatch.setattr(photo_selector, 'TILT_VERSION', photo_selector.TILT_VERSION + 1)
+    assert measure_tilts(photos(raw_files, ["DSC00001.ARW"]), cache) == 1
+
+
+def test_failed_measurement_is_not_cached(raw_files, measured, cache):
+    failed = photos(raw_files, ["unreadable.ARW"])
+    measure_tilts(failed, cache)
+    assert (failed[0]['tilt_angle'], failed[0]['tilt_confidence']) == (0.0, 0.0)  # Nothing is straightened
+    assert cache.get_tilt(failed[0]['path']) is None
+    assert measure_tilts(photos(raw_files, ["unreadable.ARW"]), cache) == 1
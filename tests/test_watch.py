@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+import photo_selector
+from photo_selector import (FolderWatcher, append_metrics_row, build_metrics_table, duplicate_result,
+                            select_photos, watched_duplicate_of)
+
+SCENE = 0x0123456789ABCDEF
+
+
+class Clock:
+    """Stand-in for the time module with a manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(photo_selector, 'time', clock)
+    return clock
+
+
+def settled(watcher):
+    watcher._collect(rescan=True)
+    return [path.name for path in watcher._settled()]
+
+
+def test_file_is_ready_once_it_stops_changing(tmp_path, clock):
+    watcher = FolderWatcher(tmp_path, settle_seconds=2.0)
+    photo = tmp_path / "DSC00001.ARW"
+    photo.write_bytes(b"x" * 100)
+    assert settled(watcher) == []  # First seen
+
+    clock.now += 1.5
+    with open(photo, 'ab') as f:
+        f.write(b"x" * 100)  # Still being copied
+    assert settled(watcher) == []
+    clock.now += 1.5
+    assert settled(watcher) == []  # Only 1.5 s since the last change
+
+    clock.now += 1.0
+    assert settled(watcher) == ["DSC00001.ARW"]
+    clock.now += 10.0
+    assert settled(watcher) == []  # Handed out once
+
+
+def test_empty_known_and_removed_files_are_not_handed_out(tmp_path, clock):
+    known = tmp_path / "DSC00001.ARW"
+    known.write_bytes(b"x")
+    (tmp_path / "DSC00002.ARW").write_bytes(b"")  # Copy not started yet
+    removed = tmp_path / "DSC00003.ARW"
+    removed.write_bytes(b"x")
+    (tmp_path / "notes.txt").write_bytes(b"x")
+    watcher = FolderWatcher(tmp_path, known=[known], settle_seconds=2.0)
+    assert settled(watcher) == []
+    removed.unlink()
+    clock.now += 5.0
+    assert settled(watcher) == []
+    assert set(watcher._pending) == {photo_selector.os.path.normcase(str(tmp_path / "DSC00002.ARW"))}
+
+
+def test_polling_iteration_yields_new_files_and_ends_on_stop(tmp_path, monkeypatch):
+    monkeypatch.setattr(photo_selector, 'HAS_WATCHDOG', False)
+    (tmp_path / "DSC00001.ARW").write_bytes(b"x")
+    watcher = FolderWatcher(tmp_path, known=[tmp_path / "DSC00001.ARW"], settle_seconds=0.2, poll_interval=0.05)
+    seen = []
+    thread = threading.Thread(target=lambda: seen.extend(path.name for path in watcher))
+    thread.start()
+    (tmp_path / "DSC00002.ARW").write_bytes(b"x")
+    deadline = time.monotonic() + 5
+    while not seen and time.monotonic() < deadline:
+        time.sleep(0.05)
+    watcher.stop()
+    thread.join(timeout=5)
+    assert seen == ["DSC00002.ARW"]
+    assert not thread.is_alive()
+
+
+def watched(filename, capture_time, phash, sharpness=100.0):
+    return {'path': f"/card/{filename}", 'filename': filename, 'capture_time': capture_time,
+            'phash': f"{phash:016x}", 'sharpness': sharpness, 'brightness': 128.0, 'face_count': 1,
+            'width': 6000, 'height': 4000}
+
+
+def test_second_copy_of_a_watched_photo_is_a_duplicate():
+    photos = [watched("DSC00001.ARW", 100.25, SCENE), watched("DSC00002.ARW", 100.5, SCENE ^ 0b11)]
+    assert watched_duplicate_of(photos, watched("DSC00001-2.ARW", 100.25, SCENE ^ 1)) is photos[0]
+    assert watched_duplicate_of(photos, watched("DSC00003.ARW", 101.0, SCENE ^ 0b111)) is None  # Burst frame
+    photos.append(duplicate_result("/card/DSC00001-3.ARW", "/card/DSC00001.ARW"))
+    assert watched_duplicate_of(photos, watched("DSC00004.ARW", 300.0, ~SCENE & (2**64 - 1))) is None
+
+
+def test_burst_copied_in_frame_by_frame_is_grouped():
+    frames = [watched(f"DSC{i:05d}.ARW", 100.0 + 0.3 * i, SCENE ^ (1 << i), sharpness=100.0 + i)
+              for i in range(4)]
+    frames.append(watched("DSC00001-copy.ARW", 100.3, SCENE ^ 0b10))  # Copy of frame 1
+    photos = [frames[0]]
+    table = build_metrics_table(photos)
+    for frame in frames[1:]:
+        original = watched_duplicate_of(photos, frame)
+        if original is not None:
+            frame = duplicate_result(frame['path'], original['path'])
+        photos.append(frame)
+        table = append_metrics_row(table, frame)
+
+    assert photos[-1]['duplicate_of'] == "DSC00001.ARW"
+    selection = select_photos(table, burst_keep=1)
+    assert selection['burst_size'].tolist() == [4, 4, 4, 4, 1]
+    assert selection['selected'].tolist() == [False, False, False, True, False]  # Sharpest frame kept
@@ -0,0 +1,58 @@
+import pytest
+
+import photo_selector
+from photo_selector import XmpPreset, generate_xmp_with_rotation, xmp_preset
+
+CUSTOM = """<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about=""
+    xmlns:crs="http://ns.adobe.com/camera-raw-settings/1.0/"
+    crs:Exposure2012="+0.30"
+    crs:Contrast2012="-10"/>
+ </rdf:RDF>
+</x:xmpmeta>"""
+
+
+@pytest.mark.parametrize("xmp", [photo_selector.XMP_PRESET, CUSTOM])
+def test_render_without_overrides_is_the_preset(xmp):
+    assert XmpPreset(xmp).render() == xmp
+
+
+def test_attributes_of_the_settings_element():
+    preset = XmpPreset(CUSTOM)
+    assert preset.attributes == {'rdf:about': "", 'xmlns:crs': "http://ns.adobe.com/camera-raw-settings/1.0/",
+                                 'crs:Exposure2012': "+0.30", 'crs:Contrast2012': "-10"}
+
+
+def test_override_replaces_only_that_value():
+    rendered = XmpPreset(CUSTOM).render({'crs:Exposure2012': "-1.00"})
+    assert rendered == CUSTOM.replace('crs:Exposure2012="+0.30"', 'crs:Exposure2012="-1.00"')
+
+
+def test_new_attributes_are_added_to_the_settings_element():
+    rendered = XmpPreset(CUSTOM).render({'crs:HasCrop': "True", 'crs:Note': 'a "b" & <c>'})
+    assert rendered == CUSTOM.replace(
+        'crs:Contrast2012="-10"/>',
+        'crs:Contrast2012="-10"\n    crs:HasCrop="True"\n    crs:Note="a &quot;b&quot; &amp; &lt;c>"/>')
+
+
+def test_rotation_is_written_only_for_a_significant_tilt():
+    preset = xmp_preset()
+    rotated = XmpPreset(generate_xmp_with_rotation(-2.345))
+    assert rotated.attributes['crs:StraightenAngle'] == "-2.35"
+    assert rotated.attributes['crs:HasCrop'] == "True"
+    assert generate_xmp_with_rotation(0.05) == preset.render()
+
+
+def test_presets_are_parsed_once():
+    assert xmp_preset(CUSTOM) is xmp_preset(CUSTOM)
+
+
+@pytest.mark.parametrize("xmp, message", [
+    ("<preset/>", "not an XMP document"),
+    ('<x:xmpmeta><rdf:Description rdf:about=""/></x:xmpmeta>', "no Camera Raw settings"),
+    ('<x:xmpmeta><rdf:Description crs:A="1" stray crs:B="2"/></x:xmpmeta>', "unexpected text"),
+])
+def test_invalid_presets_are_rejected(xmp, message):
+    with pytest.raises(ValueError, match=message):
+        XmpPreset(xmp)
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+import photo_selector
+from photo_selector import write_file_atomic, write_xmp_sidecars
+
+
+def raw_photos(raw_files, count):
+    return [{'path': str(path), 'filename': path.name, 'brightness': 128.0, 'tilt_angle': 0.0, 'tilt_confidence': 0.0}
+            for path in raw_files([0] * count)]
+
+
+def test_atomic_write_skips_unchanged_content(tmp_path):
+    path = tmp_path / "photo.xmp"
+    assert write_file_atomic(path, "first") is True
+    mtime = os.stat(path).st_mtime_ns
+    os.utime(path, ns=(mtime - 10**9, mtime - 10**9))
+
+    assert write_file_atomic(path, "first") is False
+    assert os.stat(path).st_mtime_ns == mtime - 10**9  # Not rewritten
+
+    assert write_file_atomic(path, "other") is True  # Same size, different content
+    assert path.read_text() == "other"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["photo.xmp"]  # No temporary files left
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="POSIX permissions")
+def test_atomic_write_keeps_the_permissions(tmp_path):
+    shared = tmp_path / "shared.xmp"
+    shared.write_text("first")
+    os.chmod(shared, 0o644)
+    assert write_file_atomic(shared, "second") is True
+    assert os.stat(shared).st_mode & 0o777 == 0o644
+
+    new = tmp_path / "new.xmp"
+    write_file_atomic(new, "first")
+    assert os.stat(new).st_mode & 0o777 == photo_selector.NEW_FILE_MODE  # Not mkstemp's 0600
+
+
+def test_sidecars_in_order_and_unchanged_on_rerun(raw_files):
+    photos = raw_photos(raw_files, 5)
+    first = list(write_xmp_sidecars(photos, 100, threads=2))
+    assert [str(xmp_path) for xmp_path, _, _, _ in first] == [str(photo_selector.sidecar_path(p['path']))
+                                                            for p in photos]
+    assert all(written and error is None for _, _, written, error in first)
+
+    again = list(write_xmp_sidecars(photos, 100, threads=2))
+    assert not any(written for _, _, written, _ in again)
+
+
+def test_cancel_stops_queueing_sidecars(tmp_path, raw_files):
+    photos = raw_photos(raw_files, 40)
+    cancelled = []
+    sidecars = write_xmp_sidecars(photos, 100, threads=2, should_cancel=lambda: bool(cancelled))
+    next(sidecars)
+    cancelled.append(True)
+    remaining = list(sidecars)
+
+    assert len(remaining) <= 2 * 2  # Only what was already queued
+    assert len(list(tmp_path.glob("*.xmp"))) <= 1 + 2 * 2
+
+
+def test_sidecar_extension_is_upper_case(tmp_path):
+    for name, extension in [("DSC00001.arw", "ARW"), ("IMG_0001.CR3", "CR3"), ("DSC_0001.nef", "NEF")]:
+        photo = {'path': str(tmp_path / name), 'brightness': 128.0}
+        xmp, _ = photo_selector.render_xmp_sidecar(photo, 100)
+        assert f'photoshop:SidecarForExtension="{extension}"' in xmp
+
+
+def test_arw_sidecar_matches_built_in_preset(tmp_path):
+    photo = {'path': str(tmp_path / "DSC00001.arw"), 'brightness': 128.0}
+    xmp, _ = photo_selector.render_xmp_sidecar(photo, 100)
+    assert xmp == photo_selector.XMP_PRESET
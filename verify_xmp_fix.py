@@ -16,7 +16,7 @@ def check_xmp_file(xmp_path):
     # Critical attributes that MUST be present for Camera Raw to apply preset
     required_attributes = {
         'xmlns:crs': 'xmlns:crs="http://ns.adobe.com/camera-raw-settings/1.0/"',
-        'photoshop:SidecarForExtension': 'photoshop:SidecarForExtension="ARW"',
+        'photoshop:SidecarForExtension': 'photoshop:SidecarForExtension="',  # ARW, CR2, NEF, ...
         'crs:CameraProfile': 'crs:CameraProfile="Adobe Standard"',
         'crs:HasSettings': 'crs:HasSettings="True"',
         'crs:HasCrop': 'crs:HasCrop="False"',  # or "True" if straightened